@@ -1,17 +1,63 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Union
 import groq
 from datetime import datetime
 import json
 import re
+import time
 import yaml
 import os
 from .markdown_templates import format_activity_description, EXAMPLE_FORMATTED
+from .semantic_cache import SemanticCache
+from .llm_scheduler import PRIORITY_CHAT, LLMScheduler, get_scheduler
+from .model_router import ModelRouter
+from .request_control import CancellationToken, DeadlineExceeded, RequestCancelled, RequestController, get_request_controller
+from .local_answers import LocalAnswerEngine
+from .conversation_memory import ConversationMemory
+from .itinerary_model import Itinerary
+from .itinerary_context import encode_itinerary
+from .itinerary_patch import EDIT_INSTRUCTIONS, apply_edits, ensure_activity_ids, extract_edits, validate_edits
 
 class ChatAgent:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, semantic_cache: Optional[Union[Dict, SemanticCache]] = None, embedding_model: str = "all-MiniLM-L6-v2",
+                 memory: Optional[Dict] = None, context_format: str = "compact", scheduler: Optional[LLMScheduler] = None,
+                 client: Optional[groq.Groq] = None, router: Optional[ModelRouter] = None,
+                 local_answers: Optional[LocalAnswerEngine] = None, control: Optional[RequestController] = None):
         self.api_key = api_key
-        self.client = groq.Groq(api_key=api_key)
-        self.conversation_history = []
+        # Retries are left to the scheduler, which shares rate limits across every session
+        self.client = client or groq.Groq(api_key=api_key, max_retries=0)
+        self.scheduler = scheduler or get_scheduler()
+        # Every call has a deadline, can be cancelled and may be hedged
+        self.control = control or get_request_controller()
+        # Cancels the message being processed (see cancel)
+        self._token = CancellationToken()
+        # Read-only questions go to a small fast model, edits and rewrites to the large one
+        self.router = router or ModelRouter()
+        # Simple lookups (costs, times, places) are answered from the itinerary without an API call
+        self.local_answers = local_answers
+        # How the current itinerary is encoded in the prompt (see itinerary_context.CONTEXT_FORMATS)
+        self.context_format = context_format
+        # Recent turns verbatim plus a rolling summary of older ones, packed into a fixed prompt budget
+        memory = memory or {}
+        self.prompt_tokens = memory.get("prompt_tokens", 6000)
+        self.summary_model = memory.get("summary_model", "llama-3.1-8b-instant")
+        self.memory = ConversationMemory(
+            recent_tokens=memory.get("recent_tokens", 1500),
+            summary_tokens=memory.get("summary_tokens", 300),
+            summarizer=self._summarize,
+            fold_tokens=memory.get("fold_tokens")
+        )
+        # Answers to near-duplicate questions about the same itinerary are reused;
+        # pass a SemanticCache to share one between agents, or its settings to create one
+        self.semantic_cache = semantic_cache if isinstance(semantic_cache, SemanticCache) else None
+        semantic_cache = semantic_cache if isinstance(semantic_cache, dict) else {}
+        if semantic_cache.get("enabled", False):
+            self.semantic_cache = SemanticCache(
+                model_name=embedding_model,
+                threshold=semantic_cache.get("threshold", 0.88),
+                max_entries=semantic_cache.get("max_entries", 500)
+            )
+        # Final response of the last stream_message call, set once the stream ends
+        self.last_response = None
         print("🤖 ChatAgent initialized with Groq client")
     
     def process_message(self, message: str, current_itinerary: Optional[Dict] = None) -> Dict:
@@ -21,132 +67,341 @@ class ChatAgent:
         Args:
             message (str): User's message
             current_itinerary (Dict, optional): Current itinerary to modify
-            
+        
         Returns:
             Dict: Response containing message and modified itinerary (if applicable)
         """
+        self._token = CancellationToken()
         try:
-            # Add user message to history
-            self.conversation_history.append({"role": "user", "content": message})
-            
-            # Prepare the system message
-            system_message = f"""You are a helpful travel assistant. You can help users modify their travel itineraries and answer questions about their trips.
-            
-            When modifying an itinerary, you should:
-            1. Keep the same JSON structure
-            2. Use markdown formatting in descriptions for better readability
-            3. Highlight important information using bold and italics
-            4. Use bullet points for lists of items
-            5. Format costs and times consistently
-            
-            Example of how to format activity descriptions:
-            {{
-                "days": [
-                    {{
-                        "day_number": 1,
-                        "activities": [
-                            {{
-                                "time": "09:00",
-                                "title": "Activity Name",
-                                "description": "{EXAMPLE_FORMATTED}",
-                                "duration": "2 hours",
-                                "cost": 30,
-                                "location": "Buckingham Palace, London SW1A 1AA",
-                                "transportation": "Take the Tube to Green Park Station, then walk 5 minutes"
-                            }}
-                        ]
-                    }}
-                ]
-            }}
+            if current_itinerary:
+                # Edits refer to activities by id
+                ensure_activity_ids(current_itinerary)
+            cached = self._local_response(message, current_itinerary) or self._cached_response(message, current_itinerary)
+            if cached is not None:
+                return cached
             
-            Always maintain the JSON structure while adding markdown formatting to the text fields."""
+            route = self.router.route(message, bool(current_itinerary))
+            messages = self._build_messages(message, current_itinerary)
             
-            # Prepare the context with current itinerary if available
-            context = ""
+            # Call Groq API on the route's model, falling back to a larger one if needed
+            response_text = self._complete(messages, route, current_itinerary)
+            response = self._finalize_response(response_text, current_itinerary)
+            self._remember(message, current_itinerary, response)
+            # Summarize old turns off the request path
+            self.memory.compact_in_background()
+            return response
+        
+        except Exception as e:
+            print(f"Error in process_message: {str(e)}")
+            return {
+                "message": f"I apologize, but I encountered an error: {str(e)}",
+                "modified_itinerary": None
+            }
+    
+    def stream_message(self, message: str, current_itinerary: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Process a user message like process_message, yielding the response text as it arrives.
+        
+        Itinerary modifications can only be extracted from the complete
+        response, so they are processed once the stream ends; the resulting
+        response dict is then available as last_response.
+        
+        Args:
+            message (str): User's message
+            current_itinerary (Dict, optional): Current itinerary to modify
+        
+        Yields:
+            str: Chunks of the response text, in order
+        """
+        self.last_response = None
+        self._token = CancellationToken()
+        chunks = []
+        try:
             if current_itinerary:
-                # Include all activity details but limit the description length
-                simplified_itinerary = {
-                    "days": [
-                        {
-                            "day_number": day["day_number"],
-                            "activities": [
-                                {
-                                    "time": activity["time"],
-                                    "title": activity["title"],
-                                    "duration": activity["duration"],
-                                    "cost": activity["cost"],
-                                    "location": activity["location"],
-                                    "transportation": activity["transportation"],
-                                    "description": activity["description"][:100] + "..." if len(activity["description"]) > 100 else activity["description"]
-                                }
-                                for activity in day["activities"]
-                            ]
-                        }
-                        for day in current_itinerary["days"]
-                    ],
-                    "destination": current_itinerary.get("destination", "Unknown Destination"),
-                    "duration": current_itinerary.get("duration", len(current_itinerary["days"]))
-                }
-                context = f"""Current itinerary:
-{json.dumps(simplified_itinerary, indent=2)}
-
-Please use this current itinerary as a reference and make modifications based on the user's request. If the user asks about the current itinerary, provide information from this data. If they request changes, modify this specific itinerary while maintaining its structure. Make sure to preserve all activity details and only update what the user specifically requests to change."""
+                # Edits refer to activities by id
+                ensure_activity_ids(current_itinerary)
+            cached = self._local_response(message, current_itinerary) or self._cached_response(message, current_itinerary)
+            if cached is not None:
+                yield cached["message"]
+                self.last_response = cached
+                return
+            
+            route = self.router.route(message, bool(current_itinerary))
+            messages = self._build_messages(message, current_itinerary)
             
-            # Limit conversation history to last 3 messages
-            recent_history = self.conversation_history[-3:] if len(self.conversation_history) > 3 else self.conversation_history
+            # Text already shown cannot be taken back, so fall back only before the first token
+            start = time.perf_counter()
+            first_route, fell_back = route, False
+            while True:
+                settings = self.router.settings(route)
+                try:
+                    for delta in self._stream_deltas(messages, settings):
+                        if not chunks:
+                            print(f"⚡ First token after {time.perf_counter() - start:.2f}s")
+                        chunks.append(delta)
+                        yield delta
+                except Exception as e:
+                    fallback = None if chunks or isinstance(e, RequestCancelled) else self.router.fallback(route)
+                    if fallback is None:
+                        raise
+                    self._log_fallback(route, fallback, f"{type(e).__name__}: {str(e)}")
+                    route, fell_back = fallback, True
+                    continue
+                fallback = None if chunks else self.router.fallback(route)
+                if fallback is None:
+                    break
+                self._log_fallback(route, fallback, "empty response")
+                route, fell_back = fallback, True
+            self._record_route(first_route, route, time.perf_counter() - start, fell_back)
             
-            # Prepare the messages for the API
-            messages = [
-                {"role": "system", "content": system_message + "\n\n" + context if context else system_message},
-                *recent_history
-            ]
+            self.last_response = self._finalize_response("".join(chunks), current_itinerary)
+            self._remember(message, current_itinerary, self.last_response)
+            self.memory.compact_in_background()
+        
+        except GeneratorExit:
+            # The caller stopped reading: the user navigated away or the script was rerun
+            self._token.cancel()
+            raise
+        
+        except Exception as e:
+            print(f"Error in stream_message: {str(e)}")
+            error_message = f"I apologize, but I encountered an error: {str(e)}"
+            yield ("\n\n" if chunks else "") + error_message
+            self.last_response = {
+                "message": "".join(chunks) + ("\n\n" if chunks else "") + error_message,
+                "modified_itinerary": None
+            }
+    
+    def _complete(self, messages: List[Dict], route: str, current_itinerary: Optional[Dict]) -> str:
+        """
+        Get a complete response on a route's model.
+        
+        An API error, an empty response or edits that do not apply to the
+        itinerary send the request again on the router's fallback route.
+        """
+        start = time.perf_counter()
+        first_route, fell_back = route, False
+        while True:
+            settings = self.router.settings(route)
+            fallback = self.router.fallback(route)
+            try:
+                completion = self.control.call(
+                    lambda timeout, token: self.scheduler.create(
+                        self.client,
+                        priority=PRIORITY_CHAT,
+                        token=token,
+                        timeout=timeout,
+                        model=settings["model"],
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=settings["max_tokens"]
+                    ),
+                    key=settings["model"],
+                    token=self._token
+                )
+            except Exception as e:
+                if fallback is None or isinstance(e, RequestCancelled):
+                    raise
+                self._log_fallback(route, fallback, f"{type(e).__name__}: {str(e)}")
+                route, fell_back = fallback, True
+                continue
             
-            # Call Groq API
-            completion = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            response_text = completion.choices[0].message.content or ""
+            problem = self._unusable(response_text, current_itinerary)
+            if problem is None or fallback is None:
+                self._record_route(first_route, route, time.perf_counter() - start, fell_back)
+                return response_text
+            self._log_fallback(route, fallback, problem)
+            route, fell_back = fallback, True
+    
+    def _stream_deltas(self, messages: List[Dict], settings: Dict) -> Iterator[str]:
+        """
+        Stream a response on a model, yielding the non-empty text deltas.
+        
+        Opening the stream is deadline-bound and may be hedged like any
+        call; the whole stream must then end within the same deadline, and
+        is closed as soon as the message is cancelled.
+        """
+        deadline = time.monotonic() + self.control.timeout_s
+        stream = self.control.call(
+            lambda timeout, token: self.scheduler.create(
+                self.client,
+                priority=PRIORITY_CHAT,
+                token=token,
+                timeout=timeout,
+                model=settings["model"],
                 messages=messages,
                 temperature=0.7,
-                max_tokens=4000
-            )
-            
-            # Get the response
-            response_text = completion.choices[0].message.content
-            
-            # Try to extract itinerary modifications if present
+                max_tokens=settings["max_tokens"],
+                stream=True
+            ),
+            # Time to the first byte, kept apart from complete responses
+            key=f"{settings['model']}:stream",
+            token=self._token,
+            discard=lambda late: late.close()
+        )
+        try:
+            for chunk in stream:
+                if self._token.cancelled:
+                    self.control.count("cancelled")
+                    raise RequestCancelled("Request cancelled")
+                if time.monotonic() > deadline:
+                    self.control.count("timeouts")
+                    raise DeadlineExceeded(f"Response not finished within {self.control.timeout_s:g}s")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            stream.close()
+    
+    def _unusable(self, response_text: str, current_itinerary: Optional[Dict]) -> Optional[str]:
+        """Why a response should be redone on a larger model, or None if it is fine."""
+        if not response_text.strip():
+            return "empty response"
+        edits = extract_edits(response_text) if current_itinerary else None
+        if edits and validate_edits(edits, current_itinerary):
+            return "invalid edits"
+        return None
+    
+    def _log_fallback(self, route: str, fallback: str, problem: str):
+        print(f"↪️ {route} route ({self.router.settings(route)['model']}) failed: {problem}; "
+              f"retrying on {fallback} ({self.router.settings(fallback)['model']})")
+    
+    def _record_route(self, first_route: str, route: str, latency: float, fell_back: bool):
+        # Latency is charged to the route the request was classified as, fallbacks included
+        self.router.record(first_route, latency, fell_back)
+        print(f"🧭 {first_route} route answered by {self.router.settings(route)['model']} in {latency:.2f}s")
+    
+    def _local_response(self, message: str, current_itinerary: Optional[Dict]) -> Optional[Dict]:
+        """Answer from the itinerary itself when the local engine is confident, recording the exchange in the history."""
+        if self.local_answers is None:
+            return None
+        start = time.perf_counter()
+        try:
+            local = self.local_answers.answer(message, current_itinerary)
+        except Exception as e:
+            print(f"Error answering locally: {str(e)}")
+            return None
+        if local is None:
+            return None
+        print(f"🏠 Answered locally ({local['intent']}, confidence {local['confidence']:.2f}) "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        self.memory.add("user", message)
+        self.memory.add("assistant", local["message"])
+        self.memory.compact_in_background()
+        return {"message": local["message"], "modified_itinerary": None}
+    
+    def _cached_response(self, message: str, current_itinerary: Optional[Dict]) -> Optional[Dict]:
+        """Answer from the semantic cache, recording the exchange in the history as if it were generated."""
+        if self.semantic_cache is None:
+            return None
+        try:
+            cached = self.semantic_cache.lookup(message, current_itinerary)
+        except Exception as e:
+            print(f"Error in semantic cache lookup: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        print(f"💾 Semantic cache hit (similarity {cached['cache_similarity']:.3f})")
+        self.memory.add("user", message)
+        self.memory.add("assistant", cached["message"])
+        self.memory.compact_in_background()
+        return {"message": cached["message"], "modified_itinerary": None}
+    
+    def _remember(self, message: str, current_itinerary: Optional[Dict], response: Dict):
+        """Cache a plain answer; responses that modify the itinerary are never replayed."""
+        if self.semantic_cache is None or response.get("modified_itinerary"):
+            return
+        try:
+            self.semantic_cache.store(message, current_itinerary, {"message": response["message"]})
+        except Exception as e:
+            print(f"Error storing semantic cache entry: {str(e)}")
+    
+    def _build_messages(self, message: str, current_itinerary: Optional[Dict]) -> List[Dict]:
+        """Add the user message to the history and build the messages to send to the API."""
+        # Add user message to history
+        self.memory.add("user", message)
+        
+        # Prepare the system message
+        system_message = f"""You are a helpful travel assistant. You can help users modify their travel itineraries and answer questions about their trips.
+        
+        When modifying an itinerary, you should:
+        1. Use markdown formatting in descriptions for better readability
+        2. Highlight important information using bold and italics
+        3. Use bullet points for lists of items
+        4. Format costs and times consistently
+        
+        Example of how to format an activity description:
+        "{EXAMPLE_FORMATTED}"
+        
+        {EDIT_INSTRUCTIONS}"""
+        
+        # Prepare the context with current itinerary if available
+        context = ""
+        if current_itinerary:
+            # Only the columns and days relevant to the message, in the configured format
+            context = f"""Current itinerary:
+{encode_itinerary(current_itinerary, message, self.context_format)}
+
+Please use this current itinerary as a reference and make modifications based on the user's request. If the user asks about the current itinerary, provide information from this data. If they request changes, modify this specific itinerary while maintaining its structure. Make sure to preserve all activity details and only update what the user specifically requests to change."""
+        
+        # Pack the system prompt, summary and as much recent history as fits the budget
+        return self.memory.pack(system_message + "\n\n" + context if context else system_message, self.prompt_tokens)
+    
+    def _finalize_response(self, response_text: str, current_itinerary: Optional[Dict]) -> Dict:
+        """Extract and merge itinerary modifications from a complete response and record it in the history."""
+        edits = extract_edits(response_text) if current_itinerary else None
+        if edits is not None:
+            modified_itinerary = self._apply_edits(edits, current_itinerary)
+        else:
+            # Older full-itinerary replies: extract the whole itinerary and merge it
             modified_itinerary = self._extract_itinerary_modifications(response_text)
+        
+        # If a full itinerary was found, merge it with the current itinerary
+        if edits is None and modified_itinerary and current_itinerary:
+            merged = Itinerary.from_dict(current_itinerary)
+            for day in modified_itinerary["days"]:
+                # Find matching day in current itinerary
+                current_day = merged.day(day["day_number"])
+                if current_day:
+                    for activity in day["activities"]:
+                        # Find matching activity in current day and update its fields
+                        current_activity = current_day.find_title(activity["title"])
+                        if current_activity:
+                            current_day.update(current_activity, activity)
             
-            # If modifications were found, merge them with the current itinerary
-            if modified_itinerary and current_itinerary:
-                for day in modified_itinerary["days"]:
-                    # Find matching day in current itinerary
-                    current_day = next((d for d in current_itinerary["days"] if d["day_number"] == day["day_number"]), None)
-                    if current_day:
-                        for activity in day["activities"]:
-                            # Find matching activity in current day
-                            current_activity = next((a for a in current_day["activities"] if a["title"] == activity["title"]), None)
-                            if current_activity:
-                                # Update only the changed fields
-                                for key, value in activity.items():
-                                    if key != "description" or value != current_activity[key]:
-                                        current_activity[key] = value
-                
-                # Use the updated current itinerary
-                modified_itinerary = current_itinerary
-            
-            # Add assistant response to history
-            self.conversation_history.append({"role": "assistant", "content": response_text})
-            
-            return {
-                "message": response_text,
-                "modified_itinerary": modified_itinerary
-            }
-            
-        except Exception as e:
-            print(f"Error in process_message: {str(e)}")
-            return {
-                "message": f"I apologize, but I encountered an error: {str(e)}",
-                "modified_itinerary": None
-            }
+            # Use the updated current itinerary
+            modified_itinerary = merged.to_dict()
+        
+        # Add assistant response to history
+        self.memory.add("assistant", response_text)
+        
+        return {
+            "message": response_text,
+            "modified_itinerary": modified_itinerary
+        }
+    
+    def _apply_edits(self, edits: List[Dict], current_itinerary: Dict) -> Optional[Dict]:
+        """Validate edit operations and apply them to a copy of the current itinerary."""
+        errors = validate_edits(edits, current_itinerary)
+        if errors:
+            for error in errors:
+                print(f"Error in itinerary edit: {error}")
+            return None
+        if not edits:
+            return None
+        
+        modified_itinerary, described = apply_edits(current_itinerary, edits)
+        for day in modified_itinerary["days"]:
+            for activity in day["activities"]:
+                if activity["id"] in described:
+                    activity["description"] = format_activity_description(
+                        title=activity["title"],
+                        description=activity["description"],
+                        location_details={"Address": activity["location"]},
+                        transportation=activity["transportation"]
+                    )
+        print(f"✏️ Applied {len(edits)} itinerary edit(s)")
+        return modified_itinerary
     
     def _extract_itinerary_modifications(self, response_text: str) -> Optional[Dict]:
         """Extract itinerary modifications from the response text."""
@@ -245,11 +500,42 @@ Please use this current itinerary as a reference and make modifications based on
                 return itinerary_data
             
             return None
-            
+        
         except Exception as e:
             print(f"Error in _extract_itinerary_modifications: {str(e)}")
             return None
     
+    def _summarize(self, summary: str, messages: List[Dict], max_tokens: int) -> str:
+        """Fold messages into the conversation summary with a small, fast model."""
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        completion = self.control.call(
+            lambda timeout, token: self.scheduler.create(
+                self.client,
+                priority=PRIORITY_CHAT,
+                token=token,
+                timeout=timeout,
+                model=self.summary_model,
+                messages=[
+                    {"role": "system", "content": f"""Update the summary of a conversation between a traveler and a travel assistant with the new messages below. Keep the traveler's requests, preferences and decisions, and any itinerary changes that were agreed. Leave out itinerary JSON and pleasantries. Reply with the updated summary only, in at most {max_tokens * 3 // 4} words."""},
+                    {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                ],
+                temperature=0.2,
+                max_tokens=max_tokens
+            ),
+            # Runs in the background, so it is not tied to the message being processed
+            key=self.summary_model
+        )
+        return completion.choices[0].message.content
+    
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Recent messages kept verbatim; older ones are in memory.summary."""
+        return self.memory.messages
+    
+    def cancel(self):
+        """Cancel the message being processed, if any; its API calls are abandoned and it returns an error."""
+        self._token.cancel()
+    
     def clear_history(self):
         """Clear the conversation history."""
-        self.conversation_history = [] 
\ No newline at end of file
+        self.memory.clear()
@@ -0,0 +1,206 @@
+from typing import Callable, Dict, List, Optional
+import math
+import threading
+
+# Per-message overhead of the chat format (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count of a text.
+    
+    Llama tokenizers average about four characters per token on English
+    text; counting words as well keeps short, space-separated texts from
+    being underestimated. No tokenizer has to be loaded.
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), len(text.split()))
+
+def message_tokens(message: Dict) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to roughly max_tokens, keeping its beginning."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(max_tokens, 0) * 4].rsplit(" ", 1)[0] + "..."
+
+def extractive_summary(summary: str, messages: List[Dict], max_tokens: int) -> str:
+    """
+    Summary without a model call: the first sentence of every folded message.
+    
+    Used when no summarizer is configured or the summarizer fails.
+    """
+    lines = [summary] if summary else []
+    for message in messages:
+        first_sentence = message["content"].strip().split("\n", 1)[0].split(". ", 1)[0]
+        lines.append(f"{message['role']}: {truncate_to_tokens(first_sentence, 40)}")
+    # Keep the most recent lines when over budget
+    text = "\n".join(lines)
+    while lines and estimate_tokens(text) > max_tokens:
+        lines.pop(0)
+        text = "\n".join(lines)
+    return text
+
+class ConversationMemory:
+    """
+    Chat history kept within a fixed token budget.
+    
+    Recent messages are kept verbatim up to recent_tokens. Once they grow
+    beyond that, compact folds the oldest ones into a rolling summary of at
+    most summary_tokens until the window is back to half its budget, so
+    the summarizer runs once every few turns rather than on every message.
+    
+    add never folds: the summarizer is a model call, so it is kept off the
+    request path. ChatAgent calls compact_in_background once every reply
+    has been delivered, including local and cached ones; until the fold
+    finishes, pack still fits the prompt to its budget by leaving out the
+    oldest messages. At most fold_tokens of messages go to the summarizer
+    in one call; anything older that piled up meanwhile is folded
+    extractively first.
+    """
+    
+    def __init__(self, recent_tokens: int = 1500, summary_tokens: int = 300,
+                 summarizer: Optional[Callable[[str, List[Dict], int], str]] = None,
+                 fold_tokens: Optional[int] = None):
+        """
+        Args:
+            recent_tokens (int): Budget of the verbatim recent window
+            summary_tokens (int): Budget of the rolling summary
+            summarizer (Callable, optional): Called with the previous summary, the messages
+                to fold and the token budget; returns the new summary
+            fold_tokens (int, optional): Most message tokens sent to the summarizer at once,
+                recent_tokens by default
+        """
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.fold_tokens = fold_tokens or recent_tokens
+        self.summarizer = summarizer
+        self.messages = []
+        self.summary = ""
+        self._recent_size = 0
+        self._lock = threading.Lock()
+        # Bumped by clear, so a fold that was running drops its result
+        self._generation = 0
+        self._folding = None
+        # One fold at a time, so the same messages are never folded twice
+        self._fold_lock = threading.Lock()
+    
+    def add(self, role: str, content: str):
+        """Append a message; call compact or compact_in_background to fold the window when it is full."""
+        message = {"role": role, "content": content}
+        with self._lock:
+            self.messages.append(message)
+            self._recent_size += message_tokens(message)
+    
+    @property
+    def needs_compaction(self) -> bool:
+        return self._recent_size > self.recent_tokens
+    
+    def compact_in_background(self) -> Optional[threading.Thread]:
+        """Fold the window on a background thread if it is full and no fold is running; returns that thread."""
+        with self._lock:
+            if not self.needs_compaction or (self._folding is not None and self._folding.is_alive()):
+                return None
+            self._folding = threading.Thread(target=self.compact, daemon=True)
+            self._folding.start()
+            return self._folding
+    
+    def compact(self):
+        """Fold the oldest messages into the summary until the window is at half its budget, always keeping the newest."""
+        with self._fold_lock:
+            self._compact()
+    
+    def _compact(self):
+        with self._lock:
+            if not self.needs_compaction:
+                return
+            generation = self._generation
+            summary = self.summary
+            folded = []
+            size = self._recent_size
+            while len(folded) < len(self.messages) - 1 and size > self.recent_tokens // 2:
+                folded.append(self.messages[len(folded)])
+                size -= message_tokens(folded[-1])
+        if not folded:
+            return
+        
+        # Only the newest fold_tokens of the overflow go to the summarizer
+        summarized = []
+        size = 0
+        for message in reversed(folded):
+            size += message_tokens(message)
+            if summarized and size > self.fold_tokens:
+                break
+            summarized.insert(0, message)
+        skipped = folded[:len(folded) - len(summarized)]
+        if skipped:
+            summary = extractive_summary(summary, skipped, self.summary_tokens)
+        
+        # The folded messages stay in the window, and in prompts, until the summary is ready
+        new_summary = None
+        if self.summarizer is not None:
+            try:
+                new_summary = self.summarizer(summary, summarized, self.summary_tokens)
+            except Exception as e:
+                print(f"Error summarizing conversation: {str(e)}")
+        if not new_summary:
+            new_summary = extractive_summary(summary, summarized, self.summary_tokens)
+        
+        with self._lock:
+            if generation != self._generation:
+                return
+            # Messages are only ever appended, so the folded ones are still the oldest
+            del self.messages[:len(folded)]
+            self._recent_size -= sum(message_tokens(message) for message in folded)
+            self.summary = truncate_to_tokens(new_summary.strip(), self.summary_tokens)
+        print(f"🗜️ Folded {len(folded)} message(s) into the conversation summary")
+    
+    def pack(self, system_message: str, budget: int) -> List[Dict]:
+        """
+        Messages for the API within a token budget.
+        
+        The system message (which carries the itinerary context) comes first,
+        then the summary of older turns, then as many of the most recent
+        messages as fit. The latest message is always included.
+        
+        Args:
+            system_message (str): System prompt including any context
+            budget (int): Token budget of the whole prompt
+        
+        Returns:
+            List[Dict]: Messages in API format
+        """
+        with self._lock:
+            summary = self.summary
+            messages = list(self.messages)
+        content = system_message
+        if summary:
+            content += f"\n\nSummary of the earlier conversation:\n{summary}"
+        packed = [{"role": "system", "content": content}]
+        remaining = budget - message_tokens(packed[0])
+        
+        recent = []
+        for message in reversed(messages):
+            size = message_tokens(message)
+            if recent and size > remaining:
+                break
+            recent.append(message)
+            remaining -= size
+        return packed + recent[::-1]
+    
+    def clear(self):
+        with self._lock:
+            self.messages = []
+            self.summary = ""
+            self._recent_size = 0
+            self._generation += 1
+    
+    def stats(self) -> Dict:
+        """Message count and token sizes of the window and the summary."""
+        return {
+            "messages": len(self.messages),
+            "recent_tokens": self._recent_size,
+            "summary_tokens": estimate_tokens(self.summary)
+        }
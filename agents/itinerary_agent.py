@@ -1,79 +1,145 @@
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 import groq
+import asyncio
 import json
+import queue
+import threading
+import time
 import yaml
 import os
 from datetime import datetime
 from .markdown_templates import format_activity_description, format_itinerary_summary, format_day_summary
+from .stream_parser import IncrementalItineraryParser, validate_day
+from .itinerary_cache import ItineraryCache
+from .llm_scheduler import PRIORITY_GENERATION, LLMScheduler, get_scheduler
+from .request_control import CancellationToken, DeadlineExceeded, RequestCancelled, RequestController, get_request_controller, run_coroutine
+from .itinerary_model import Itinerary, cost_value
+from .itinerary_patch import ensure_activity_ids
+
+# System prompt describing the itinerary JSON format, shared by single-call and per-day generation
+ITINERARY_SYSTEM_MESSAGE = """You are a travel planning assistant. Generate a detailed travel itinerary based on the user's preferences.
+
+The itinerary should be returned as a JSON object with the following structure:
+{
+    "days": [
+        {
+            "day_number": 1,
+            "activities": [
+                {
+                    "time": "09:00",
+                    "title": "Activity Name",
+                    "description": "**Activity Name**\n\nStart your day with a visit to **Buckingham Palace**, the official residence of the British monarch.\n\n*Important Tips:*\n- Book tickets in advance\n- Arrive 15 minutes early\n- Photography not allowed inside\n\n*Important Notes:*\n> The Changing of the Guard ceremony takes place at 11:00 AM\n\n**Location Details:**\n- Address: `Buckingham Palace, London SW1A 1AA`\n- Nearest Tube: `Green Park Station`\n\n**Getting There:**\nTake the Tube to Green Park Station, then walk 5 minutes",
+                    "duration": "2 hours",
+                    "cost": 30,
+                    "location": "Buckingham Palace, London SW1A 1AA",
+                    "transportation": "Take the Tube to Green Park Station, then walk 5 minutes"
+                }
+            ]
+        }
+    ]
+}
+
+Guidelines for the itinerary:
+1. Each day should have 3-5 activities
+2. Activities should be spaced throughout the day
+3. Include transportation details between activities
+4. Provide realistic costs for each activity
+5. Use markdown formatting in descriptions for better readability
+6. Include tips and important notes for each activity
+7. Consider the user's budget and preferences
+8. Include a mix of popular attractions and local experiences
+
+The itinerary should be well-structured and provide a good balance of activities while staying within the user's budget."""
 
 class ItineraryAgent:
-    def __init__(self, api_key: str, model_name: str = "llama-3.3-70b-versatile", temperature: float = 0.7, max_tokens: int = 4000):
+    def __init__(self, api_key: str, model_name: str = "llama-3.3-70b-versatile", temperature: float = 0.7, max_tokens: int = 4000, fan_out: Optional[Dict] = None, cache: Optional[ItineraryCache] = None, scheduler: Optional[LLMScheduler] = None, client: Optional[groq.Groq] = None, control: Optional[RequestController] = None, async_client: Optional[groq.AsyncGroq] = None):
         self.api_key = api_key
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = groq.Groq(api_key=api_key)
+        # Retries are left to the scheduler, which shares rate limits across every session
+        self.client = client or groq.Groq(api_key=api_key, max_retries=0)
+        # Used by fan-out, whose coroutines all run on request_control's shared event loop
+        self.async_client = async_client or groq.AsyncGroq(api_key=api_key, max_retries=0)
+        self.scheduler = scheduler or get_scheduler()
+        # Every call has a deadline, can be cancelled and may be hedged
+        self.control = control or get_request_controller()
+        # One agent can serve every session, so per-call results are kept per thread
+        self._local = threading.local()
+        # Longer trips are planned first, then generated one day per call in parallel
+        self.fan_out = fan_out or {}
+        # Itineraries already generated for the same preferences are served without an API call
+        self.cache = cache
         print("🤖 ItineraryAgent initialized with Groq client")
     
-    def generate_itinerary(self, preferences: Dict) -> Dict:
+    @property
+    def last_itinerary(self) -> Optional[Dict]:
+        """Complete itinerary of this thread's last stream_itinerary call, set once every day has arrived."""
+        return getattr(self._local, "last_itinerary", None)
+    
+    @last_itinerary.setter
+    def last_itinerary(self, itinerary: Optional[Dict]):
+        self._local.last_itinerary = itinerary
+    
+    def generate_itinerary(self, preferences: Dict, token: Optional[CancellationToken] = None) -> Dict:
         """
         Generate a travel itinerary based on user preferences.
         
         Args:
             preferences (Dict): User's travel preferences
-            
+            token (CancellationToken, optional): Cancels the generation from another thread
+        
         Returns:
             Dict: Generated itinerary
         """
+        itinerary = self._cached_itinerary(preferences)
+        if itinerary is None:
+            itinerary = self._generate_itinerary(preferences, token or CancellationToken())
+            self._cache_itinerary(preferences, itinerary)
+        return itinerary
+    
+    def _cached_itinerary(self, preferences: Dict) -> Optional[Dict]:
+        """Look preferences up in the cache, if there is one."""
+        if self.cache is None:
+            return None
+        start = time.perf_counter()
+        itinerary = self.cache.get(preferences, namespace=self.model_name)
+        if itinerary is not None:
+            print(f"💾 Itinerary cache hit in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return itinerary
+    
+    def _cache_itinerary(self, preferences: Dict, itinerary: Dict):
+        if self.cache is not None:
+            self.cache.put(preferences, itinerary, namespace=self.model_name)
+    
+    def _generate_itinerary(self, preferences: Dict, token: CancellationToken) -> Dict:
+        """Generate an itinerary with the API, in parallel per day for long trips."""
         try:
-            # Prepare the system message with a pre-formatted example
-            system_message = """You are a travel planning assistant. Generate a detailed travel itinerary based on the user's preferences.
-            
-            The itinerary should be returned as a JSON object with the following structure:
-            {
-                "days": [
-                    {
-                        "day_number": 1,
-                        "activities": [
-                            {
-                                "time": "09:00",
-                                "title": "Activity Name",
-                                "description": "**Activity Name**\n\nStart your day with a visit to **Buckingham Palace**, the official residence of the British monarch.\n\n*Important Tips:*\n- Book tickets in advance\n- Arrive 15 minutes early\n- Photography not allowed inside\n\n*Important Notes:*\n> The Changing of the Guard ceremony takes place at 11:00 AM\n\n**Location Details:**\n- Address: `Buckingham Palace, London SW1A 1AA`\n- Nearest Tube: `Green Park Station`\n\n**Getting There:**\nTake the Tube to Green Park Station, then walk 5 minutes",
-                                "duration": "2 hours",
-                                "cost": 30,
-                                "location": "Buckingham Palace, London SW1A 1AA",
-                                "transportation": "Take the Tube to Green Park Station, then walk 5 minutes"
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            Guidelines for the itinerary:
-            1. Each day should have 3-5 activities
-            2. Activities should be spaced throughout the day
-            3. Include transportation details between activities
-            4. Provide realistic costs for each activity
-            5. Use markdown formatting in descriptions for better readability
-            6. Include tips and important notes for each activity
-            7. Consider the user's budget and preferences
-            8. Include a mix of popular attractions and local experiences
-            
-            The itinerary should be well-structured and provide a good balance of activities while staying within the user's budget."""
-            
-            # Prepare the user message
-            user_message = f"""Please generate a travel itinerary based on these preferences:
-            {json.dumps(preferences, indent=2)}"""
+            if self._use_fan_out(preferences):
+                try:
+                    itinerary = run_coroutine(self._generate_fan_out(preferences, int(preferences["duration"]), token)).result()
+                except (groq.APIError, DeadlineExceeded) as e:
+                    print(f"Error in parallel generation: {str(e)}")
+                    itinerary = None
+                if itinerary:
+                    itinerary["summary"] = self._generate_summary(itinerary, preferences)
+                    return itinerary
+                print("⚠️ Parallel generation failed, generating the itinerary in one call")
             
             # Call Groq API
-            completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
+            completion = self.control.call(
+                lambda timeout, attempt_token: self.scheduler.create(
+                    self.client,
+                    priority=PRIORITY_GENERATION,
+                    token=attempt_token,
+                    timeout=timeout,
+                    model=self.model_name,
+                    messages=self._itinerary_messages(preferences),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                ),
+                key=self.model_name,
+                token=token
             )
             
             # Get the response
@@ -88,11 +154,251 @@ class ItineraryAgent:
                 return itinerary
             else:
                 raise Exception("Failed to generate a valid itinerary")
+        
+        except Exception as e:
+            print(f"Error generating itinerary: {str(e)}")
+            raise
+    
+    def stream_itinerary(self, preferences: Dict, token: Optional[CancellationToken] = None) -> Iterator[Dict]:
+        """
+        Generate an itinerary like generate_itinerary, yielding each day as soon as it is complete.
+        
+        A single-call response is streamed through IncrementalItineraryParser,
+        so days arrive in order. With fan-out, days arrive in the order their
+        calls finish, and a failed fan-out falls back to a single streamed
+        call that may repeat day numbers already yielded. Once every day has
+        arrived the validated itinerary, with its summary, is available as
+        last_itinerary.
+        
+        Generation is cancelled when the caller stops reading (the user
+        navigated away or the script was rerun) or token is cancelled.
+        
+        Args:
+            preferences (Dict): User's travel preferences
+            token (CancellationToken, optional): Cancels the generation from another thread
+        
+        Yields:
+            Dict: One validated day at a time
+        """
+        self.last_itinerary = self._cached_itinerary(preferences)
+        if self.last_itinerary is not None:
+            yield from self.last_itinerary["days"]
+            return
+        
+        token = token or CancellationToken()
+        try:
+            yield from self._stream_itinerary(preferences, token)
+        except GeneratorExit:
+            token.cancel()
+            raise
+        self._cache_itinerary(preferences, self.last_itinerary)
+    
+    def _stream_itinerary(self, preferences: Dict, token: CancellationToken) -> Iterator[Dict]:
+        """Generate an itinerary with the API, yielding days as they complete and setting last_itinerary."""
+        try:
+            if self._use_fan_out(preferences):
+                days = queue.Queue()
+                # The event loop runs on its own thread, so days can be yielded while it works
+                future = run_coroutine(
+                    self._generate_fan_out(preferences, int(preferences["duration"]), token, on_day=days.put)
+                )
+                future.add_done_callback(lambda _: days.put(None))
+                while (day := days.get()) is not None:
+                    yield day
+                token.raise_if_cancelled()
+                
+                itinerary = None
+                try:
+                    itinerary = future.result()
+                except (groq.APIError, DeadlineExceeded, RequestCancelled) as e:
+                    print(f"Error in parallel generation: {str(e)}")
+                if itinerary:
+                    itinerary["summary"] = self._generate_summary(itinerary, preferences)
+                    self.last_itinerary = itinerary
+                    return
+                print("⚠️ Parallel generation failed, generating the itinerary in one call")
             
+            parser = IncrementalItineraryParser()
+            deadline = time.monotonic() + self.control.timeout_s
+            stream = self.control.call(
+                lambda timeout, attempt_token: self.scheduler.create(
+                    self.client,
+                    priority=PRIORITY_GENERATION,
+                    token=attempt_token,
+                    timeout=timeout,
+                    model=self.model_name,
+                    messages=self._itinerary_messages(preferences),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                ),
+                key=f"{self.model_name}:stream",
+                token=token,
+                discard=lambda late: late.close()
+            )
+            try:
+                for chunk in stream:
+                    if token.cancelled:
+                        self.control.count("cancelled")
+                        raise RequestCancelled("Request cancelled")
+                    if time.monotonic() > deadline:
+                        self.control.count("timeouts")
+                        raise DeadlineExceeded(f"Itinerary not finished within {self.control.timeout_s:g}s")
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield from parser.feed(chunk.choices[0].delta.content)
+            finally:
+                stream.close()
+            for error in parser.errors:
+                print(f"Error: {error}")
+            
+            itinerary = self._extract_itinerary(parser.text, preferences)
+            if not itinerary:
+                raise Exception("Failed to generate a valid itinerary")
+            itinerary["summary"] = self._generate_summary(itinerary, preferences)
+            self.last_itinerary = itinerary
+        
         except Exception as e:
             print(f"Error generating itinerary: {str(e)}")
             raise
     
+    def _use_fan_out(self, preferences: Dict) -> bool:
+        """Whether a trip is long enough to be generated day by day in parallel."""
+        duration = int(preferences.get("duration") or 0)
+        return self.fan_out.get("enabled", False) and duration >= self.fan_out.get("min_days", 3)
+    
+    def _itinerary_messages(self, preferences: Dict) -> List[Dict]:
+        """Messages asking for a whole itinerary in one call."""
+        # Prepare the user message
+        user_message = f"""Please generate a travel itinerary based on these preferences:
+        {json.dumps(preferences, indent=2)}"""
+        return [
+            {"role": "system", "content": ITINERARY_SYSTEM_MESSAGE},
+            {"role": "user", "content": user_message}
+        ]
+    
+    async def _generate_fan_out(self, preferences: Dict, duration: int, token: CancellationToken, on_day: Optional[Callable[[Dict], None]] = None) -> Optional[Dict]:
+        """
+        Plan the trip with one short call, then generate every day concurrently.
+        
+        Each day call sees the whole plan so days do not repeat each other.
+        At most fan_out.concurrency day calls are in flight at once. The
+        merged days go through the same validation as a single-call itinerary.
+        
+        Args:
+            preferences (Dict): User's travel preferences
+            duration (int): Number of days
+            token (CancellationToken): Cancels every call of the generation
+            on_day (Callable, optional): Called with each day as soon as it is generated
+        
+        Returns:
+            Optional[Dict]: The validated itinerary, or None if planning or any day failed
+        """
+        start = time.perf_counter()
+        plan = await self._plan_days(preferences, duration, token)
+        if plan is None:
+            return None
+        planned = time.perf_counter()
+        
+        semaphore = asyncio.Semaphore(self.fan_out.get("concurrency", 5))
+        days = await asyncio.gather(*(
+            self._generate_day(semaphore, preferences, plan, day_plan, token, on_day) for day_plan in plan
+        ))
+        
+        if any(day is None for day in days):
+            return None
+        print(f"⚡ Generated {duration} days in {time.perf_counter() - start:.1f}s "
+              f"(planning {planned - start:.1f}s)")
+        return self._extract_itinerary(json.dumps({"days": days}), preferences)
+    
+    async def _plan_days(self, preferences: Dict, duration: int, token: CancellationToken) -> Optional[List[Dict]]:
+        """Ask for a short per-day outline of the trip."""
+        # Abandoned attempts are cancelled as tasks, so the attempt token is unused
+        completion = await self.control.call_async(lambda timeout, _attempt_token: self.scheduler.create_async(
+            self.async_client,
+            priority=PRIORITY_GENERATION,
+            timeout=timeout,
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": f"""You are a travel planning assistant. Outline a {duration}-day trip based on the user's preferences.
+                
+                Return only a JSON object with this structure, one entry per day:
+                {{
+                    "days": [
+                        {{
+                            "day_number": 1,
+                            "theme": "Royal London",
+                            "area": "Westminster",
+                            "highlights": ["Buckingham Palace", "Westminster Abbey"],
+                            "budget": 120
+                        }}
+                    ]
+                }}
+                
+                Spread the highlights so no attraction appears on two days, and keep the total budget within the user's budget."""},
+                {"role": "user", "content": f"Preferences:\n{json.dumps(preferences, indent=2)}"}
+            ],
+            temperature=self.temperature,
+            max_tokens=self.fan_out.get("planning_max_tokens", 1500)
+        ), key=f"{self.model_name}:plan", token=token)
+        response_text = completion.choices[0].message.content
+        try:
+            plan = json.loads(response_text[response_text.find('{'):response_text.rfind('}') + 1])["days"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"Error parsing day plan: {str(e)}")
+            return None
+        if not isinstance(plan, list) or len(plan) != duration or not all(isinstance(day, dict) for day in plan):
+            print(f"Error: Day plan has {len(plan) if isinstance(plan, list) else 0} days, expected {duration}")
+            return None
+        for day_number, day_plan in enumerate(plan, 1):
+            day_plan["day_number"] = day_number
+        return plan
+    
+    async def _generate_day(self, semaphore: asyncio.Semaphore, preferences: Dict, plan: List[Dict], day_plan: Dict, token: CancellationToken, on_day: Optional[Callable[[Dict], None]] = None) -> Optional[Dict]:
+        """Generate the activities of one planned day, retrying once on an invalid response."""
+        day_number = day_plan["day_number"]
+        user_message = f"""Please generate day {day_number} of this travel itinerary.
+            
+            Preferences:
+            {json.dumps(preferences, indent=2)}
+            
+            Outline of the whole trip:
+            {json.dumps(plan, indent=2)}
+            
+            Plan for day {day_number}:
+            {json.dumps(day_plan, indent=2)}
+            
+            Return the JSON structure described above with a "days" list holding only day {day_number}."""
+        
+        for attempt in range(2):
+            async with semaphore:
+                completion = await self.control.call_async(
+                    # Abandoned attempts are cancelled as tasks, so the attempt token is unused
+                    lambda timeout, _attempt_token: self.scheduler.create_async(
+                        self.async_client,
+                        priority=PRIORITY_GENERATION,
+                        timeout=timeout,
+                        model=self.model_name,
+                        messages=[
+                            {"role": "system", "content": ITINERARY_SYSTEM_MESSAGE},
+                            {"role": "user", "content": user_message}
+                        ],
+                        temperature=self.temperature,
+                        max_tokens=self.fan_out.get("day_max_tokens", 1500)
+                    ),
+                    # Day calls are shorter than whole itineraries, so their latencies are kept apart
+                    key=f"{self.model_name}:day",
+                    token=token
+                )
+            itinerary = self._extract_itinerary(completion.choices[0].message.content, preferences)
+            if itinerary and itinerary["days"]:
+                day = itinerary["days"][0]
+                day["day_number"] = day_number
+                if on_day is not None:
+                    on_day(day)
+                return day
+            print(f"⚠️ Day {day_number} response was invalid (attempt {attempt + 1})")
+        return None
+    
     def _extract_itinerary(self, response_text: str, preferences: Dict) -> Optional[Dict]:
         """Extract the itinerary from the response text."""
         try:
@@ -137,29 +443,13 @@ class ItineraryAgent:
                 
                 # Validate each day has required fields
                 for day in itinerary_data["days"]:
-                    if not isinstance(day, dict):
-                        print("Error: Day is not a dictionary")
-                        return None
-                    
-                    if "day_number" not in day:
-                        print("Error: Day missing 'day_number'")
-                        return None
-                    
-                    if "activities" not in day:
-                        print("Error: Day missing 'activities'")
-                        return None
-                    
-                    if not isinstance(day["activities"], list):
-                        print("Error: Activities is not a list")
+                    error = validate_day(day)
+                    if error:
+                        print(f"Error: {error}")
                         return None
-                    
-                    # Validate each activity has required fields
-                    for activity in day["activities"]:
-                        required_fields = ["time", "title", "description", "duration", "cost", "location", "transportation"]
-                        for field in required_fields:
-                            if field not in activity:
-                                print(f"Error: Activity missing '{field}'")
-                                return None
+                
+                # Give activities the stable ids chat edits refer to
+                ensure_activity_ids(itinerary_data)
                 
                 # Add metadata from preferences
                 itinerary_data.update({
@@ -181,24 +471,21 @@ class ItineraryAgent:
         """Generate a summary of the itinerary."""
         try:
             # Calculate total cost
-            total_cost = sum(
-                activity["cost"]
-                for day in itinerary["days"]
-                for activity in day["activities"]
-            )
+            trip = Itinerary.from_dict(itinerary)
+            total_cost = trip.total_cost
             
             # Calculate remaining budget
             remaining_budget = preferences.get("budget", 0) - total_cost
             
             # Generate highlights
             highlights = []
-            for day in itinerary["days"]:
+            for day in trip:
                 day_highlights = []
-                for activity in day["activities"]:
-                    if activity.get("cost", 0) > 0:  # Only include paid activities as highlights
-                        day_highlights.append(activity["title"])
+                for activity in day:
+                    if cost_value(activity.cost) > 0:  # Only include paid activities as highlights
+                        day_highlights.append(activity.title)
                 if day_highlights:
-                    highlights.append(f"Day {day['day_number']}: {' and '.join(day_highlights)}")
+                    highlights.append(f"Day {day.day_number}: {' and '.join(day_highlights)}")
             
             # Format the summary using the shared template
             return format_itinerary_summary(
@@ -207,7 +494,7 @@ class ItineraryAgent:
                 remaining_budget=remaining_budget,
                 highlights=highlights
             )
-            
+        
         except Exception as e:
             print(f"Error generating summary: {str(e)}")
             return "Error generating summary" 
\ No newline at end of file
@@ -0,0 +1,115 @@
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+def canonical_preferences(preferences: Dict) -> Dict:
+    """
+    Reduce preferences to the fields that shape an itinerary, in canonical form.
+    
+    The start date is left out: it only labels the trip and does not change
+    which activities are planned.
+    """
+    return {
+        "destination": " ".join(str(preferences.get("destination", "")).split()).casefold(),
+        "duration": int(preferences.get("duration") or 0),
+        "budget": round(float(preferences.get("budget") or 0)),
+        "travel_style": str(preferences.get("travel_style", "")).strip().casefold(),
+        "interests": sorted({str(interest).strip().casefold() for interest in preferences.get("interests", [])}),
+    }
+
+def cache_key(preferences: Dict, namespace: str = "") -> str:
+    """Stable key for a preference set, scoped by a namespace such as the model name."""
+    payload = json.dumps({"namespace": namespace, **canonical_preferences(preferences)}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ItineraryCache:
+    """
+    SQLite-backed cache of generated itineraries.
+    
+    Entries are looked up by cache_key and expire ttl_seconds after they were
+    written. When more than max_entries are stored, the least recently used
+    ones are evicted. Hit and miss counts are kept in the database, so they
+    add up across sessions and app restarts.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Streamlit runs each session on its own thread, so one connection is shared under a lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS itineraries ("
+                "key TEXT PRIMARY KEY, itinerary TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS itineraries_last_used ON itineraries (last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+    
+    def get(self, preferences: Dict, namespace: str = "") -> Optional[Dict]:
+        """
+        Cached itinerary for a preference set, or None.
+        
+        The returned itinerary carries the start date of the given preferences.
+        """
+        key = cache_key(preferences, namespace)
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT itinerary, created FROM itineraries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM itineraries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._db.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                return None
+            self._db.execute("UPDATE itineraries SET last_used = ? WHERE key = ?", (now, key))
+            self._db.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+        
+        itinerary = json.loads(row[0])
+        if preferences.get("start_date"):
+            itinerary["start_date"] = preferences["start_date"]
+        return itinerary
+    
+    def put(self, preferences: Dict, itinerary: Dict, namespace: str = ""):
+        """Store an itinerary, evicting the least recently used entries beyond max_entries."""
+        key = cache_key(preferences, namespace)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO itineraries VALUES (?, ?, ?, ?)",
+                (key, json.dumps(itinerary, ensure_ascii=False), now, now)
+            )
+            self._db.execute(
+                "DELETE FROM itineraries WHERE key IN ("
+                "SELECT key FROM itineraries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+    
+    def clear(self):
+        """Remove every cached itinerary."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM itineraries")
+    
+    def stats(self) -> Dict:
+        """Entry count, hits, misses and hit rate."""
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._db.execute("SELECT COUNT(*) FROM itineraries").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0
+        }
+    
+    def close(self):
+        self._db.close()
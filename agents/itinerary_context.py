@@ -0,0 +1,132 @@
+from typing import Dict, List, Set
+import json
+import re
+
+NUMBER_WORDS = {
+    "one": 1, "first": 1, "two": 2, "second": 2, "three": 3, "third": 3, "four": 4, "fourth": 4,
+    "five": 5, "fifth": 5, "six": 6, "sixth": 6, "seven": 7, "seventh": 7, "eight": 8, "eighth": 8,
+    "nine": 9, "ninth": 9, "ten": 10, "tenth": 10
+}
+
+# Columns every row carries: edits refer to activities by id
+BASE_FIELDS = ["id", "time", "title"]
+
+# Keywords that make an optional column relevant to a question
+FIELD_KEYWORDS = {
+    "duration": ["long", "duration", "hour", "minute", "schedule", "busy", "free time", "move", "reschedule"],
+    "cost": ["cost", "price", "budget", "expensive", "cheap", "money", "spend", "pay", "afford", "free", "$"],
+    "location": ["where", "location", "address", "near", "area", "neighborhood", "neighbourhood", "map", "far", "close"],
+    "transportation": ["get to", "get there", "transport", "taxi", "metro", "subway", "bus", "walk", "train", "drive", "by car", "commute"],
+    "description": ["describe", "about", "detail", "tell me", "what is", "what's", "why", "tip", "recommend", "explain", "more info"],
+}
+
+# Columns used when a question names none of the keywords
+DEFAULT_FIELDS = ["duration", "cost", "location", "transportation"]
+
+DESCRIPTION_CHARS = 100
+
+# "day 2" / "day two" and "second day"; matched separately so "on day 2" is not read as "on day"
+_DAY = re.compile(r"\bday\s+(\d+|[a-z]+)\b")
+_ORDINAL_DAY = re.compile(r"\b([a-z]+)\s+day\b")
+_MARKDOWN = re.compile(r"[*_`#>]+")
+
+def select_fields(question: str) -> List[str]:
+    """Columns of the itinerary table worth sending for a question."""
+    text = question.lower()
+    optional = [field for field, keywords in FIELD_KEYWORDS.items() if any(keyword in text for keyword in keywords)]
+    return BASE_FIELDS + (optional or DEFAULT_FIELDS)
+
+def mentioned_days(question: str) -> Set[int]:
+    """Day numbers a question refers to ("day 2", "day two", "second day")."""
+    text = question.lower()
+    days = set()
+    for word in _DAY.findall(text) + _ORDINAL_DAY.findall(text):
+        if word.isdigit():
+            days.add(int(word))
+        elif word in NUMBER_WORDS:
+            days.add(NUMBER_WORDS[word])
+    return days
+
+def _cell(activity: Dict, field: str) -> str:
+    value = activity.get(field, "")
+    if field == "description":
+        # Drop markdown and the bold title that format_activity_description repeats
+        text = _MARKDOWN.sub("", str(value))
+        title = str(activity.get("title", ""))
+        if title and text.lstrip().startswith(title):
+            text = text.lstrip()[len(title):]
+        text = " ".join(text.split())
+        value = text[:DESCRIPTION_CHARS] + "..." if len(text) > DESCRIPTION_CHARS else text
+    return " ".join(str(value).split()).replace("|", "/")
+
+def compact_context(itinerary: Dict, question: str = "") -> str:
+    """
+    Encode an itinerary as compact tables for the model.
+    
+    Column names are written once in a header row instead of for every
+    activity, and only the columns relevant to the question are included.
+    When the question names days, other days are reduced to an outline of
+    id, time and title so the model can still refer to them.
+    
+    Args:
+        itinerary (Dict): Itinerary to encode
+        question (str): The user's message, used to pick columns and days
+    
+    Returns:
+        str: Trip header, column header and one row per activity, grouped by day
+    """
+    fields = select_fields(question)
+    focus = {day["day_number"] for day in itinerary.get("days", [])} & mentioned_days(question)
+    
+    destination = itinerary.get("destination", "Unknown Destination")
+    duration = itinerary.get("duration", len(itinerary.get("days", [])))
+    trip = f"Trip: {destination}, {duration} days"
+    if itinerary.get("budget"):
+        trip += f", budget ${itinerary['budget']}"
+    lines = [trip, f"Columns: {'|'.join(fields)}"]
+    
+    for day in itinerary.get("days", []):
+        outline = bool(focus) and day["day_number"] not in focus
+        columns = BASE_FIELDS if outline else fields
+        lines.append(f"Day {day['day_number']}" + (f" (outline: {'|'.join(BASE_FIELDS)})" if outline else ""))
+        for activity in day.get("activities", []):
+            lines.append("|".join(_cell(activity, field) for field in columns))
+    return "\n".join(lines)
+
+def json_context(itinerary: Dict, question: str = "") -> str:
+    """The original indented JSON encoding, kept for comparison; the question is ignored."""
+    simplified_itinerary = {
+        "days": [
+            {
+                "day_number": day["day_number"],
+                "activities": [
+                    {
+                        "id": activity.get("id"),
+                        "time": activity["time"],
+                        "title": activity["title"],
+                        "duration": activity["duration"],
+                        "cost": activity["cost"],
+                        "location": activity["location"],
+                        "transportation": activity["transportation"],
+                        "description": activity["description"][:100] + "..." if len(activity["description"]) > 100 else activity["description"]
+                    }
+                    for activity in day["activities"]
+                ]
+            }
+            for day in itinerary["days"]
+        ],
+        "destination": itinerary.get("destination", "Unknown Destination"),
+        "duration": itinerary.get("duration", len(itinerary["days"]))
+    }
+    return json.dumps(simplified_itinerary, indent=2)
+
+CONTEXT_FORMATS = {
+    "compact": compact_context,
+    "json": json_context,
+}
+
+def encode_itinerary(itinerary: Dict, question: str = "", context_format: str = "compact") -> str:
+    """Encode an itinerary for the chat prompt in one of CONTEXT_FORMATS."""
+    if context_format not in CONTEXT_FORMATS:
+        raise ValueError(f"Unknown context format {context_format!r}, expected one of {', '.join(CONTEXT_FORMATS)}")
+    return CONTEXT_FORMATS[context_format](itinerary, question)
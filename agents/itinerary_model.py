@@ -0,0 +1,230 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import re
+
+ACTIVITY_FIELDS = ("id", "time", "title", "description", "duration", "cost", "location", "transportation")
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*(m\.?)?\s*$", re.IGNORECASE)
+
+def cost_value(cost: Any) -> float:
+    """Numeric value of a cost as the model wrote it (30, "30", "$30.50"), 0 when there is none."""
+    if isinstance(cost, (int, float)) and not isinstance(cost, bool):
+        return cost
+    match = _NUMBER.search(str(cost).replace(",", "")) if cost is not None else None
+    if match is None:
+        return 0
+    number = float(match.group())
+    return int(number) if number.is_integer() else number
+
+def time_minutes(time: Any) -> Optional[int]:
+    """Minutes after midnight of an activity time ("9:30", "09:30", "2 PM", "2:00 pm"), None if it is not one."""
+    match = _TIME.match(str(time)) if time is not None else None
+    if match is None or (match.group(2) is None and match.group(3) is None):
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if match.group(3):
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if match.group(3).lower() == "p" else 0)
+    return hour * 60 + minute if hour < 24 and minute < 60 else None
+
+class Activity:
+    """One scheduled activity. Fields outside ACTIVITY_FIELDS are kept in extras."""
+    
+    __slots__ = ACTIVITY_FIELDS + ("extras",)
+    
+    def __init__(self, id: Optional[str] = None, time: str = "", title: str = "", description: str = "",
+                 duration: str = "", cost: Any = 0, location: str = "", transportation: str = "",
+                 extras: Optional[Dict] = None):
+        self.id = id
+        self.time = time
+        self.title = title
+        self.description = description
+        self.duration = duration
+        self.cost = cost
+        self.location = location
+        self.transportation = transportation
+        self.extras = extras or {}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Activity":
+        return cls(
+            **{field: data[field] for field in ACTIVITY_FIELDS if field in data},
+            extras={key: value for key, value in data.items() if key not in ACTIVITY_FIELDS}
+        )
+    
+    def to_dict(self) -> Dict:
+        data = {field: getattr(self, field) for field in ACTIVITY_FIELDS if field != "id" or self.id is not None}
+        data.update(self.extras)
+        return data
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Activity) and self.to_dict() == other.to_dict()
+
+class Day:
+    """
+    The activities of one day, indexed by activity id and title.
+    
+    Activities must be added, removed and updated through the methods here
+    so the indexes and the running cost total stay in step.
+    """
+    
+    __slots__ = ("day_number", "activities", "extras", "total_cost", "_by_id", "_by_title")
+    
+    def __init__(self, day_number: int, activities: Optional[List[Activity]] = None, extras: Optional[Dict] = None):
+        self.day_number = day_number
+        self.activities = []
+        self.extras = extras or {}
+        self.total_cost = 0
+        self._by_id = {}
+        self._by_title = {}
+        for activity in activities or []:
+            self.add(activity)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Day":
+        return cls(
+            data["day_number"],
+            [Activity.from_dict(activity) for activity in data.get("activities", [])],
+            extras={key: value for key, value in data.items() if key not in ("day_number", "activities")}
+        )
+    
+    def to_dict(self) -> Dict:
+        return {"day_number": self.day_number, "activities": [a.to_dict() for a in self.activities], **self.extras}
+    
+    def __iter__(self) -> Iterator[Activity]:
+        return iter(self.activities)
+    
+    def __len__(self) -> int:
+        return len(self.activities)
+    
+    def get(self, activity_id: str) -> Optional[Activity]:
+        return self._by_id.get(activity_id)
+    
+    def find_title(self, title: str) -> Optional[Activity]:
+        """First activity with a title, if any."""
+        return self._by_title.get(title)
+    
+    def add(self, activity: Activity, index: Optional[int] = None):
+        """Insert an activity at index, or append it."""
+        if index is None:
+            self.activities.append(activity)
+        else:
+            self.activities.insert(index, activity)
+        self._index(activity)
+        self.total_cost += cost_value(activity.cost)
+    
+    def remove(self, activity_id: str) -> Activity:
+        activity = self._by_id.pop(activity_id)
+        self.activities.remove(activity)
+        self._unindex_title(activity)
+        self.total_cost -= cost_value(activity.cost)
+        return activity
+    
+    def update(self, activity: Activity, fields: Dict):
+        """Change fields of one of this day's activities."""
+        self.total_cost -= cost_value(activity.cost)
+        self._unindex_title(activity)
+        for key, value in fields.items():
+            if key in ACTIVITY_FIELDS and key != "id":
+                setattr(activity, key, value)
+            elif key != "id":
+                activity.extras[key] = value
+        self._index(activity)
+        self.total_cost += cost_value(activity.cost)
+    
+    def index_of(self, activity_id: str) -> int:
+        return self.activities.index(self._by_id[activity_id])
+    
+    def sort_by_time(self):
+        """Order activities by time of day; ones whose time cannot be read go last, in their current order."""
+        def key(activity: Activity) -> Tuple[int, int]:
+            minutes = time_minutes(activity.time)
+            return (0, minutes) if minutes is not None else (1, 0)
+        self.activities.sort(key=key)
+    
+    def _index(self, activity: Activity):
+        if activity.id is not None:
+            self._by_id[activity.id] = activity
+        self._by_title.setdefault(activity.title, activity)
+    
+    def _unindex_title(self, activity: Activity):
+        if self._by_title.get(activity.title) is activity:
+            del self._by_title[activity.title]
+            # Another activity may share the title
+            replacement = next((a for a in self.activities if a.title == activity.title and a is not activity), None)
+            if replacement is not None:
+                self._by_title[activity.title] = replacement
+
+class Itinerary:
+    """
+    A trip as Day and Activity objects, with O(1) lookups by day number and
+    activity id and a running total cost.
+    
+    Trip-level fields (destination, budget, summary, ...) are kept in metadata
+    and round-trip through to_dict and from_dict unchanged.
+    """
+    
+    __slots__ = ("days", "metadata", "_days_by_number", "_day_of_activity")
+    
+    def __init__(self, days: Optional[List[Day]] = None, metadata: Optional[Dict] = None):
+        self.days = []
+        self.metadata = metadata or {}
+        self._days_by_number = {}
+        self._day_of_activity = {}
+        for day in days or []:
+            self.add_day(day)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Itinerary":
+        return cls(
+            [Day.from_dict(day) for day in data.get("days", [])],
+            metadata={key: value for key, value in data.items() if key != "days"}
+        )
+    
+    @classmethod
+    def from_json(cls, text: str) -> "Itinerary":
+        return cls.from_dict(json.loads(text))
+    
+    def to_dict(self) -> Dict:
+        return {"days": [day.to_dict() for day in self.days], **self.metadata}
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+    
+    def __iter__(self) -> Iterator[Day]:
+        return iter(self.days)
+    
+    @property
+    def total_cost(self) -> float:
+        return sum(day.total_cost for day in self.days)
+    
+    def add_day(self, day: Day):
+        self.days.append(day)
+        self._days_by_number[day.day_number] = day
+        for activity in day:
+            if activity.id is not None:
+                self._day_of_activity[activity.id] = day
+    
+    def day(self, day_number: int) -> Optional[Day]:
+        return self._days_by_number.get(day_number)
+    
+    def activity(self, activity_id: str) -> Optional[Tuple[Day, Activity]]:
+        """The day holding an activity and the activity itself, or None."""
+        day = self._day_of_activity.get(activity_id)
+        return (day, day.get(activity_id)) if day is not None else None
+    
+    def add_activity(self, day_number: int, activity: Activity, index: Optional[int] = None):
+        day = self._days_by_number[day_number]
+        day.add(activity, index)
+        if activity.id is not None:
+            self._day_of_activity[activity.id] = day
+    
+    def remove_activity(self, activity_id: str) -> Activity:
+        day = self._day_of_activity.pop(activity_id)
+        return day.remove(activity_id)
+    
+    def update_activity(self, activity_id: str, fields: Dict):
+        day, activity = self.activity(activity_id)
+        day.update(activity, fields)
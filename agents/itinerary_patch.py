@@ -0,0 +1,161 @@
+from typing import Dict, List, Optional, Set, Tuple
+import json
+import re
+from .stream_parser import REQUIRED_ACTIVITY_FIELDS
+from .itinerary_model import Activity, Itinerary
+
+EDIT_OPS = ("add", "remove", "update", "move")
+
+_ID = re.compile(r"^a(\d+)$")
+
+# Instructions appended to the chat system prompt describing the edit format
+EDIT_INSTRUCTIONS = """To change the itinerary, do NOT repeat the itinerary. Explain the change briefly, then end your reply with one JSON object listing only the edits:
+{"edits": [
+    {"op": "update", "id": "a3", "fields": {"time": "13:00", "cost": 25}},
+    {"op": "remove", "id": "a7"},
+    {"op": "add", "day": 2, "after": "a5", "activity": {"time": "15:00", "title": "...", "description": "...", "duration": "1 hour", "cost": 10, "location": "...", "transportation": "..."}},
+    {"op": "move", "id": "a4", "day": 3, "fields": {"time": "10:00"}}
+]}
+Activities are referred to by their "id". "fields" may hold any of: time, title, description, duration, cost, location, transportation. "after" is optional; without it an added or moved activity is placed by its time. Only include the JSON when the user asked for a change."""
+
+def ensure_activity_ids(itinerary: Dict) -> Dict:
+    """
+    Give every activity a stable id ("a1", "a2", ...) if it does not have one yet.
+    
+    Ids are never reused or renumbered, so edits can keep referring to an
+    activity after its title or time changes. The itinerary is updated in place.
+    """
+    next_id = _next_id_number(itinerary)
+    for day in itinerary.get("days", []):
+        for activity in day.get("activities", []):
+            if not activity.get("id"):
+                activity["id"] = f"a{next_id}"
+                next_id += 1
+    return itinerary
+
+def _next_id_number(itinerary: Dict) -> int:
+    numbers = [
+        int(match.group(1))
+        for day in itinerary.get("days", [])
+        for activity in day.get("activities", [])
+        if (match := _ID.match(str(activity.get("id", ""))))
+    ]
+    return max(numbers, default=0) + 1
+
+def extract_edits(response_text: str) -> Optional[List[Dict]]:
+    """The edits list of the last {"edits": [...]} object in a response, or None if there is none."""
+    matches = list(re.finditer(r'\{\s*"edits"\s*:', response_text))
+    if not matches:
+        return None
+    start = matches[-1].start()
+    try:
+        # raw_decode stops at the end of the object, ignoring any text after it
+        data, _ = json.JSONDecoder(strict=False).raw_decode(response_text[start:])
+    except json.JSONDecodeError as e:
+        print(f"Error parsing edits: {str(e)}")
+        return None
+    edits = data.get("edits") if isinstance(data, dict) else None
+    return edits if isinstance(edits, list) else None
+
+def validate_edits(edits: List[Dict], itinerary: Dict) -> List[str]:
+    """
+    Check edits against an itinerary before applying them.
+    
+    Edits are checked in order, so an activity removed by an earlier edit
+    cannot be referred to by a later one.
+    
+    Returns:
+        List[str]: One message per problem, empty when every edit can be applied
+    """
+    errors = []
+    days = {day["day_number"] for day in itinerary.get("days", [])}
+    ids = {activity.get("id") for day in itinerary.get("days", []) for activity in day.get("activities", [])}
+    for i, edit in enumerate(edits):
+        prefix = f"Edit {i + 1}"
+        if not isinstance(edit, dict) or edit.get("op") not in EDIT_OPS:
+            errors.append(f"{prefix}: op must be one of {', '.join(EDIT_OPS)}")
+            continue
+        op = edit["op"]
+        
+        if op != "add" and edit.get("id") not in ids:
+            errors.append(f"{prefix}: unknown activity id {edit.get('id')!r}")
+            continue
+        if op in ("add", "move") and edit.get("day") not in days:
+            errors.append(f"{prefix}: unknown day {edit.get('day')!r}")
+        if edit.get("after") is not None and (edit["after"] not in ids or edit["after"] == edit.get("id")):
+            errors.append(f"{prefix}: invalid activity id {edit['after']!r} in 'after'")
+        
+        fields = edit.get("fields", {})
+        if op in ("update", "move"):
+            if not isinstance(fields, dict) or (op == "update" and not fields):
+                errors.append(f"{prefix}: 'fields' must be an object of activity fields")
+            else:
+                unknown = set(fields) - set(REQUIRED_ACTIVITY_FIELDS)
+                if unknown:
+                    errors.append(f"{prefix}: unknown fields {', '.join(sorted(unknown))}")
+        if op == "add":
+            activity = edit.get("activity")
+            if not isinstance(activity, dict):
+                errors.append(f"{prefix}: 'activity' must be an object")
+            else:
+                missing = [field for field in REQUIRED_ACTIVITY_FIELDS if field not in activity]
+                if missing:
+                    errors.append(f"{prefix}: activity missing {', '.join(missing)}")
+        if op == "remove":
+            ids.discard(edit["id"])
+    return errors
+
+def apply_edits(itinerary: Dict, edits: List[Dict]) -> Tuple[Dict, Set[str]]:
+    """
+    Apply validated edits to a copy of an itinerary.
+    
+    Activities without an id are given one in place first. The edits are
+    applied to an indexed Itinerary, so each one is found by id without
+    scanning the trip.
+    
+    Returns:
+        Tuple[Dict, Set[str]]: The edited copy and the ids of activities whose
+            description was written by the edits (added, or with a new description)
+    """
+    edited = Itinerary.from_dict(ensure_activity_ids(itinerary))
+    next_id = _next_id_number(itinerary)
+    described = set()
+    placed_by_time = set()
+    
+    def insert(day_number: int, activity: Activity, after: Optional[str]):
+        day = edited.day(day_number)
+        if after is not None and day.get(after) is not None:
+            edited.add_activity(day_number, activity, day.index_of(after) + 1)
+            return
+        edited.add_activity(day_number, activity)
+        placed_by_time.add(day_number)
+    
+    for edit in edits:
+        op = edit["op"]
+        fields = edit.get("fields", {})
+        if op == "add":
+            activity = Activity.from_dict({field: edit["activity"][field] for field in REQUIRED_ACTIVITY_FIELDS})
+            activity.id = f"a{next_id}"
+            next_id += 1
+            insert(edit["day"], activity, edit.get("after"))
+            described.add(activity.id)
+        elif op == "remove":
+            edited.remove_activity(edit["id"])
+            described.discard(edit["id"])
+        elif op == "update":
+            edited.update_activity(edit["id"], fields)
+            if "description" in fields:
+                described.add(edit["id"])
+            if "time" in fields:
+                placed_by_time.add(edited.activity(edit["id"])[0].day_number)
+        elif op == "move":
+            activity = edited.remove_activity(edit["id"])
+            insert(edit["day"], activity, edit.get("after"))
+            edited.update_activity(edit["id"], fields)
+            if "description" in fields:
+                described.add(edit["id"])
+    
+    # Keep days whose activities were appended or retimed in time order
+    for day_number in placed_by_time:
+        edited.day(day_number).sort_by_time()
+    return edited.to_dict(), described
@@ -0,0 +1,260 @@
+from typing import Dict, Optional
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import groq
+from .conversation_memory import message_tokens
+from .request_control import POLL_SECONDS, CancellationToken
+
+# Lower values are admitted first
+PRIORITY_CHAT = 0
+PRIORITY_GENERATION = 10
+
+class TokenBucket:
+    """Refills at capacity per minute, continuously; starts full."""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_for(self, amount: float) -> float:
+        """Seconds until amount is available, 0 if it is now."""
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+    
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "tokens", "enqueued")
+    
+    def __init__(self, priority: int, seq: int, tokens: int):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+    
+    def __lt__(self, other: "_Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and connection problems are worth retrying."""
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, groq.APIConnectionError)
+
+def retry_after(error: Exception) -> float:
+    """Delay the server asked for in a Retry-After header, 0 if none."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+class LLMScheduler:
+    """
+    Admits every chat completion call of the process against shared rate limits.
+    
+    Calls wait in a priority queue (chat before bulk itinerary generation,
+    first come first served within a priority) until both the requests-per-
+    minute and tokens-per-minute buckets can cover them. A call reserves
+    its estimated prompt tokens plus max_tokens; the unused part is refunded
+    from the usage the API reports. Rate limits, 5xx responses and
+    connection errors are retried with full-jitter exponential backoff,
+    never sooner than a Retry-After header asks.
+    
+    Streaming calls are admitted and retried the same way, but only until
+    the stream is opened. A cancelled call leaves the queue and is not
+    retried, so abandoned requests do not use up the limits.
+    """
+    
+    def __init__(self, requests_per_minute: float = 30, tokens_per_minute: float = 30000,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._metrics = {
+            "submitted": 0, "admitted": 0, "completed": 0, "failed": 0, "retries": 0, "rate_limited": 0,
+            "max_queue_depth": 0, "total_wait_s": 0.0, "max_wait_s": 0.0
+        }
+    
+    def create(self, client: "groq.Groq", priority: int = PRIORITY_CHAT, token: Optional[CancellationToken] = None, **kwargs):
+        """
+        Call client.chat.completions.create(**kwargs) once admitted, retrying transient errors.
+        
+        Raises RequestCancelled if token is cancelled while the call waits to be admitted or retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            if token is not None:
+                token.raise_if_cancelled()
+            reserved = self._admit(self._enqueue(priority, kwargs), token)
+            try:
+                result = client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                if token is not None:
+                    token.sleep(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            self._completed(result, reserved)
+            return result
+    
+    async def create_async(self, client: "groq.AsyncGroq", priority: int = PRIORITY_CHAT, **kwargs):
+        """Async variant of create, for AsyncGroq clients; waiting never blocks the event loop."""
+        for attempt in range(self.max_retries + 1):
+            reserved = await self._admit_async(self._enqueue(priority, kwargs))
+            try:
+                result = await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._completed(result, reserved)
+            return result
+    
+    def _enqueue(self, priority: int, kwargs: Dict) -> _Ticket:
+        tokens = sum(message_tokens(message) for message in kwargs.get("messages", [])) + kwargs.get("max_tokens", 0)
+        ticket = _Ticket(priority, next(self._seq), tokens)
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+            self._metrics["submitted"] += 1
+            self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], len(self._queue))
+        return ticket
+    
+    def _try_admit(self, ticket: _Ticket) -> Optional[float]:
+        """
+        Admit a ticket if it is first in line and the buckets cover it; call under the lock.
+        
+        Returns:
+            Optional[float]: 0 when admitted, otherwise seconds to wait before
+                trying again (None while another ticket is ahead)
+        """
+        if self._queue[0] is not ticket:
+            return None
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        wait = max(self._requests.wait_for(1), self._tokens.wait_for(ticket.tokens))
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        self._requests.take(1)
+        self._tokens.take(ticket.tokens)
+        waited = now - ticket.enqueued
+        self._metrics["admitted"] += 1
+        self._metrics["total_wait_s"] += waited
+        self._metrics["max_wait_s"] = max(self._metrics["max_wait_s"], waited)
+        # The next ticket may be admissible right away
+        self._changed.notify_all()
+        return 0.0
+    
+    def _admit(self, ticket: _Ticket, token: Optional[CancellationToken] = None) -> int:
+        with self._changed:
+            try:
+                while (wait := self._try_admit(ticket)) != 0:
+                    if token is not None:
+                        token.raise_if_cancelled()
+                        wait = min(wait if wait is not None else 1.0, POLL_SECONDS)
+                    self._changed.wait(wait if wait is not None else 1.0)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+        return ticket.tokens
+    
+    async def _admit_async(self, ticket: _Ticket) -> int:
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(ticket)
+                if wait == 0:
+                    return ticket.tokens
+                await asyncio.sleep(min(wait, 1.0) if wait is not None else 0.02)
+        except BaseException:
+            with self._lock:
+                self._abandon(ticket)
+            raise
+    
+    def _abandon(self, ticket: _Ticket):
+        # Call under the lock: drop a ticket that gave up waiting
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._changed.notify_all()
+    
+    def _failed(self, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed call; the delay before retrying it, or None to give up."""
+        with self._lock:
+            if isinstance(error, groq.RateLimitError):
+                self._metrics["rate_limited"] += 1
+            if not is_retryable(error) or attempt >= self.max_retries:
+                self._metrics["failed"] += 1
+                return None
+            self._metrics["retries"] += 1
+        delay = max(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)), retry_after(error))
+        print(f"⚠️ LLM call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+        return delay
+    
+    def _completed(self, result, reserved: int):
+        # Streams report no usage up front, so their reservation stands
+        usage = getattr(result, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        with self._lock:
+            self._metrics["completed"] += 1
+            if isinstance(used, int) and used < reserved:
+                self._tokens.refund(reserved - used)
+    
+    def stats(self) -> Dict:
+        """Queue depth, counters and waiting times."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["queue_depth"] = len(self._queue)
+            metrics["queued_by_priority"] = {}
+            for ticket in self._queue:
+                metrics["queued_by_priority"][ticket.priority] = metrics["queued_by_priority"].get(ticket.priority, 0) + 1
+        metrics["mean_wait_s"] = metrics["total_wait_s"] / metrics["admitted"] if metrics["admitted"] else 0.0
+        return metrics
+
+_scheduler = {"settings": None, "scheduler": None}
+_scheduler_lock = threading.Lock()
+
+def get_scheduler(settings: Optional[Dict] = None) -> LLMScheduler:
+    """
+    The process-wide scheduler, so every session and agent is under one set of limits.
+    
+    Pass the config.yaml llm.scheduler settings to create it, or to replace
+    it when they changed (requests already queued are admitted by the old
+    one). Without settings the current scheduler is returned, created with
+    the defaults if there is none yet.
+    """
+    with _scheduler_lock:
+        key = json.dumps(settings, sort_keys=True) if settings is not None else _scheduler["settings"]
+        if _scheduler["scheduler"] is None or key != _scheduler["settings"]:
+            if _scheduler["scheduler"] is not None:
+                print("🔄 Rebuilt the LLM scheduler for new settings")
+            _scheduler["scheduler"] = LLMScheduler(**(settings or {}))
+            _scheduler["settings"] = json.dumps(settings or {}, sort_keys=True)
+        return _scheduler["scheduler"]
@@ -0,0 +1,244 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import re
+import threading
+from .itinerary_context import mentioned_days
+from .itinerary_model import Activity, Day, Itinerary, cost_value
+from .model_router import asks_for_change
+
+_WORD = re.compile(r"[a-z0-9']+")
+_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(hour|hr|h\b|minute|min)")
+
+_COST = re.compile(r"\b(cost|costs|price|prices|spend|spending|expensive|how much)\b")
+_TOTAL = re.compile(r"\b(total|whole trip|entire trip|overall|altogether|all together|all the activities)\b")
+_BUDGET_LEFT = re.compile(
+    r"\b(budget (left|remaining|remains)|left (in|of|from) (my|the) budget|remaining budget|over budget|"
+    r"under budget|within (my|the) budget|(money|budget) (is |do i have )?left)\b"
+)
+_SCHEDULE = re.compile(
+    r"\b(what('s| is) (on|planned|happening|scheduled)|what am i doing|what do i do|what are we doing|"
+    r"plan for|schedule for|itinerary for|activities (on|for)|what's the plan)\b"
+)
+_AT_TIME = re.compile(r"\b(what|anything|happening|doing|planned|scheduled|busy|free)\b")
+_WHERE = re.compile(r"\bwhere\b")
+_WHEN = re.compile(r"\b(what time|when)\b")
+
+# Words that describe the question rather than the activity it is about
+_STOPWORDS = {
+    "the", "and", "for", "what", "where", "when", "time", "does", "how", "much", "cost", "costs", "price",
+    "day", "days", "my", "our", "trip", "are", "this", "that", "with", "about", "start", "starts", "begin",
+    "visit", "going", "get", "located", "location", "is", "it", "at", "to", "of", "on", "in", "a", "an",
+    "i", "we", "do", "will", "be", "there", "which", "planned", "scheduled", "first", "second", "third"
+}
+
+def _money(value: float) -> str:
+    return f"${value:,.2f}" if isinstance(value, float) and not value.is_integer() else f"${int(value):,}"
+
+def _words(text: str) -> set:
+    return {word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS and len(word) > 2}
+
+def _minutes(text: str) -> Optional[int]:
+    """Minutes after midnight of a time like "14:30", "2pm" or "2:30 pm", None if there is none."""
+    match = _TIME.search(text.lower())
+    if match is None:
+        return None
+    if match.group(3):
+        hour, minute = int(match.group(1)) % 12, int(match.group(2) or 0)
+        hour += 12 if match.group(3) == "pm" else 0
+    else:
+        hour, minute = int(match.group(4)), int(match.group(5))
+    return hour * 60 + minute if hour < 24 and minute < 60 else None
+
+def _duration_minutes(duration: str) -> Optional[int]:
+    total = 0.0
+    for amount, unit in _DURATION.findall(str(duration).lower()):
+        total += float(amount) * (60 if unit.startswith("h") else 1)
+    return int(total) or None
+
+class LocalAnswerEngine:
+    """
+    Answers read-only itinerary questions from the itinerary itself, without calling the API.
+    
+    Each intent handler (budget left, total or day cost, day schedule, what
+    happens at a time, where, when or how much an activity is) returns an
+    answer with a confidence. The most confident answer is used only if it
+    reaches min_confidence; anything else, and every message that asks
+    for a change, goes to the model.
+    """
+    
+    def __init__(self, min_confidence: float = 0.8):
+        self.min_confidence = min_confidence
+        self._handlers: List[Callable[[str, Itinerary], Optional[Tuple[float, str]]]] = [
+            self._budget_left, self._trip_cost, self._day_cost, self._day_schedule,
+            self._at_time, self._activity_where, self._activity_when, self._activity_cost
+        ]
+        self._lock = threading.Lock()
+        self.answered = {}
+        self.passed = 0
+    
+    def answer(self, message: str, itinerary: Optional[Dict]) -> Optional[Dict]:
+        """
+        Local answer to a message about an itinerary, or None to ask the model.
+        
+        Returns:
+            Optional[Dict]: "message", "intent" and "confidence" of the answer
+        """
+        if not itinerary or not itinerary.get("days") or asks_for_change(message) or message.count("?") > 1:
+            self._count(None)
+            return None
+        trip = Itinerary.from_dict(itinerary)
+        text = message.lower()
+        best = None
+        for handler in self._handlers:
+            result = handler(text, trip)
+            if result is not None and (best is None or result[0] > best[0]):
+                best = (result[0], result[1], handler.__name__.lstrip("_"))
+        if best is None or best[0] < self.min_confidence:
+            self._count(None)
+            return None
+        self._count(best[2])
+        return {"message": best[1], "intent": best[2], "confidence": best[0]}
+    
+    def _count(self, intent: Optional[str]):
+        with self._lock:
+            if intent is None:
+                self.passed += 1
+            else:
+                self.answered[intent] = self.answered.get(intent, 0) + 1
+    
+    def stats(self) -> Dict:
+        """Answers per intent, messages passed to the model and the share answered locally."""
+        with self._lock:
+            answered = dict(self.answered)
+            passed = self.passed
+        total = sum(answered.values()) + passed
+        return {
+            "answered": answered,
+            "passed_to_model": passed,
+            "local_rate": sum(answered.values()) / total if total else 0.0
+        }
+    
+    # Intent handlers: each returns (confidence, answer) or None when the intent does not apply
+    
+    def _budget_left(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        budget = cost_value(trip.metadata.get("budget"))
+        if not _BUDGET_LEFT.search(text) or not budget:
+            return None
+        spent = trip.total_cost
+        left = budget - spent
+        if left >= 0:
+            return 0.95, f"Planned activities cost {_money(spent)} of your {_money(budget)} budget, leaving {_money(left)}."
+        return 0.95, f"Planned activities cost {_money(spent)}, which is {_money(-left)} over your {_money(budget)} budget."
+    
+    def _trip_cost(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        if not _COST.search(text) or not _TOTAL.search(text) or mentioned_days(text):
+            return None
+        lines = [f"The planned activities cost {_money(trip.total_cost)} in total:"]
+        lines += [f"- Day {day.day_number}: {_money(day.total_cost)}" for day in trip]
+        return 0.9, "\n".join(lines)
+    
+    def _day_cost(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        days = self._days(text, trip)
+        if not _COST.search(text) or not days:
+            return None
+        lines = [
+            f"Day {day.day_number} activities cost {_money(day.total_cost)} ({len(day)} {'activity' if len(day) == 1 else 'activities'})."
+            for day in days
+        ]
+        # A question naming an activity is better answered by _activity_cost
+        return (0.7 if self._match(text, trip)[1] else 0.9), "\n".join(lines)
+    
+    def _day_schedule(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        days = self._days(text, trip)
+        if not _SCHEDULE.search(text) or not days or _minutes(text) is not None:
+            return None
+        lines = []
+        for day in days:
+            lines.append(f"**Day {day.day_number}**")
+            lines += [f"- {a.time} {a.title} ({a.duration}, {_money(cost_value(a.cost))})" for a in day]
+        return 0.9, "\n".join(lines)
+    
+    def _at_time(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        minute = _minutes(text)
+        if minute is None or not _AT_TIME.search(text):
+            return None
+        days = self._days(text, trip) or trip.days
+        lines = []
+        for day in days:
+            for activity in day:
+                start = _minutes(str(activity.time))
+                length = _duration_minutes(activity.duration) or 1
+                if start is not None and start <= minute < start + length:
+                    lines.append(f"Day {day.day_number}: {activity.title} ({activity.time}, {activity.duration}) at {activity.location}")
+        at = f"{minute // 60:02d}:{minute % 60:02d}"
+        if not lines:
+            where = ", ".join(f"day {day.day_number}" for day in days) if len(days) < len(trip.days) else "any day"
+            return 0.85, f"Nothing is scheduled at {at} on {where}."
+        return (0.9 if len(days) == 1 or len(lines) == 1 else 0.85), f"At {at}:\n" + "\n".join(f"- {line}" for line in lines)
+    
+    def _activity_where(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        if not _WHERE.search(text):
+            return None
+        (day, activity), confidence = self._match(text, trip)
+        if activity is None:
+            return None
+        answer = f"{activity.title} (day {day.day_number}, {activity.time}) is at {activity.location}."
+        if activity.transportation:
+            answer += f"\n\nGetting there: {activity.transportation}"
+        return confidence, answer
+    
+    def _activity_when(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        if not _WHEN.search(text) or _minutes(text) is not None:
+            return None
+        (day, activity), confidence = self._match(text, trip)
+        if activity is None:
+            return None
+        return confidence, f"{activity.title} is on day {day.day_number} at {activity.time} ({activity.duration})."
+    
+    def _activity_cost(self, text: str, trip: Itinerary) -> Optional[Tuple[float, str]]:
+        if not _COST.search(text):
+            return None
+        (day, activity), confidence = self._match(text, trip)
+        if activity is None:
+            return None
+        return confidence, f"{activity.title} (day {day.day_number}, {activity.time}) costs {_money(cost_value(activity.cost))}."
+    
+    def _days(self, text: str, trip: Itinerary) -> List[Day]:
+        """Days of the trip the question names."""
+        return [trip.day(number) for number in sorted(mentioned_days(text)) if trip.day(number) is not None]
+    
+    def _match(self, text: str, trip: Itinerary) -> Tuple[Tuple[Optional[Day], Optional[Activity]], float]:
+        """
+        The activity a question is about, by the words it shares with each title.
+        
+        The question's words have to be explained by the title: each one the
+        title does not contain ("taxi", "near", "open") lowers the score
+        sharply, so "Where is the Eiffel Tower?" names that activity but "Where
+        should I eat near the Eiffel Tower?" is left to the model. Title words
+        the question leaves out cost little, so "lunch" still names "Lunch at
+        Cafe de Flore" when it is the only lunch on the days asked about.
+        
+        Returns:
+            Tuple: (day, activity) or (None, None), and the confidence of the match;
+                only a unique match explaining every word of the question reaches 0.8
+        """
+        words = _words(text)
+        if not words:
+            return (None, None), 0.0
+        scored = []
+        for day in self._days(text, trip) or trip.days:
+            for activity in day:
+                title_words = _words(activity.title)
+                shared = len(words & title_words)
+                if shared:
+                    explained = shared / len(words)
+                    covered = shared / len(title_words)
+                    scored.append((0.9 * explained ** 2 + 0.1 * covered, day, activity))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if not scored or scored[0][0] < 0.5:
+            return (None, None), 0.0
+        score, day, activity = scored[0]
+        if len(scored) > 1 and scored[1][0] == score:
+            # Two activities (or the same one on two days) match equally well: let the model ask which
+            return (day, activity), 0.4
+        return (day, activity), score
@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional
+from collections import deque
+import re
+import threading
+
+ROUTES = ("qa", "edit", "regenerate")
+
+# Route used when the model of another route fails or gives an unusable answer
+FALLBACK_ROUTE = {"qa": "edit", "edit": "regenerate", "regenerate": None}
+
+DEFAULT_ROUTES = {
+    "qa": {"model": "llama-3.1-8b-instant", "max_tokens": 1000},
+    "edit": {"model": "llama-3.3-70b-versatile", "max_tokens": 2000},
+    "regenerate": {"model": "llama-3.3-70b-versatile", "max_tokens": 4000},
+}
+
+_REGENERATE = re.compile(
+    r"\b(regenerate|redo|rewrite|start over|from scratch|new itinerary|plan again|replan|re-plan)\b"
+)
+# "the whole trip" only asks for a rewrite next to a verb that changes it; "how much
+# does the whole trip cost?" is a question
+_WHOLE_TRIP = re.compile(r"\b(whole|entire|full|complete) (trip|itinerary|plan|schedule)\b")
+_EDIT = re.compile(
+    r"\b(change|move|replace|swap|switch|add|remove|delete|drop|cancel|skip|reschedule|shift|"
+    r"push|postpone|update|modify|adjust|extend|shorten|instead|make it|make the|put)\b"
+)
+
+def classify_request(message: str, has_itinerary: bool = True) -> str:
+    """
+    Route for a chat message: "qa" for read-only questions, "edit" for
+    changes to a few activities, "regenerate" for rewriting the whole trip.
+    
+    Without an itinerary there is nothing to edit, so only a request for a
+    new plan leaves the "qa" route.
+    """
+    text = message.lower()
+    if _REGENERATE.search(text) or (_WHOLE_TRIP.search(text) and _EDIT.search(text)):
+        return "regenerate"
+    if has_itinerary and _EDIT.search(text):
+        return "edit"
+    return "qa"
+
+def asks_for_change(message: str) -> bool:
+    """Whether a message asks to change the itinerary (an edit or a rewrite) rather than about it."""
+    text = message.lower()
+    return bool(_REGENERATE.search(text) or _EDIT.search(text))
+
+class ModelRouter:
+    """
+    Picks the model and token limit for each chat request and records how each route performs.
+    
+    Per route it keeps the request count, the latencies of the most recent
+    requests and how often the answer had to be redone on the fallback
+    route (an API error or an unusable answer from the route's model).
+    """
+    
+    def __init__(self, routes: Optional[Dict] = None, enabled: bool = True, window: int = 500):
+        """
+        Args:
+            routes (Dict, optional): Model and max_tokens per route, merged over DEFAULT_ROUTES
+            enabled (bool): When False every request takes the "regenerate" route,
+                which matches the single model used before routing
+            window (int): Number of recent latencies kept per route
+        """
+        self.routes = {name: {**DEFAULT_ROUTES[name], **(routes or {}).get(name, {})} for name in ROUTES}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"requests": 0, "fallbacks": 0, "latencies": deque(maxlen=window)} for name in ROUTES
+        }
+    
+    def route(self, message: str, has_itinerary: bool = True) -> str:
+        return classify_request(message, has_itinerary) if self.enabled else "regenerate"
+    
+    def settings(self, route: str) -> Dict:
+        """Model and max_tokens of a route."""
+        return self.routes[route]
+    
+    def fallback(self, route: str) -> Optional[str]:
+        """Route to redo a request on, or None if there is none."""
+        fallback = FALLBACK_ROUTE[route]
+        # Only worth it when the fallback actually uses a different model
+        while fallback is not None and self.routes[fallback]["model"] == self.routes[route]["model"]:
+            fallback = FALLBACK_ROUTE[fallback]
+        return fallback
+    
+    def record(self, route: str, latency: float, fell_back: bool = False):
+        with self._lock:
+            stats = self._stats[route]
+            stats["requests"] += 1
+            stats["latencies"].append(latency)
+            if fell_back:
+                stats["fallbacks"] += 1
+    
+    def stats(self) -> Dict:
+        """Per route: model, request and fallback counts, p50 and p95 latency in seconds."""
+        result = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                latencies = sorted(stats["latencies"])
+                result[name] = {
+                    "model": self.routes[name]["model"],
+                    "requests": stats["requests"],
+                    "fallbacks": stats["fallbacks"],
+                    "p50_s": _percentile(latencies, 50),
+                    "p95_s": _percentile(latencies, 95)
+                }
+        return result
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
@@ -0,0 +1,193 @@
+from typing import Dict, Optional
+import os
+import threading
+import groq
+import httpx
+import json
+import yaml
+from .chat_agent import ChatAgent
+from .itinerary_agent import ItineraryAgent
+from .itinerary_cache import ItineraryCache
+from .llm_scheduler import get_scheduler
+from .model_router import ModelRouter
+from .local_answers import LocalAnswerEngine
+from .request_control import get_request_controller
+from .semantic_cache import SemanticCache
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+
+# Process-wide objects shared by every Streamlit session and rerun
+_lock = threading.RLock()
+_config = {"mtime": None, "data": None, "version": 0}
+_clients = {"sync": (None, None), "async": (None, None)}
+_caches = {}
+_itinerary_agent = {"version": None, "agent": None}
+
+def get_config(path: str = CONFIG_PATH) -> Dict:
+    """
+    The parsed config, reloaded only when the file's modification time changes.
+    
+    Treat the returned dict as read-only: it is shared by every session.
+    """
+    mtime = os.stat(path).st_mtime
+    with _lock:
+        if _config["mtime"] != mtime:
+            with open(path, 'r') as f:
+                _config["data"] = yaml.safe_load(f)
+            if _config["mtime"] is not None:
+                print(f"🔄 Reloaded {os.path.basename(path)}")
+            _config["mtime"] = mtime
+            _config["version"] += 1
+        return _config["data"]
+
+def _limits(pool: Dict) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool.get("max_connections", 100),
+        max_keepalive_connections=pool.get("max_keepalive_connections", 20),
+        keepalive_expiry=pool.get("keepalive_expiry", 30.0)
+    )
+
+def get_client(api_key: str, pool: Optional[Dict] = None) -> groq.Groq:
+    """
+    The shared Groq client, with a keep-alive connection pool.
+    
+    Reusing the client keeps TLS connections open between requests and
+    bounds the sockets held open however many sessions there are.
+    Retries are left to the LLM scheduler. A new client is made when the
+    API key or the config.yaml llm.pool settings change.
+    """
+    pool = pool or {}
+    key = (api_key, json.dumps(pool, sort_keys=True))
+    with _lock:
+        if _clients["sync"][0] != key:
+            if _clients["sync"][0] is not None:
+                print("🔄 Rebuilt the Groq client for new settings")
+            # Calls in flight keep the client they started with
+            _clients["sync"] = (key, groq.Groq(
+                api_key=api_key,
+                max_retries=0,
+                http_client=groq.DefaultHttpxClient(limits=_limits(pool))
+            ))
+        return _clients["sync"][1]
+
+def get_async_client(api_key: str, pool: Optional[Dict] = None) -> groq.AsyncGroq:
+    """
+    The shared AsyncGroq client used for itinerary fan-out, pooled like get_client.
+    
+    Only use it from coroutines run with request_control.run_coroutine,
+    whose event loop owns its connections.
+    """
+    pool = pool or {}
+    key = (api_key, json.dumps(pool, sort_keys=True))
+    with _lock:
+        if _clients["async"][0] != key:
+            _clients["async"] = (key, groq.AsyncGroq(
+                api_key=api_key,
+                max_retries=0,
+                http_client=groq.DefaultAsyncHttpxClient(limits=_limits(pool))
+            ))
+        return _clients["async"][1]
+
+def get_itinerary_cache(settings: Optional[Dict]) -> Optional[ItineraryCache]:
+    """The itinerary cache for config.yaml itinerary.cache settings, None when disabled."""
+    settings = settings or {}
+    if not settings.get("enabled", False):
+        return None
+    key = ("itinerary", settings.get("path", "data/cache/itineraries.sqlite"),
+           settings.get("max_entries", 1000), settings.get("ttl_hours", 168))
+    with _lock:
+        if key not in _caches:
+            _caches[key] = ItineraryCache(key[1], max_entries=key[2], ttl_seconds=key[3] * 3600)
+        return _caches[key]
+
+def get_semantic_cache(settings: Optional[Dict], embedding_model: str) -> Optional[SemanticCache]:
+    """The chat semantic cache for config.yaml chat.semantic_cache settings, None when disabled."""
+    settings = settings or {}
+    if not settings.get("enabled", False):
+        return None
+    key = ("semantic", embedding_model, settings.get("threshold", 0.88), settings.get("max_entries", 500))
+    with _lock:
+        if key not in _caches:
+            _caches[key] = SemanticCache(model_name=key[1], threshold=key[2], max_entries=key[3])
+        return _caches[key]
+
+def get_model_router(settings: Optional[Dict]) -> ModelRouter:
+    """The chat model router for config.yaml chat.routing settings, shared so its metrics cover every session."""
+    settings = settings or {}
+    key = ("router", json.dumps(settings, sort_keys=True))
+    with _lock:
+        if key not in _caches:
+            _caches[key] = ModelRouter(routes=settings.get("routes"), enabled=settings.get("enabled", True))
+        return _caches[key]
+
+def get_local_answers(settings: Optional[Dict]) -> Optional[LocalAnswerEngine]:
+    """The local answer engine for config.yaml chat.local_answers settings, None when disabled."""
+    settings = settings or {}
+    if not settings.get("enabled", False):
+        return None
+    key = ("local", settings.get("min_confidence", 0.8))
+    with _lock:
+        if key not in _caches:
+            _caches[key] = LocalAnswerEngine(min_confidence=key[1])
+        return _caches[key]
+
+def get_itinerary_agent() -> ItineraryAgent:
+    """The shared ItineraryAgent, rebuilt when config.yaml changes."""
+    config = get_config()
+    with _lock:
+        if _itinerary_agent["version"] != _config["version"]:
+            llm = config.get('llm', {})
+            _itinerary_agent["agent"] = ItineraryAgent(
+                api_key=config['api_keys']['groq'],
+                fan_out=config.get('itinerary', {}).get('fan_out'),
+                cache=get_itinerary_cache(config.get('itinerary', {}).get('cache')),
+                scheduler=get_scheduler(llm.get('scheduler')),
+                client=get_client(config['api_keys']['groq'], llm.get('pool')),
+                control=get_request_controller(llm.get('requests')),
+                async_client=get_async_client(config['api_keys']['groq'], llm.get('pool'))
+            )
+            _itinerary_agent["version"] = _config["version"]
+        return _itinerary_agent["agent"]
+
+def new_chat_agent() -> ChatAgent:
+    """
+    A ChatAgent for one session.
+    
+    The conversation memory belongs to the session; the client, scheduler,
+    request controller, semantic cache, model router and local answer engine
+    are the shared ones, so this is cheap to call.
+    """
+    config = get_config()
+    chat = config.get('chat', {})
+    llm = config.get('llm', {})
+    agent = ChatAgent(
+        api_key=config['api_keys']['groq'],
+        semantic_cache=get_semantic_cache(chat.get('semantic_cache'), config['models']['embedding']['name']),
+        memory=chat.get('memory'),
+        context_format=chat.get('context_format', 'compact'),
+        scheduler=get_scheduler(llm.get('scheduler')),
+        client=get_client(config['api_keys']['groq'], llm.get('pool')),
+        router=get_model_router(chat.get('routing')),
+        local_answers=get_local_answers(chat.get('local_answers')),
+        control=get_request_controller(llm.get('requests'))
+    )
+    agent.config_version = _config["version"]
+    return agent
+
+def refresh_chat_agent(agent: ChatAgent) -> ChatAgent:
+    """
+    Point a session's ChatAgent at the shared objects of the current config.
+    
+    Sessions outlive config edits; this keeps their conversation memory but
+    swaps in the client, scheduler, request controller, caches, router and
+    local answer engine built from the reloaded settings.
+    """
+    # Reloads config.yaml if it changed
+    get_config()
+    if getattr(agent, "config_version", None) == _config["version"]:
+        return agent
+    fresh = new_chat_agent()
+    for name in ("api_key", "client", "scheduler", "control", "router", "local_answers", "semantic_cache", "context_format"):
+        setattr(agent, name, getattr(fresh, name))
+    agent.config_version = fresh.config_version
+    return agent
@@ -0,0 +1,269 @@
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import asyncio
+import json
+import threading
+import time
+
+# How often a waiting call checks for cancellation
+POLL_SECONDS = 0.1
+
+class RequestCancelled(Exception):
+    """The request was cancelled before it finished."""
+
+class DeadlineExceeded(TimeoutError):
+    """The request did not finish before its deadline."""
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag, shared between the caller and the work it started.
+    
+    A child token is cancelled when it or any of its parents is, so one
+    attempt of a request can be cancelled without cancelling the request.
+    """
+    
+    def __init__(self, parent: Optional["CancellationToken"] = None):
+        self.parent = parent
+        self._event = threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+    
+    def child(self) -> "CancellationToken":
+        return CancellationToken(self)
+    
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RequestCancelled("Request cancelled")
+    
+    def sleep(self, seconds: float):
+        """Sleep, waking up early (and raising) if the token is cancelled."""
+        end = time.monotonic() + seconds
+        while (remaining := end - time.monotonic()) > 0:
+            self.raise_if_cancelled()
+            self._event.wait(min(remaining, POLL_SECONDS))
+        self.raise_if_cancelled()
+
+class RequestController:
+    """
+    Runs API calls under a deadline, with cancellation and optional hedging.
+    
+    A call runs on a worker thread (or as a task for async calls) while the
+    caller waits, checking its cancellation token, so a stuck request can
+    be abandoned without blocking the Streamlit script. With hedging
+    enabled, once enough latencies are known for a model, a call still
+    running after the hedge percentile of that model's latencies is sent
+    a second time and whichever answer arrives first is used; the other
+    attempt is cancelled.
+    """
+    
+    def __init__(self, timeout_s: float = 60.0, workers: int = 32, hedge: Optional[Dict] = None, window: int = 1000):
+        """
+        Args:
+            timeout_s (float): Deadline of each call, including time queued in the scheduler
+            workers (int): Threads available to synchronous calls
+            hedge (Dict, optional): enabled, percentile, min_samples and min_delay_s
+            window (int): Number of recent latencies kept
+        """
+        self.timeout_s = timeout_s
+        hedge = hedge or {}
+        self.hedge_enabled = hedge.get("enabled", False)
+        self.hedge_percentile = hedge.get("percentile", 95)
+        self.hedge_min_samples = hedge.get("min_samples", 20)
+        self.hedge_min_delay_s = hedge.get("min_delay_s", 1.0)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = deque(maxlen=window)
+        self._by_key = {}
+        self._metrics = {"calls": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0, "hedges_sent": 0, "hedges_won": 0}
+    
+    def call(self, fn: Callable[[float, CancellationToken], Any], key: str = "",
+             token: Optional[CancellationToken] = None, discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Run fn(timeout, attempt_token) under the deadline, hedging it if enabled.
+        
+        Args:
+            fn (Callable): Makes the API call; gets the seconds left and a token cancelled if its attempt is abandoned
+            key (str): Latency group for hedging, usually the model name
+            token (CancellationToken, optional): Cancels the whole call
+            discard (Callable, optional): Cleans up the result of an attempt that finished after losing, e.g. closes a stream
+        
+        Returns:
+            Any: The result of the first attempt to succeed
+        
+        Raises:
+            RequestCancelled: The token was cancelled
+            DeadlineExceeded: No attempt finished in time
+        """
+        token = token or CancellationToken()
+        start = time.monotonic()
+        deadline = start + self.timeout_s
+        hedge_at = self._hedge_at(key, start)
+        attempts = {}
+        
+        def launch(hedge: bool):
+            attempt_token = token.child()
+            attempts[self._executor.submit(fn, max(deadline - time.monotonic(), 0.001), attempt_token)] = (hedge, attempt_token)
+        
+        self.count("calls")
+        launch(False)
+        try:
+            while True:
+                now = time.monotonic()
+                self._check(token, now, deadline)
+                if hedge_at is not None and now >= hedge_at:
+                    self.count("hedges_sent")
+                    print(f"🪁 Hedging {key or 'request'} after {now - start:.2f}s")
+                    launch(True)
+                    hedge_at = None
+                wake = min(deadline, hedge_at if hedge_at is not None else deadline, now + POLL_SECONDS)
+                done, _ = wait(list(attempts), timeout=max(wake - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    hedge, _ = attempts.pop(future)
+                    if future.exception() is None:
+                        self._finished(key, time.monotonic() - start, hedge)
+                        return future.result()
+                    if not attempts:
+                        # Every attempt failed (the scheduler has already retried)
+                        self.count("failed")
+                        raise future.exception()
+        finally:
+            self._abandon(attempts, discard)
+    
+    async def call_async(self, factory: Callable[[float, CancellationToken], Awaitable[Any]], key: str = "",
+                         token: Optional[CancellationToken] = None) -> Any:
+        """Async variant of call: factory(timeout, attempt_token) returns the coroutine making the API call."""
+        token = token or CancellationToken()
+        start = time.monotonic()
+        deadline = start + self.timeout_s
+        hedge_at = self._hedge_at(key, start)
+        attempts = {}
+        
+        def launch(hedge: bool):
+            attempt_token = token.child()
+            task = asyncio.ensure_future(factory(max(deadline - time.monotonic(), 0.001), attempt_token))
+            attempts[task] = (hedge, attempt_token)
+        
+        self.count("calls")
+        launch(False)
+        try:
+            while True:
+                now = time.monotonic()
+                self._check(token, now, deadline)
+                if hedge_at is not None and now >= hedge_at:
+                    self.count("hedges_sent")
+                    print(f"🪁 Hedging {key or 'request'} after {now - start:.2f}s")
+                    launch(True)
+                    hedge_at = None
+                wake = min(deadline, hedge_at if hedge_at is not None else deadline, now + POLL_SECONDS)
+                done, _ = await asyncio.wait(set(attempts), timeout=max(wake - now, 0), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    hedge, _ = attempts.pop(task)
+                    if task.exception() is None:
+                        self._finished(key, time.monotonic() - start, hedge)
+                        return task.result()
+                    if not attempts:
+                        self.count("failed")
+                        raise task.exception()
+        finally:
+            for task, (_, attempt_token) in attempts.items():
+                attempt_token.cancel()
+                task.cancel()
+    
+    def _check(self, token: CancellationToken, now: float, deadline: float):
+        if token.cancelled:
+            self.count("cancelled")
+            raise RequestCancelled("Request cancelled")
+        if now >= deadline:
+            self.count("timeouts")
+            raise DeadlineExceeded(f"No response within {self.timeout_s:g}s")
+    
+    def _hedge_at(self, key: str, start: float) -> Optional[float]:
+        """When to send a hedged attempt, or None if hedging is off or too few latencies are known."""
+        if not self.hedge_enabled:
+            return None
+        with self._lock:
+            latencies = sorted(self._by_key.get(key, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return start + max(_percentile(latencies, self.hedge_percentile), self.hedge_min_delay_s)
+    
+    def _abandon(self, attempts: Dict, discard: Optional[Callable[[Any], None]]):
+        for future, (_, attempt_token) in attempts.items():
+            attempt_token.cancel()
+            if discard is not None:
+                # A losing attempt may still finish; release what it returns
+                future.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+    
+    def _finished(self, key: str, latency: float, hedge: bool):
+        with self._lock:
+            self._metrics["completed"] += 1
+            if hedge:
+                self._metrics["hedges_won"] += 1
+            self._latencies.append(latency)
+            self._by_key.setdefault(key, deque(maxlen=self._window)).append(latency)
+    
+    def count(self, name: str):
+        """Add one to a counter, e.g. "timeouts" for a stream cut off after it opened."""
+        with self._lock:
+            self._metrics[name] += 1
+    
+    def stats(self) -> Dict:
+        """Counters and p50/p95/p99 latency in seconds of completed calls."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            latencies = sorted(self._latencies)
+        for percentile in (50, 95, 99):
+            metrics[f"p{percentile}_s"] = _percentile(latencies, percentile)
+        return metrics
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_coroutine(coroutine: Coroutine) -> Future:
+    """
+    Run a coroutine on the process-wide event loop, started on its own thread on first use.
+    
+    Async clients keep their connection pool on the loop they were first
+    used on, so a shared AsyncGroq client only works if every coroutine
+    using it runs on the same loop. Wait on the returned future from any
+    thread.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop)
+
+_controller = {"settings": None, "controller": None}
+_controller_lock = threading.Lock()
+
+def get_request_controller(settings: Optional[Dict] = None) -> RequestController:
+    """
+    The process-wide request controller, so hedging learns each model's latencies from every session.
+    
+    Pass the config.yaml llm.requests settings to create it, or to replace
+    it when they changed (the new one has to learn latencies again).
+    Without settings the current controller is returned, created with the
+    defaults if there is none yet.
+    """
+    with _controller_lock:
+        key = json.dumps(settings, sort_keys=True) if settings is not None else _controller["settings"]
+        if _controller["controller"] is None or key != _controller["settings"]:
+            if _controller["controller"] is not None:
+                print("🔄 Rebuilt the request controller for new settings")
+            _controller["controller"] = RequestController(**(settings or {}))
+            _controller["settings"] = json.dumps(settings or {}, sort_keys=True)
+        return _controller["controller"]
@@ -0,0 +1,140 @@
+from typing import Dict, FrozenSet, Optional
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import json
+import re
+import threading
+import numpy as np
+from .itinerary_context import NUMBER_WORDS
+
+_TOKEN = re.compile(r"\d+|[a-z]+")
+
+@lru_cache(maxsize=None)
+def load_embedding_model(model_name: str):
+    """Load a sentence-transformers model once per process."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def itinerary_fingerprint(itinerary: Optional[Dict]) -> str:
+    """Hash of an itinerary's content, so answers are only reused for the same trip."""
+    return hashlib.sha1(json.dumps(itinerary, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def question_numbers(question: str) -> FrozenSet[int]:
+    """
+    Numbers mentioned in a question, in digits or words ("day 2", "day two", "second day").
+    
+    Embeddings barely separate "day 2" from "day 3", so cached answers are
+    only reused when both questions mention the same numbers.
+    """
+    numbers = set()
+    for token in _TOKEN.findall(question.lower()):
+        if token.isdigit():
+            numbers.add(int(token))
+        elif token in NUMBER_WORDS:
+            numbers.add(NUMBER_WORDS[token])
+    return frozenset(numbers)
+
+class SemanticCache:
+    """
+    Reuses chat answers for questions that mean the same thing about the same itinerary.
+    
+    Each entry holds the normalized embedding of a question, the fingerprint
+    of the itinerary it was asked about, the numbers it mentions and the
+    response. A lookup embeds the new question and returns the most similar
+    entry for the same itinerary and numbers if its cosine similarity reaches
+    the threshold. At most max_entries are kept; the least recently used
+    entry is evicted first.
+    """
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", threshold: float = 0.88, max_entries: int = 500, model=None):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._model = model
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._last_embedding = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def model(self):
+        # Loaded on first use so creating an agent stays cheap
+        if self._model is None:
+            self._model = load_embedding_model(self.model_name)
+        return self._model
+    
+    def _embed(self, question: str) -> np.ndarray:
+        # A miss is usually followed by storing the same question, so keep its embedding;
+        # the cache is shared between sessions, so the memo is read once under the lock
+        with self._lock:
+            last = self._last_embedding
+        if last is not None and last[0] == question:
+            return last[1]
+        embedding = np.asarray(self.model.encode([question])[0], dtype='float32')
+        embedding /= np.linalg.norm(embedding) or 1.0
+        with self._lock:
+            self._last_embedding = (question, embedding)
+        return embedding
+    
+    def lookup(self, question: str, itinerary: Optional[Dict]) -> Optional[Dict]:
+        """
+        Cached response for a question about an itinerary, or None.
+        
+        Returns:
+            Optional[Dict]: The stored response, with its similarity under "cache_similarity"
+        """
+        fingerprint = itinerary_fingerprint(itinerary)
+        numbers = question_numbers(question)
+        with self._lock:
+            candidates = [
+                (entry_id, entry) for entry_id, entry in self._entries.items()
+                if entry["fingerprint"] == fingerprint and entry["numbers"] == numbers
+            ]
+        if not candidates:
+            self.misses += 1
+            return None
+        
+        embedding = self._embed(question)
+        similarities = np.stack([entry["embedding"] for _, entry in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        
+        entry_id, entry = candidates[best]
+        with self._lock:
+            if entry_id in self._entries:
+                self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return {**entry["response"], "cache_similarity": float(similarities[best])}
+    
+    def store(self, question: str, itinerary: Optional[Dict], response: Dict):
+        """Remember a response, evicting the least recently used entry when full."""
+        entry = {
+            "fingerprint": itinerary_fingerprint(itinerary),
+            "numbers": question_numbers(question),
+            "embedding": self._embed(question),
+            "response": response
+        }
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Entry count, hits, misses and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional
+import json
+
+# Fields every activity of an itinerary must have
+REQUIRED_ACTIVITY_FIELDS = ["time", "title", "description", "duration", "cost", "location", "transportation"]
+
+def validate_day(day: Dict) -> Optional[str]:
+    """
+    Check one itinerary day against the required structure.
+    
+    Returns:
+        Optional[str]: Description of the first problem found, or None if the day is valid
+    """
+    if not isinstance(day, dict):
+        return "Day is not a dictionary"
+    if "day_number" not in day:
+        return "Day missing 'day_number'"
+    if "activities" not in day:
+        return "Day missing 'activities'"
+    if not isinstance(day["activities"], list):
+        return "Activities is not a list"
+    for activity in day["activities"]:
+        if not isinstance(activity, dict):
+            return "Activity is not a dictionary"
+        for field in REQUIRED_ACTIVITY_FIELDS:
+            if field not in activity:
+                return f"Activity missing '{field}'"
+    return None
+
+class IncrementalItineraryParser:
+    """
+    Pulls completed days out of an itinerary JSON response while it streams in.
+    
+    Text is scanned once, character by character, tracking string and
+    escape state and the nesting of objects and arrays. Anything before the
+    first '{' (such as a lead-in sentence) is skipped. Each object directly
+    inside the top-level "days" array is parsed as soon as its closing brace
+    arrives, validated, and returned from feed; invalid days are recorded in
+    errors instead.
+    """
+    
+    def __init__(self):
+        self.errors = []
+        self._buffer = []
+        self._length = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self._days_depth = None
+        self._day_start = None
+        self._done = False
+    
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Consume the next chunk of the response.
+        
+        Returns:
+            List[Dict]: Valid days completed by this chunk, in order
+        """
+        days = []
+        for char in text:
+            position = self._length
+            self._buffer.append(char)
+            self._length += 1
+            if self._done:
+                continue
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._buffer[self._string_start + 1:position])
+                continue
+            
+            if not self._stack:
+                # Skip prose until the top-level object opens
+                if char == '{':
+                    self._stack.append('{')
+                continue
+            
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char == ':' and len(self._stack) == 1:
+                self._key = self._last_string
+            elif char in '{[':
+                if char == '[' and len(self._stack) == 1 and self._key == "days":
+                    self._days_depth = len(self._stack) + 1
+                elif char == '{' and self._days_depth is not None and len(self._stack) == self._days_depth:
+                    self._day_start = position
+                self._stack.append(char)
+            elif char in '}]':
+                self._stack.pop()
+                if char == '}' and self._day_start is not None and len(self._stack) == self._days_depth:
+                    day = self._parse_day("".join(self._buffer[self._day_start:position + 1]))
+                    if day is not None:
+                        days.append(day)
+                    self._day_start = None
+                elif char == ']' and len(self._stack) == 1 and self._days_depth is not None:
+                    self._days_depth = None
+                if not self._stack:
+                    self._done = True
+        return days
+    
+    def _parse_day(self, text: str) -> Optional[Dict]:
+        try:
+            # strict=False accepts raw newlines inside strings, which models often emit in markdown
+            day = json.loads(text, strict=False)
+        except json.JSONDecodeError as e:
+            self.errors.append(f"Error parsing day: {str(e)}")
+            return None
+        error = validate_day(day)
+        if error:
+            self.errors.append(error)
+            return None
+        return day
+    
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._buffer)
@@ -1,18 +1,15 @@
 import streamlit as st
-from agents.chat_agent import ChatAgent
-import yaml
-import os
-
-def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+from agents.itinerary_model import Itinerary
+from agents.registry import new_chat_agent, refresh_chat_agent
 
 def initialize_chat():
     """Initialize chat session state."""
     if 'chat_agent' not in st.session_state:
-        config = load_config()
-        st.session_state.chat_agent = ChatAgent(api_key=config['api_keys']['groq'])
+        # The conversation is per session; the client and caches behind it are shared
+        st.session_state.chat_agent = new_chat_agent()
+    else:
+        # Pick up config.yaml edits without losing the conversation
+        refresh_chat_agent(st.session_state.chat_agent)
     
     if 'messages' not in st.session_state:
         st.session_state.messages = []
@@ -42,58 +39,70 @@ def render_chat_interface():
         try:
             # Process the message
             with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chat_agent.process_message(
-                        prompt,
-                        current_itinerary
-                    )
-                    
-                    # Display the response
-                    st.write(response["message"])
+                # Render the response token by token as it streams in
+                placeholder = st.empty()
+                placeholder.markdown("_Thinking..._")
+                streamed = ""
+                for chunk in st.session_state.chat_agent.stream_message(prompt, current_itinerary):
+                    streamed += chunk
+                    placeholder.markdown(streamed + "▌")
+                placeholder.markdown(streamed)
+                response = st.session_state.chat_agent.last_response
+                
+                # Check for itinerary modifications
+                if response.get("modified_itinerary") and response["modified_itinerary"] != current_itinerary:
+                    st.session_state.pending_modification = response["modified_itinerary"]
+                    st.warning("I've suggested some modifications to your itinerary. Would you like to apply these changes?")
                     
-                    # Check for itinerary modifications
-                    if response.get("modified_itinerary") and response["modified_itinerary"] != current_itinerary:
-                        st.session_state.pending_modification = response["modified_itinerary"]
-                        st.warning("I've suggested some modifications to your itinerary. Would you like to apply these changes?")
-                        
-                        # Show the differences
-                        if current_itinerary:
-                            st.write("Changes to be made:")
-                            for day in response["modified_itinerary"]["days"]:
-                                day_num = day["day_number"]
-                                current_day = next((d for d in current_itinerary["days"] if d["day_number"] == day_num), None)
-                                
-                                if current_day:
+                    # Show the differences, matching activities by their id
+                    if current_itinerary:
+                        st.write("Changes to be made:")
+                        current = Itinerary.from_dict(current_itinerary)
+                        for day in response["modified_itinerary"]["days"]:
+                            day_num = day["day_number"]
+                            current_day = current.day(day_num)
+                            
+                            if current_day:
+                                changes = []
+                                kept = set()
+                                for activity in day["activities"]:
+                                    current_activity = current_day.get(activity.get("id"))
+                                    kept.add(activity.get("id"))
+                                    if not current_activity or current_activity.to_dict() != activity:
+                                        changes.append(f"- {activity['time']}: {activity['title']}")
+                                for current_activity in current_day:
+                                    if current_activity.id not in kept:
+                                        changes.append(f"- ~~{current_activity.time}: {current_activity.title}~~ (removed)")
+                                if changes:
                                     st.write(f"\nDay {day_num}:")
-                                    for activity in day["activities"]:
-                                        current_activity = next((a for a in current_day["activities"] if a["time"] == activity["time"]), None)
-                                        if not current_activity or current_activity != activity:
-                                            st.write(f"- {activity['time']}: {activity['title']}")
-                        
-                        # Confirmation buttons
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("Apply Changes", key="apply_changes"):
-                                st.session_state.itinerary = st.session_state.pending_modification
-                                st.session_state.pending_modification = None
-                                st.success("Itinerary has been updated!")
-                                st.rerun()
-                        
-                        with col2:
-                            if st.button("Keep Original", key="keep_original"):
-                                st.session_state.pending_modification = None
-                                st.info("Keeping original itinerary")
-                                st.rerun()
+                                    st.write("\n".join(changes))
+                    
+                    # Confirmation buttons
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button("Apply Changes", key="apply_changes"):
+                            st.session_state.itinerary = st.session_state.pending_modification
+                            st.session_state.pending_modification = None
+                            st.success("Itinerary has been updated!")
+                            st.rerun()
+                    
+                    with col2:
+                        if st.button("Keep Original", key="keep_original"):
+                            st.session_state.pending_modification = None
+                            st.info("Keeping original itinerary")
+                            st.rerun()
             
             # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": response["message"]})
-            
+        
         except Exception as e:
             st.error(f"Error: {str(e)}")
             st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I encountered an error: {str(e)}"})
     
     # Clear chat button
     if st.button("Clear Chat"):
+        # Abandon any response still being generated
+        st.session_state.chat_agent.cancel()
         st.session_state.messages = []
         st.session_state.chat_agent.clear_history()
         st.session_state.pending_modification = None
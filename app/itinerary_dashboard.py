@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+from agents.itinerary_model import Itinerary
 
 def render_itinerary_dashboard(itinerary):
     """Render the itinerary dashboard with day selection and activity details."""
@@ -24,14 +25,43 @@ def render_itinerary_dashboard(itinerary):
     st.session_state.selected_day = int(new_selection.split()[-1])
     
     # Get the selected day's activities
-    selected_day = next(day for day in itinerary['days'] if day['day_number'] == st.session_state.selected_day)
+    trip = Itinerary.from_dict(itinerary)
+    selected_day = trip.day(st.session_state.selected_day)
     
     # Display day summary
     st.subheader(f"Day {st.session_state.selected_day}")
     
-    # Create a DataFrame for the selected day's activities
+    render_day_activities(selected_day.to_dict())
+    
+    # Display trip summary with better formatting
+    with st.expander("Trip Summary"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**Trip Details:**")
+            st.markdown(f"🌍 **Destination:**\n{itinerary['destination'].title()}")
+            st.markdown(f"📅 **Duration:**\n{itinerary['duration']} days")
+            st.markdown(f"💵 **Budget:**\n${itinerary['budget']}")
+        
+        with col2:
+            st.markdown("**Preferences:**")
+            st.markdown(f"🎯 **Travel Style:**\n{itinerary['travel_style']}")
+            st.markdown(f"❤️ **Interests:**\n{', '.join(itinerary['interests'])}")
+        
+        # Calculate and display costs
+        total_cost = trip.total_cost
+        remaining_budget = itinerary['budget'] - total_cost
+        
+        st.markdown("---")
+        st.markdown("**Budget Summary:**")
+        st.markdown(f"💰 **Total Estimated Cost:**\n${total_cost}")
+        st.markdown(f"💵 **Remaining Budget:**\n${remaining_budget}")
+
+def render_day_activities(day):
+    """Render one day's activity table and detailed descriptions."""
+    # Create a DataFrame for the day's activities
     activities_data = []
-    for activity in selected_day['activities']:
+    for activity in day['activities']:
         activities_data.append({
             'Time': activity['time'],
             'Activity': activity['title'],
@@ -78,7 +108,7 @@ def render_itinerary_dashboard(itinerary):
     
     # Display detailed descriptions for each activity
     st.subheader("Activity Details")
-    for activity in selected_day['activities']:
+    for activity in day['activities']:
         with st.expander(f"{activity['time']} - {activity['title']}"):
             # Create columns for better layout
             col1, col2 = st.columns([2, 1])
@@ -95,34 +125,6 @@ def render_itinerary_dashboard(itinerary):
                 st.markdown(f"🚗 **Transportation:**\n{activity['transportation']}")
                 st.markdown(f"⏱️ **Duration:**\n{activity['duration']}")
                 st.markdown(f"💰 **Cost:**\n${activity['cost']}")
-    
-    # Display trip summary with better formatting
-    with st.expander("Trip Summary"):
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("**Trip Details:**")
-            st.markdown(f"🌍 **Destination:**\n{itinerary['destination'].title()}")
-            st.markdown(f"📅 **Duration:**\n{itinerary['duration']} days")
-            st.markdown(f"💵 **Budget:**\n${itinerary['budget']}")
-        
-        with col2:
-            st.markdown("**Preferences:**")
-            st.markdown(f"🎯 **Travel Style:**\n{itinerary['travel_style']}")
-            st.markdown(f"❤️ **Interests:**\n{', '.join(itinerary['interests'])}")
-        
-        # Calculate and display costs
-        total_cost = sum(
-            activity['cost']
-            for day in itinerary['days']
-            for activity in day['activities']
-        )
-        remaining_budget = itinerary['budget'] - total_cost
-        
-        st.markdown("---")
-        st.markdown("**Budget Summary:**")
-        st.markdown(f"💰 **Total Estimated Cost:**\n${total_cost}")
-        st.markdown(f"💵 **Remaining Budget:**\n${remaining_budget}")
 
 def render_day_by_day_view(itinerary_data):
     for day_data in itinerary_data.get("days", []):
@@ -133,7 +135,7 @@ def render_day_by_day_view(itinerary_data):
             if not activities:
                 st.info("No activities planned for this day.")
                 continue
-                
+            
             for activity in activities:
                 with st.container():
                     st.subheader(f"{activity['time']} - {activity['title']}")
@@ -155,8 +157,7 @@ def render_day_by_day_view(itinerary_data):
 def render_budget_breakdown(itinerary_data):
     # Calculate total costs from activities
     total_costs = {
-        "Activities": sum(activity['cost'] for day in itinerary_data.get("days", []) 
-                         for activity in day.get("activities", [])),
+        "Activities": Itinerary.from_dict(itinerary_data).total_cost,
         "Accommodation": itinerary_data.get("budget", 0) * 0.4,  # Estimated 40% for accommodation
         "Food": itinerary_data.get("budget", 0) * 0.2,  # Estimated 20% for food
         "Transportation": itinerary_data.get("budget", 0) * 0.2,  # Estimated 20% for transportation
@@ -1,13 +1,7 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from agents.itinerary_agent import ItineraryAgent
-import yaml
-import os
-
-def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+from agents.registry import get_itinerary_agent
+from itinerary_dashboard import render_day_activities
 
 def render_travel_form():
     with st.form("travel_planning_form"):
@@ -17,7 +11,7 @@ def render_travel_form():
             destination = st.text_input("Destination", placeholder="e.g., London, Paris")
             start_date = st.date_input("Start Date", min_value=datetime.now().date())
             duration = st.number_input("Duration (days)", min_value=1, max_value=30, value=3)
-            
+        
         with col2:
             budget = st.number_input("Budget ($)", min_value=100, max_value=10000, value=1000)
             travel_style = st.selectbox(
@@ -33,11 +27,8 @@ def render_travel_form():
         
         if submitted:
             try:
-                # Load configuration
-                config = load_config()
-                
-                # Initialize the agent
-                agent = ItineraryAgent(api_key=config['api_keys']['groq'])
+                # Shared agent: the client, connection pool and caches are reused across sessions
+                agent = get_itinerary_agent()
                 
                 # Prepare preferences
                 preferences = {
@@ -49,10 +40,22 @@ def render_travel_form():
                     "interests": interests
                 }
                 
-                # Generate itinerary
-                with st.spinner("Generating your personalized itinerary..."):
-                    itinerary = agent.generate_itinerary(preferences)
-                    st.session_state.itinerary = itinerary
+                # Generate itinerary, showing each day as soon as it is ready
+                status = st.empty()
+                status.info("Generating your personalized itinerary...")
+                preview = st.empty()
+                days = {}
+                for day in agent.stream_itinerary(preferences):
+                    days[day["day_number"]] = day
+                    status.info(f"Generated {len(days)} of {duration} days...")
+                    with preview.container():
+                        for day_number in sorted(days):
+                            st.subheader(f"Day {day_number}")
+                            render_day_activities(days[day_number])
+                status.empty()
+                preview.empty()
+                st.session_state.itinerary = agent.last_itinerary
+                st.rerun()
             except Exception as e:
                 st.error(f"Failed to generate itinerary: {str(e)}")
                 st.session_state.itinerary = None 
\ No newline at end of file
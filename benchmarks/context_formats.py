@@ -0,0 +1,177 @@
+"""
+Compare itinerary encodings for the chat prompt.
+
+For synthetic itineraries of several lengths and questions with known
+answers, this reports the estimated tokens of the itinerary context in
+every format of agents.itinerary_context.CONTEXT_FORMATS and, offline,
+how often the answer is still present in the encoded context. With --live
+the questions are also asked through ChatAgent, and answer accuracy and
+latency are reported per format.
+
+Usage (from the repository root):
+    python -m benchmarks.context_formats --days 3 7 14 30
+    python -m benchmarks.context_formats --days 5 --live --questions 20
+"""
+import argparse
+import copy
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import yaml
+
+from agents.conversation_memory import estimate_tokens
+from agents.itinerary_context import CONTEXT_FORMATS, encode_itinerary
+from agents.itinerary_patch import ensure_activity_ids
+from agents.markdown_templates import format_activity_description
+from benchmarks.synthetic_corpus import generate_document
+
+STREETS = ["Main Street", "Harbour Road", "Market Square", "Station Avenue", "Castle Hill", "River Walk", "Park Lane"]
+TRANSPORT = ["Walk", "Metro", "Taxi", "Bus", "Tram", "Bike"]
+
+# (kind, question template, answer field)
+QUESTION_TEMPLATES = [
+    ("time", "What time does {title} start on day {day}?", "time"),
+    ("cost", "How much does {title} cost?", "cost"),
+    ("location", "Where is {title}?", "location"),
+    ("transportation", "How do I get to {title} on day {day}?", "transportation"),
+    ("day", "Which day is {title} scheduled on? Answer with the day number.", None),
+]
+
+def synthetic_itinerary(days: int, per_day: int = 5, seed: int = 0) -> Dict:
+    """An itinerary shaped like the generated ones, with formatted markdown descriptions."""
+    rng = random.Random(seed)
+    destination = None
+    itinerary_days = []
+    position = 0
+    for day_number in range(1, days + 1):
+        activities = []
+        for slot in range(per_day):
+            doc = generate_document(seed, position)
+            position += 1
+            destination = destination or doc["destination"]
+            location = f"{rng.randint(1, 200)} {rng.choice(STREETS)}"
+            transportation = rng.choice(TRANSPORT)
+            activities.append({
+                "time": f"{9 + 2 * slot:02d}:00",
+                "title": doc["name"],
+                "description": format_activity_description(
+                    title=doc["name"],
+                    description=doc["description"],
+                    location_details={"Address": location},
+                    transportation=transportation
+                ),
+                "duration": f"{rng.choice([1, 1.5, 2, 3])} hours",
+                "cost": doc["price"],
+                "location": location,
+                "transportation": transportation
+            })
+        itinerary_days.append({"day_number": day_number, "activities": activities})
+    itinerary = {
+        "destination": destination,
+        "duration": days,
+        "budget": 250 * days,
+        "travel_style": "Moderate",
+        "interests": ["Culture", "Food"],
+        "days": itinerary_days
+    }
+    return ensure_activity_ids(itinerary)
+
+def make_questions(itinerary: Dict, count: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """Questions about random activities as (kind, question, expected answer)."""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        kind, template, field = QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)]
+        day = rng.choice(itinerary["days"])
+        activity = rng.choice(day["activities"])
+        question = template.format(title=activity["title"], day=day["day_number"])
+        answer = f"day {day['day_number']}" if field is None else str(activity[field])
+        questions.append((kind, question, answer))
+    return questions
+
+def answer_in(text: str, expected: str) -> bool:
+    return expected.lower() in text.lower()
+
+def context_present(context: str, kind: str, question: str, expected: str) -> bool:
+    """Whether the encoded context still holds what is needed to answer."""
+    if kind == "day":
+        title = question.split("Which day is ", 1)[1].split(" scheduled", 1)[0]
+        return title in context
+    return expected in context
+
+def measure_offline(itinerary: Dict, questions: List[Tuple[str, str, str]]) -> Dict:
+    """Context tokens and answer coverage per format."""
+    results = {}
+    for name in CONTEXT_FORMATS:
+        tokens = []
+        covered = 0
+        for kind, question, expected in questions:
+            context = encode_itinerary(itinerary, question, name)
+            tokens.append(estimate_tokens(context))
+            covered += context_present(context, kind, question, expected)
+        results[name] = {
+            "mean_tokens": statistics.mean(tokens),
+            "max_tokens": max(tokens),
+            "coverage": covered / len(questions)
+        }
+    return results
+
+def measure_live(itinerary: Dict, questions: List[Tuple[str, str, str]], api_key: str) -> Dict:
+    """Answer accuracy and latency per format, asking each question in a fresh conversation."""
+    from agents.chat_agent import ChatAgent
+    results = {}
+    for name in CONTEXT_FORMATS:
+        agent = ChatAgent(api_key, context_format=name)
+        latencies = []
+        correct = 0
+        for _, question, expected in questions:
+            agent.clear_history()
+            start = time.perf_counter()
+            response = agent.process_message(question, copy.deepcopy(itinerary))
+            latencies.append(time.perf_counter() - start)
+            correct += answer_in(response["message"], expected)
+        results[name] = {
+            "accuracy": correct / len(questions),
+            "p50_latency_s": statistics.median(latencies),
+            "mean_latency_s": statistics.mean(latencies)
+        }
+        print(f"  {name:8s} accuracy {results[name]['accuracy']:.0%}, p50 latency {results[name]['p50_latency_s']:.2f}s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare itinerary encodings for the chat prompt")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--days", type=int, nargs="+", default=[3, 7, 14, 30])
+    parser.add_argument("--per-day", type=int, default=5, help="Activities per day")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true", help="Also ask the questions through the chat model")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    runs = []
+    for days in args.days:
+        itinerary = synthetic_itinerary(days, args.per_day, args.seed)
+        questions = make_questions(itinerary, args.questions, args.seed)
+        run = {"days": days, "offline": measure_offline(itinerary, questions)}
+        baseline = run["offline"]["json"]["mean_tokens"]
+        print(f"📦 {days}-day itinerary, {args.per_day} activities per day")
+        for name, metrics in run["offline"].items():
+            change = metrics["mean_tokens"] / baseline - 1
+            print(f"  {name:8s} {metrics['mean_tokens']:8.0f} tokens ({change:+.0%} vs json), answer in context {metrics['coverage']:.0%}")
+        if args.live:
+            with open(args.config, 'r') as f:
+                api_key = yaml.safe_load(f)['api_keys']['groq']
+            run["live"] = measure_live(itinerary, questions, api_key)
+        runs.append(run)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"seed": args.seed, "questions": args.questions, "runs": runs}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
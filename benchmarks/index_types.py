@@ -0,0 +1,148 @@
+"""
+Compare FAISS index types on the same embeddings.
+
+For every index type this reports build time, index memory, p50/p99
+single-query latency and recall@k against an exact flat index.
+
+Usage (from the repository root):
+    python -m benchmarks.index_types --limit 100000 --queries 1000
+    python -m benchmarks.index_types --random 200000  # no embedding model needed
+"""
+import argparse
+import json
+import os
+import resource
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from rag.build_index import INDEX_TYPES, TravelIndexBuilder, build_faiss_index, load_config
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Not Linux: fall back to the peak, which is the best we can get
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def random_embeddings(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 1000), dimension)).astype('float32')
+    assignments = rng.integers(0, len(centers), size=count)
+    vectors = centers[assignments] + 0.3 * rng.standard_normal((count, dimension)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def encode_documents(builder: TravelIndexBuilder, data_path: str, limit: int) -> np.ndarray:
+    """Embed the first limit documents of the travel data file."""
+    chunks, batch = [], []
+    for doc in builder.iter_travel_data(data_path):
+        batch.append(doc.get('description', ''))
+        if len(batch) >= builder.batch_size:
+            chunks.append(builder._encode(batch))
+            batch = []
+        if sum(len(c) for c in chunks) + len(batch) >= limit:
+            break
+    if batch:
+        chunks.append(builder._encode(batch))
+    return np.concatenate(chunks)
+
+def measure(index: faiss.Index, queries: np.ndarray, k: int) -> Dict:
+    """Search one query at a time and return the results and latency percentiles."""
+    latencies = []
+    results = np.empty((len(queries), k), dtype='int64')
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+    return {
+        "ids": results,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def recall_at_k(results: np.ndarray, ground_truth: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbors that were returned."""
+    hits = sum(len(np.intersect1d(r, g)) for r, g in zip(results, ground_truth))
+    return hits / ground_truth.size
+
+def run_benchmark(embeddings: np.ndarray, queries: np.ndarray, index_types: List[str], index_config: Dict, k: int) -> List[Dict]:
+    """Build and query every index type on the same data."""
+    flat = build_faiss_index(embeddings, {"type": "flat"})
+    ground_truth = measure(flat, queries, k)["ids"]
+    del flat
+    
+    rows = []
+    for index_type in index_types:
+        print(f"⏳ Building {index_type} index...")
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        index = build_faiss_index(embeddings, {**index_config, "type": index_type})
+        build_seconds = time.perf_counter() - start
+        rss_growth = current_rss_mb() - rss_before
+        
+        result = measure(index, queries, k)
+        rows.append({
+            "index_type": index_type,
+            "documents": len(embeddings),
+            "build_s": round(build_seconds, 3),
+            "index_mb": round(len(faiss.serialize_index(index)) / 2**20, 2),
+            "rss_growth_mb": round(rss_growth, 2),
+            "p50_ms": round(result["p50_ms"], 3),
+            "p99_ms": round(result["p99_ms"], 3),
+            f"recall@{k}": round(recall_at_k(result["ids"], ground_truth), 4),
+        })
+        del index
+    return rows
+
+def print_table(rows: List[Dict]):
+    """Print the results as an aligned text table."""
+    columns = list(rows[0].keys())
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types for travel retrieval")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--data", help="Travel data file (defaults to paths.raw_data)")
+    parser.add_argument("--limit", type=int, default=100000, help="Documents to index")
+    parser.add_argument("--random", type=int, help="Benchmark this many random vectors instead of real data")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    
+    config = load_config(args.config)
+    embedding_config = config['models']['embedding']
+    index_config = embedding_config.get('index', {})
+    
+    if args.random:
+        vectors = random_embeddings(args.random + args.queries, embedding_config['dimension'])
+    else:
+        builder = TravelIndexBuilder(
+            model_name=embedding_config['name'],
+            batch_size=embedding_config.get('batch_size', 256),
+            cache_dir=config['paths'].get('embedding_cache')
+        )
+        vectors = encode_documents(builder, args.data or config['paths']['raw_data'], args.limit + args.queries)
+    
+    # Hold out the last documents as queries so they are not in the index
+    embeddings, queries = vectors[:-args.queries], vectors[-args.queries:]
+    rows = run_benchmark(embeddings, queries, args.types, index_config, args.k)
+    
+    print_table(rows)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Load test ItineraryAgent and ChatAgent with concurrent simulated sessions.
+
+Each session generates an itinerary and then sends a few chat messages
+about it (questions and edits), the way a user of the app would. Sessions
+share one scheduler, request controller and pair of clients, like the
+Streamlit sessions of one process. The report gives p50/p95/p99 latency per
+operation, throughput, error rates and the scheduler, request controller
+and server counters.
+
+By default an in-process mock server (benchmarks.mock_groq_server) stands
+in for the API, so runs cost nothing and can model slow or failing
+backends. --base-url points at another server, e.g. a mock started
+separately; only use the real API with rate limits you can afford.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --sessions 20 --days 3 --chat-turns 4
+    python -m benchmarks.load_test --sessions 50 --latency pareto:0.3,2.5 --hedge --output load.json
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import groq
+import httpx
+
+from agents.chat_agent import ChatAgent
+from agents.itinerary_agent import ItineraryAgent
+from agents.llm_scheduler import LLMScheduler
+from agents.request_control import RequestController
+from benchmarks.context_formats import make_questions
+from benchmarks.mock_groq_server import MockGroqServer
+
+EDIT_MESSAGES = [
+    "Move the first activity of day 1 to 10:30",
+    "Change the time of the museum visit to the afternoon",
+    "Replace the last activity of day 2 with something cheaper",
+]
+
+def percentiles(values: List[float]) -> Dict:
+    """Count, mean and p50/p95/p99 of latencies in seconds."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda percentile: ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+    return {"count": len(ordered), "mean_s": statistics.mean(ordered),
+            "p50_s": pick(50), "p95_s": pick(95), "p99_s": pick(99)}
+
+class LoadTest:
+    """Runs sessions on threads and collects per-operation latencies and errors."""
+    
+    def __init__(self, args: argparse.Namespace, client: groq.Groq, async_client: groq.AsyncGroq,
+                 scheduler: LLMScheduler, control: RequestController):
+        self.args = args
+        self.client = client
+        self.scheduler = scheduler
+        self.control = control
+        self.itinerary_agent = ItineraryAgent(
+            api_key=args.api_key,
+            fan_out={"enabled": args.fan_out, "min_days": 3, "concurrency": 5},
+            scheduler=scheduler,
+            client=client,
+            control=control,
+            async_client=async_client
+        )
+        self._lock = threading.Lock()
+        self.latencies = {"generate": [], "chat": [], "session": []}
+        self.errors = {"generate": 0, "chat": 0}
+    
+    def _record(self, operation: str, latency: float, failed: bool = False):
+        with self._lock:
+            self.latencies[operation].append(latency)
+            if failed:
+                self.errors[operation] += 1
+    
+    def session(self, number: int):
+        """One user: generate an itinerary, then chat about it."""
+        rng = random.Random(self.args.seed + number)
+        preferences = {
+            "destination": f"City {number % 7}",
+            "start_date": "2025-06-01",
+            "duration": self.args.days,
+            "budget": 250 * self.args.days,
+            "travel_style": rng.choice(["Budget", "Comfort", "Luxury"]),
+            "interests": rng.sample(["History", "Food", "Nature", "Art"], 2)
+        }
+        session_start = time.perf_counter()
+        start = time.perf_counter()
+        try:
+            if self.args.stream:
+                for _ in self.itinerary_agent.stream_itinerary(preferences):
+                    pass
+                itinerary = self.itinerary_agent.last_itinerary
+            else:
+                itinerary = self.itinerary_agent.generate_itinerary(preferences)
+        except Exception as e:
+            print(f"⚠️ Session {number}: generation failed ({type(e).__name__}: {str(e)})")
+            self._record("generate", time.perf_counter() - start, failed=True)
+            return
+        self._record("generate", time.perf_counter() - start)
+        
+        chat = ChatAgent(
+            api_key=self.args.api_key,
+            scheduler=self.scheduler,
+            client=self.client,
+            control=self.control,
+            # Answer everything with the model so the API is what gets measured
+            local_answers=None
+        )
+        questions = [question for _, question, _ in make_questions(itinerary, self.args.chat_turns, self.args.seed + number)]
+        for question in questions:
+            message = rng.choice(EDIT_MESSAGES) if rng.random() < self.args.edit_share else question
+            start = time.perf_counter()
+            if self.args.stream:
+                text = "".join(chat.stream_message(message, itinerary))
+                response = chat.last_response
+            else:
+                response = chat.process_message(message, itinerary)
+                text = response["message"]
+            # The agents report errors in the reply rather than raising
+            failed = "I apologize, but I encountered an error" in text
+            self._record("chat", time.perf_counter() - start, failed)
+            if response and response.get("modified_itinerary"):
+                itinerary = response["modified_itinerary"]
+        self._record("session", time.perf_counter() - session_start)
+    
+    def run(self) -> Dict:
+        threads = []
+        start = time.perf_counter()
+        for number in range(self.args.sessions):
+            thread = threading.Thread(target=self.session, args=(number,), daemon=True)
+            threads.append(thread)
+            thread.start()
+            if self.args.ramp_up:
+                time.sleep(self.args.ramp_up / self.args.sessions)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        
+        operations = {name: percentiles(values) for name, values in self.latencies.items()}
+        for name, failed in self.errors.items():
+            operations[name]["errors"] = failed
+            operations[name]["error_rate"] = failed / operations[name]["count"] if operations[name]["count"] else 0.0
+        completed = operations["session"]["count"]
+        return {
+            "elapsed_s": elapsed,
+            "sessions": self.args.sessions,
+            "completed_sessions": completed,
+            "sessions_per_minute": completed / elapsed * 60 if elapsed else 0.0,
+            "chat_messages_per_second": operations["chat"]["count"] / elapsed if elapsed else 0.0,
+            "operations": operations,
+            "scheduler": self.scheduler.stats(),
+            "requests": self.control.stats()
+        }
+
+def print_report(report: Dict):
+    print(f"\n📊 {report['completed_sessions']}/{report['sessions']} sessions in {report['elapsed_s']:.1f}s "
+          f"({report['sessions_per_minute']:.1f} sessions/min, {report['chat_messages_per_second']:.2f} chat messages/s)")
+    for name, metrics in report["operations"].items():
+        if not metrics["count"]:
+            continue
+        errors = f", errors {metrics['error_rate']:.1%}" if "error_rate" in metrics else ""
+        print(f"  {name:8s} n={metrics['count']:<5d} p50 {metrics['p50_s']:6.2f}s  p95 {metrics['p95_s']:6.2f}s  "
+              f"p99 {metrics['p99_s']:6.2f}s{errors}")
+    scheduler = report["scheduler"]
+    print(f"  scheduler: {scheduler['admitted']} admitted, {scheduler['retries']} retries, {scheduler['failed']} failed, "
+          f"mean wait {scheduler['mean_wait_s']:.2f}s, max queue {scheduler['max_queue_depth']}")
+    requests = report["requests"]
+    print(f"  requests: {requests['calls']} calls, {requests['timeouts']} timeouts, "
+          f"{requests['hedges_sent']} hedges ({requests['hedges_won']} won)")
+    if "server" in report:
+        print(f"  server: {report['server']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the itinerary and chat agents")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which sessions start")
+    parser.add_argument("--days", type=int, default=3, help="Trip length of each session")
+    parser.add_argument("--chat-turns", type=int, default=4, help="Chat messages per session")
+    parser.add_argument("--edit-share", type=float, default=0.25, help="Share of chat messages asking for a change")
+    parser.add_argument("--stream", action="store_true", help="Use stream_itinerary and stream_message, as the app does")
+    parser.add_argument("--no-fan-out", dest="fan_out", action="store_false", help="Generate itineraries in one call")
+    parser.add_argument("--base-url", help="API to test instead of an in-process mock server")
+    parser.add_argument("--api-key", default="mock")
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="Mock server latency, see mock_groq_server.parse_latency")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=float, default=100000, help="Scheduler limit; match your plan for the real API")
+    parser.add_argument("--tokens-per-minute", type=float, default=100000000)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Deadline per call in seconds")
+    parser.add_argument("--hedge", action="store_true", help="Hedge calls slower than their model's p95")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = MockGroqServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                seed=args.seed).start()
+        base_url = server.base_url
+    print(f"🚀 {args.sessions} sessions against {base_url}")
+    
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    client = groq.Groq(api_key=args.api_key, base_url=base_url, max_retries=0,
+                       http_client=groq.DefaultHttpxClient(limits=limits))
+    async_client = groq.AsyncGroq(api_key=args.api_key, base_url=base_url, max_retries=0,
+                                  http_client=groq.DefaultAsyncHttpxClient(limits=limits))
+    scheduler = LLMScheduler(requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute)
+    control = RequestController(timeout_s=args.timeout, workers=max(32, args.sessions * 2),
+                                hedge={"enabled": args.hedge, "min_samples": 20})
+    report = LoadTest(args, client, async_client, scheduler, control).run()
+    if server is not None:
+        report["server"] = server.stats()
+        server.stop()
+    report["settings"] = vars(args)
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Local stand-in for the Groq chat completions API.
+
+Serves POST /openai/v1/chat/completions in the OpenAI/Groq format, with
+and without streaming, so ItineraryAgent and ChatAgent can be driven
+offline. Replies are canned but valid for the agents: a whole itinerary,
+a day plan or a single day for generation, a short answer or an edit for
+chat, and a summary for conversation memory. Latency follows a
+configurable distribution and a share of requests can fail with 500 or
+429 (with Retry-After) responses.
+
+The groq client reads GROQ_BASE_URL, so the app and any script can be
+pointed at the server without code changes.
+
+Usage (from the repository root):
+    python -m benchmarks.mock_groq_server --port 8000 --latency lognormal:0.8,0.5 --error-rate 0.01
+    GROQ_BASE_URL=http://127.0.0.1:8000 streamlit run app/main.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+
+from agents.conversation_memory import estimate_tokens
+from agents.model_router import classify_request
+from benchmarks.context_formats import synthetic_itinerary
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+_OUTLINE = re.compile(r"Outline a (\d+)-day trip")
+_DAY = re.compile(r"generate day (\d+)")
+_DURATION = re.compile(r'"duration":\s*(\d+)')
+_ACTIVITY_ID = re.compile(r"\b(a\d+)\b")
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    A latency sampler in seconds from a spec:
+    "fixed:0.5", "uniform:0.2,1.5", "lognormal:median,sigma" or "pareto:minimum,alpha".
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        # The median of a lognormal is exp(mu)
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if kind == "pareto" and len(values) == 2:
+        return lambda rng: values[0] * rng.paretovariate(values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+def _strip_ids(itinerary: Dict) -> List[Dict]:
+    """Days as a model would return them: without the ids the app assigns."""
+    days = []
+    for day in itinerary["days"]:
+        activities = [{key: value for key, value in activity.items() if key != "id"} for activity in day["activities"]]
+        days.append({"day_number": day["day_number"], "activities": activities})
+    return days
+
+def canned_reply(messages: List[Dict], seed: int = 0) -> str:
+    """A reply that the agents accept for the request these messages make."""
+    system = messages[0]["content"] if messages else ""
+    last = messages[-1]["content"] if messages else ""
+    if match := _OUTLINE.search(system):
+        days = int(match.group(1))
+        return json.dumps({"days": [
+            {"day_number": number, "theme": f"Theme {number}", "area": f"Area {number}",
+             "highlights": [f"Highlight {number}a", f"Highlight {number}b"], "budget": 100}
+            for number in range(1, days + 1)
+        ]})
+    if match := _DAY.search(last):
+        number = int(match.group(1))
+        day = _strip_ids(synthetic_itinerary(1, seed=seed + number))[0]
+        day["day_number"] = number
+        return json.dumps({"days": [day]})
+    if system.startswith("You are a travel planning assistant. Generate"):
+        match = _DURATION.search(last)
+        return json.dumps({"days": _strip_ids(synthetic_itinerary(int(match.group(1)) if match else 3, seed=seed))})
+    if system.startswith("Update the summary"):
+        return "The traveler asked about their itinerary and reviewed costs and times."
+    # Chat: an edit when the message asks for a change and the prompt holds activity ids
+    question = last.splitlines()[0] if last else ""
+    ids = _ACTIVITY_ID.findall(system)
+    if classify_request(question) == "edit" and ids:
+        edit = {"edits": [{"op": "update", "id": ids[0], "fields": {"time": "10:30"}}]}
+        return f"I moved that activity to 10:30.\n\n{json.dumps(edit)}"
+    return "Here is what your itinerary says about that: the activity is planned as shown, and the costs are included in your budget."
+
+class MockGroqServer:
+    """
+    Threaded mock of the chat completions endpoint, for benchmarks and local runs.
+    
+    Each request waits for a sampled latency before its first byte; the
+    completion then takes completion tokens / tokens_per_second more, spread
+    over the chunks when streaming.
+    """
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "lognormal:0.5,0.4",
+                 tokens_per_second: float = 500.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, seed: int = 0):
+        """
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 for any free port
+            latency (str): Time to first byte, see parse_latency
+            tokens_per_second (float): Generation speed after the first byte
+            error_rate (float): Share of requests answered with a 500
+            rate_limit_rate (float): Share of requests answered with a 429
+            retry_after (float): Retry-After seconds sent with a 429
+            seed (int): Seed of the latency, error and payload randomness
+        """
+        self.sample_latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "completion_tokens": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        """URL to pass to groq.Groq(base_url=...) or GROQ_BASE_URL."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "MockGroqServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+    
+    def _draw(self) -> Dict:
+        """Outcome and latency of one request, drawn under the lock from the seeded generator."""
+        with self._lock:
+            self._stats["requests"] += 1
+            roll = self._rng.random()
+            latency = self.sample_latency(self._rng)
+            if roll < self.error_rate:
+                self._stats["errors"] += 1
+                return {"status": 500, "latency": latency}
+            if roll < self.error_rate + self.rate_limit_rate:
+                self._stats["rate_limited"] += 1
+                return {"status": 429, "latency": 0.0}
+            return {"status": 200, "latency": latency}
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+    
+    def _handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def do_POST(self):
+                if self.path.rstrip("/") != COMPLETIONS_PATH:
+                    return self._json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                outcome = server._draw()
+                time.sleep(outcome["latency"])
+                if outcome["status"] == 500:
+                    return self._json(500, {"error": {"message": "Mock server error", "type": "internal_server_error"}})
+                if outcome["status"] == 429:
+                    return self._json(429, {"error": {"message": "Mock rate limit", "type": "rate_limit_exceeded"}},
+                                      {"retry-after": str(server.retry_after)})
+                
+                messages = body.get("messages", [])
+                text = canned_reply(messages, server.seed)
+                prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+                completion_tokens = estimate_tokens(text)
+                server._count("completion_tokens", completion_tokens)
+                if body.get("stream"):
+                    server._count("streamed")
+                    return self._stream(body, text)
+                time.sleep(completion_tokens / server.tokens_per_second)
+                self._json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens}
+                })
+            
+            def _json(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _stream(self, body: Dict, text: str):
+                """Server-sent events, one chunk of about 16 characters at a time."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+                delay = estimate_tokens(text) / server.tokens_per_second / max(len(pieces), 1)
+                try:
+                    for event in self._events(body, completion_id, pieces, delay):
+                        data = event.encode()
+                        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early (cancelled or lost a hedge)
+                    pass
+            
+            def _events(self, body: Dict, completion_id: str, pieces: List[str], delay: float) -> Iterator[str]:
+                for piece in pieces + [None]:
+                    choice = {"index": 0, "delta": {"content": piece} if piece is not None else {},
+                              "finish_reason": None if piece is not None else "stop"}
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", "mock"), "choices": [choice]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if piece is not None:
+                        time.sleep(delay)
+                yield "data: [DONE]\n\n"
+        
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock Groq chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="lognormal:0.5,0.4",
+                        help="fixed:S, uniform:MIN,MAX, lognormal:MEDIAN,SIGMA or pareto:MIN,ALPHA (seconds to first byte)")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    server = MockGroqServer(args.host, args.port, args.latency, args.tokens_per_second,
+                            args.error_rate, args.rate_limit_rate, args.retry_after, args.seed)
+    print(f"🚀 Mock Groq API at {server.base_url} (set GROQ_BASE_URL to use it)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"📊 {server.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Benchmark the RAG build and query path on synthetic corpora.
+
+For each corpus size this times loading the documents, encoding them,
+adding them to the index, saving everything, a cold load of the retriever
+and single-query latency, and records the peak RSS reached during each
+stage. Results are written as JSON so runs of two versions can be
+compared with --baseline.
+
+By default documents are embedded with a deterministic hashing encoder so
+the suite runs offline and encoding cost does not drown out the rest;
+pass --model to use a real (ideally tiny) sentence-transformers model.
+
+Usage (from the repository root):
+    python -m benchmarks.rag_suite --sizes 10000 100000 --output bench.json
+    python -m benchmarks.rag_suite --sizes 10000 --baseline bench.json
+    python -m benchmarks.rag_suite --sizes 10000 --model all-MiniLM-L6-v2
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.build_index import TravelIndexBuilder, load_config
+from rag.retriever import TravelRetriever
+from benchmarks.index_types import current_rss_mb
+from benchmarks.synthetic_corpus import CATEGORIES, DESTINATIONS, FILLERS, write_corpus
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+_TOKEN = re.compile(r"\w+")
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer.
+    
+    Each token is hashed to a signed bucket and the counts are L2-normalized,
+    so texts sharing words get similar vectors and results are repeatable
+    across runs and machines without downloading a model.
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._buckets = {}
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        """Column and sign a token is counted in."""
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            h = zlib.crc32(token.encode('utf-8'))
+            bucket = self._buckets[token] = (h % self.dimension, 1.0 if h >> 31 else -1.0)
+        return bucket
+    
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                column, sign = self._bucket(token)
+                embeddings[row, column] += sign
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+class PeakRSS:
+    """Samples resident memory on a background thread and keeps the peak."""
+    
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self) -> "PeakRSS":
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+@contextmanager
+def stage(results: Dict, name: str, builder: Optional[TravelIndexBuilder] = None):
+    """
+    Time a stage and record its duration, peak RSS and RSS growth in results.
+    
+    With a builder, the documents it encoded during the stage are recorded
+    too. Its counters keep growing over every stage, so they are read
+    before and after and only the difference is reported.
+    """
+    gc.collect()
+    rss_before = current_rss_mb()
+    encoded_before = (builder._encoded, builder._encode_seconds) if builder is not None else None
+    with PeakRSS() as peak:
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(seconds, 4),
+        "peak_rss_mb": round(peak.peak_mb, 1),
+        "rss_growth_mb": round(current_rss_mb() - rss_before, 1),
+    }
+    encoded = ""
+    if encoded_before is not None:
+        documents = builder._encoded - encoded_before[0]
+        encode_seconds = builder._encode_seconds - encoded_before[1]
+        results[name]["encoded"] = documents
+        results[name]["encode_docs_per_s"] = round(documents / encode_seconds, 1) if encode_seconds else None
+        encoded = f"  encoded {documents}"
+    print(f"  {name:<12} {seconds:9.3f}s  peak RSS {peak.peak_mb:8.1f} MB{encoded}")
+
+def evict_page_cache(directory: str):
+    """Ask the kernel to drop cached pages of the index files, so the next load reads from disk."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """Short travel queries drawn from the same vocabulary as the corpus."""
+    rng = random.Random(seed)
+    kinds = [kind for kinds in CATEGORIES.values() for kind in kinds]
+    return [
+        f"{rng.choice(FILLERS['interest'])} {rng.choice(kinds).lower()} in {rng.choice(DESTINATIONS)} "
+        f"for {rng.choice(FILLERS['audience'])}"
+        for _ in range(count)
+    ]
+
+def latency_percentiles(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+def measure_queries(retriever: TravelRetriever, queries: List[str], k: int) -> Dict:
+    """Single-query latency per search mode, with and without a filter, plus batched throughput."""
+    modes = ["dense"] + (["hybrid"] if retriever.lexical is not None else [])
+    report = {}
+    for mode in modes:
+        for label, filters in ((mode, None), (f"{mode}_filtered", {"destination": DESTINATIONS[0]})):
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                retriever.search(query, k, filters=filters, mode=mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+            report[label] = latency_percentiles(latencies)
+    
+    start = time.perf_counter()
+    retriever.search_batch(queries, k, mode="dense")
+    report["dense_batch_qps"] = round(len(queries) / (time.perf_counter() - start), 1)
+    return report
+
+def run_size(count: int, args: argparse.Namespace, config: Dict, model) -> Dict:
+    """Run every stage on a corpus of count documents."""
+    embedding_config = config['models']['embedding']
+    index_config = {**embedding_config.get('index', {}), **({"type": args.index_type} if args.index_type else {})}
+    
+    corpus = write_corpus(os.path.join(args.work_dir, f"corpus_{count}.jsonl"), count, args.seed)
+    output_path = os.path.join(args.work_dir, f"index_{count}")
+    os.makedirs(output_path, exist_ok=True)
+    
+    builder = TravelIndexBuilder(
+        model_name=args.model or "hashing-stub",
+        batch_size=embedding_config.get('batch_size', 256),
+        index_config=index_config,
+        store_config=config.get('document_store'),
+        lexical_config=config.get('retrieval', {}).get('lexical'),
+        model=model
+    )
+    
+    print(f"📏 {count} documents ({index_config.get('type', 'flat')} index)")
+    stages = {}
+    with stage(stages, "load"):
+        documents = list(builder.iter_travel_data(corpus))
+    with stage(stages, "encode", builder):
+        texts = [doc.get('description', '') for doc in documents]
+        embeddings = np.concatenate([
+            builder._encode(texts[i:i + builder.batch_size]) for i in range(0, len(texts), builder.batch_size)
+        ])
+        del texts
+    with stage(stages, "index_add"):
+        builder.index_embeddings(embeddings)
+    with stage(stages, "save"):
+        builder.save(documents, embeddings, output_path)
+    del documents, embeddings
+    builder.index = None
+    builder.documents = []
+    builder.manifest = {}
+    # So the builder's own throughput line covers the streaming build alone
+    builder._encoded = 0
+    builder._encode_seconds = 0.0
+    
+    if args.streaming:
+        with stage(stages, "stream_build", builder):
+            builder.build_index_streaming(corpus, output_path)
+        builder.index = None
+        builder.manifest = {}
+    
+    evict_page_cache(output_path)
+    with stage(stages, "cold_load"):
+        retriever = TravelRetriever(
+            output_path,
+            index_config=index_config,
+            price_bands=config.get('retrieval', {}).get('price_bands'),
+            model=model
+        )
+    
+    queries = make_queries(args.queries, args.seed)
+    with stage(stages, "query"):
+        query_report = measure_queries(retriever, queries, args.k)
+    
+    return {
+        "documents": count,
+        "index_type": index_config.get('type', 'flat'),
+        "index_mb": round(os.path.getsize(os.path.join(output_path, "index.faiss")) / 2**20, 2),
+        "stages": stages,
+        "queries": query_report,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Stage times, peak RSS and query latencies that got worse than the baseline by more than tolerance.
+    
+    Returns:
+        List[str]: One line per regression, empty when there are none
+    """
+    previous = {run["documents"]: run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in results["runs"]:
+        old = previous.get(run["documents"])
+        if old is None:
+            continue
+        pairs = []
+        for name, values in run["stages"].items():
+            if name in old["stages"]:
+                pairs.append((f"{name}.seconds", values["seconds"], old["stages"][name]["seconds"]))
+                pairs.append((f"{name}.peak_rss_mb", values["peak_rss_mb"], old["stages"][name]["peak_rss_mb"]))
+        for label, values in run["queries"].items():
+            if isinstance(values, dict) and label in old["queries"]:
+                pairs.append((f"query.{label}.p95_ms", values["p95_ms"], old["queries"][label]["p95_ms"]))
+        for metric, new_value, old_value in pairs:
+            if old_value and new_value > old_value * (1 + tolerance):
+                regressions.append(f"{run['documents']} docs {metric}: {old_value} -> {new_value} "
+                                   f"(+{(new_value / old_value - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG build and query path on synthetic data")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", help="sentence-transformers model to embed with (default: offline hashing encoder)")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of the hashing encoder")
+    parser.add_argument("--index-type", help="Override models.embedding.index.type")
+    parser.add_argument("--streaming", action="store_true", help="Also time an end-to-end streaming build")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--work-dir", default="data/bench", help="Where corpora and indexes are written")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+    
+    config = load_config(args.config)
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+    else:
+        model = HashingEncoder(args.dimension)
+    
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "faiss": faiss.__version__,
+            "encoder": args.model or f"hashing-{args.dimension}",
+            "seed": args.seed,
+        },
+        "runs": [run_size(count, args, config, model) for count in args.sizes],
+    }
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"⚠️ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Seeded generator of synthetic travel documents.
+
+Documents look like the real travel data: an id, name, destination,
+category, price, rating and a free-text description whose length follows a
+log-normal distribution (median around 60 words, long tail past 200).
+Every document depends only on the seed and its position, so the first
+10k documents of a 1M corpus are exactly the 10k corpus.
+
+Usage (from the repository root):
+    python -m benchmarks.synthetic_corpus --count 100000 --output data/bench/corpus_100k.jsonl
+"""
+import argparse
+import json
+import os
+import random
+from typing import Dict, Iterator
+
+DESTINATIONS = [
+    "Lisbon", "Porto", "Madrid", "Barcelona", "Seville", "Paris", "Lyon", "Nice", "Rome", "Florence",
+    "Venice", "Naples", "Athens", "Santorini", "Istanbul", "Vienna", "Prague", "Budapest", "Berlin",
+    "Munich", "Amsterdam", "Copenhagen", "Stockholm", "Oslo", "Reykjavik", "Dublin", "Edinburgh",
+    "London", "Marrakech", "Cairo", "Cape Town", "Nairobi", "Dubai", "Mumbai", "Jaipur",
+    "Bangkok", "Chiang Mai", "Hanoi", "Singapore", "Bali", "Tokyo", "Kyoto", "Osaka", "Seoul",
+    "Sydney", "Melbourne", "Auckland", "New York", "San Francisco", "Mexico City", "Cusco",
+    "Buenos Aires", "Rio de Janeiro", "Vancouver", "Havana"
+]
+
+CATEGORIES = {
+    "attraction": ["Tower", "Palace", "Gardens", "Viewpoint", "Bridge", "Castle", "Cathedral", "Square"],
+    "museum": ["Museum", "Gallery", "Archive", "Collection", "Heritage Centre"],
+    "restaurant": ["Bistro", "Tavern", "Kitchen", "Grill", "Trattoria", "Noodle Bar", "Cantina"],
+    "hotel": ["Hotel", "Inn", "Guesthouse", "Hostel", "Suites", "Lodge"],
+    "activity": ["Walking Tour", "Boat Trip", "Cooking Class", "Bike Tour", "Wine Tasting", "Hike"],
+    "nightlife": ["Jazz Club", "Rooftop Bar", "Wine Bar", "Night Market", "Live Music Venue"],
+    "transport": ["Station", "Ferry Terminal", "Airport Shuttle", "Cable Car"],
+}
+
+# Typical price ranges in dollars per category
+PRICE_RANGES = {
+    "attraction": (0, 40), "museum": (0, 30), "restaurant": (10, 150), "hotel": (40, 600),
+    "activity": (15, 250), "nightlife": (5, 80), "transport": (2, 60),
+}
+
+NAME_WORDS = [
+    "Royal", "Old Town", "Harbour", "Golden", "Blue", "Grand", "Little", "Riverside", "Hilltop",
+    "Central", "Botanical", "National", "Modern", "Ancient", "Sunset", "Market", "Cathedral", "Garden"
+]
+
+ADJECTIVES = [
+    "charming", "historic", "lively", "quiet", "family-friendly", "romantic", "iconic", "hidden",
+    "scenic", "affordable", "luxurious", "authentic", "colourful", "peaceful", "popular", "cozy"
+]
+
+SENTENCES = [
+    "This {adjective} {kind} in {destination} is a favourite with {audience}.",
+    "Visitors come for the {feature} and stay for the {feature2}.",
+    "It is best visited {time}, when the crowds are thinner and the light is softer.",
+    "Expect to spend around {hours} hours here, longer if you enjoy {interest}.",
+    "The {feature} is {adjective}, and the staff are happy to recommend {interest} nearby.",
+    "Getting there is easy by {transport} from the centre of {destination}.",
+    "Prices are {adjective2} for {destination}, and booking ahead is recommended in {season}.",
+    "Local guides describe it as one of the most {adjective} places for {interest} in the region.",
+    "Nearby you will find small cafes, street food stalls and shops selling {souvenir}.",
+    "Accessibility is good, with step-free access and seating along the way.",
+]
+
+FILLERS = {
+    "audience": ["families", "couples", "solo travellers", "photographers", "food lovers", "history buffs"],
+    "feature": ["views", "architecture", "atmosphere", "local food", "live music", "gardens", "river walk"],
+    "time": ["early in the morning", "at sunset", "on weekdays", "in the late afternoon", "after dark"],
+    "interest": ["photography", "art", "street food", "architecture", "hiking", "wine", "history", "shopping"],
+    "transport": ["metro", "tram", "bus", "bike", "taxi", "ferry", "foot"],
+    "season": ["summer", "spring", "autumn", "the holidays", "festival season"],
+    "souvenir": ["ceramics", "textiles", "spices", "local wine", "handmade jewellery", "postcards"],
+}
+
+def _description(rng: random.Random, destination: str, kind: str) -> str:
+    """Description of a log-normally distributed length, in words."""
+    target_words = max(10, min(400, int(rng.lognormvariate(4.1, 0.5))))
+    sentences = []
+    words = 0
+    while words < target_words:
+        sentence = rng.choice(SENTENCES).format(
+            adjective=rng.choice(ADJECTIVES),
+            adjective2=rng.choice(["reasonable", "high", "low", "fair"]),
+            kind=kind.lower(),
+            destination=destination,
+            feature2=rng.choice(FILLERS["feature"]),
+            hours=rng.randint(1, 6),
+            **{key: rng.choice(values) for key, values in FILLERS.items()}
+        )
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return " ".join(sentences)
+
+def generate_document(seed: int, position: int) -> Dict:
+    """The document at a position of the corpus for a seed."""
+    rng = random.Random(seed * 1_000_003 + position)
+    destination = rng.choice(DESTINATIONS)
+    category = rng.choice(list(CATEGORIES))
+    kind = rng.choice(CATEGORIES[category])
+    low, high = PRICE_RANGES[category]
+    price = 0 if rng.random() < 0.1 and low == 0 else round(rng.uniform(max(low, 1), high), 2)
+    return {
+        "id": f"doc-{position}",
+        "name": f"{rng.choice(NAME_WORDS)} {kind} {position}",
+        "destination": destination,
+        "category": category,
+        "price": price,
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "description": _description(rng, destination, kind),
+    }
+
+def generate_documents(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Yield count synthetic documents in position order."""
+    for position in range(count):
+        yield generate_document(seed, position)
+
+def write_corpus(path: str, count: int, seed: int = 0) -> str:
+    """
+    Write a corpus as JSONL, reusing an existing file with the same count and seed.
+    
+    Returns:
+        str: The path written
+    """
+    meta_path = f"{path}.meta.json"
+    meta = {"count": count, "seed": seed}
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, 'r') as f:
+            if json.load(f) == meta:
+                return path
+    
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", 'w') as f:
+        for doc in generate_documents(count, seed):
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    os.replace(f"{path}.tmp", path)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic travel corpus")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="JSONL file to write")
+    args = parser.parse_args()
+    
+    write_corpus(args.output, args.count, args.seed)
+    print(f"✅ Wrote {args.count} documents to {args.output}")
+
+if __name__ == "__main__":
+    main()
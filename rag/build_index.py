@@ -1,22 +1,326 @@
 import os
-from typing import List, Dict
+import argparse
+import shutil
+from typing import List, Dict, Iterator, Optional, TextIO, Tuple
+import hashlib
 import json
-import pickle
+import re
+import time
+import yaml
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+from .embedding_cache import EmbeddingCache
+from .document_store import DocumentStore, DocumentStoreWriter
+from .lexical_index import LEXICAL_FILES, LexicalIndexBuilder
+from .parallel_encoder import ParallelEncoder
+
+# Separators allowed between elements of a top-level JSON array
+_ARRAY_SEPARATOR = re.compile(r'[\s,]*')
+
+def _iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Expected a JSON array of documents")
+    pos = 1
+    eof = False
+    while True:
+        pos = _ARRAY_SEPARATOR.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            return
+        try:
+            doc, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The next element is incomplete; drop what was consumed and read more
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield doc
+
+# Index types selectable from models.embedding.index.type in config.yaml
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Vector encodings selectable from models.embedding.index.quantization
+QUANTIZATIONS = ("none", "sq8", "pq")
+
+# Index types built on inverted lists, which must be trained before use
+IVF_INDEX_TYPES = ("ivf_flat", "ivf_pq")
+
+# Index types whose vectors can be removed, as incremental updates require
+REMOVABLE_INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq")
+
+def needs_training(index_config: Optional[Dict]) -> bool:
+    """Whether an index must be trained on a sample before vectors are added."""
+    index_config = index_config or {}
+    return index_config.get("type", "flat") in IVF_INDEX_TYPES or index_config.get("quantization", "none") != "none"
+
+def is_compressed(index_config: Optional[Dict]) -> bool:
+    """Whether an index stores lossy codes instead of raw float32 vectors."""
+    index_config = index_config or {}
+    return index_config.get("type", "flat") == "ivf_pq" or index_config.get("quantization", "none") != "none"
+
+def load_config(config_path: str = "config.yaml") -> Dict:
+    """Load the application configuration."""
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+def create_index(dimension: int, index_config: Optional[Dict] = None, n_train: Optional[int] = None, id_map: bool = False) -> faiss.Index:
+    """
+    Create an empty FAISS index of the configured type and vector encoding.
+    
+    Args:
+        dimension: Embedding dimension
+        index_config: The models.embedding.index section of config.yaml
+        n_train: Number of training vectors available; IVF indexes shrink
+            nlist so that every list gets enough training points
+        id_map: Make the index add and remove vectors by explicit id. IVF
+            indexes support this natively; other types are wrapped in an
+            IndexIDMap2
+    
+    Returns:
+        faiss.Index: The untrained, empty index
+    """
+    index_config = index_config or {}
+    index_type = index_config.get("type", "flat")
+    quantization = index_config.get("quantization", "none")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {', '.join(QUANTIZATIONS)}")
+    if index_type == "ivf_pq" and quantization != "none":
+        raise ValueError("ivf_pq is already product-quantized; set quantization to none")
+    
+    pq_m = index_config.get('pq_m', 48)
+    pq = f"PQ{pq_m}x{index_config.get('pq_nbits', 8)}"
+    codes = {"none": "Flat", "sq8": "SQ8", "pq": pq}[quantization]
+    
+    if index_type == "flat":
+        factory = codes
+    elif index_type in IVF_INDEX_TYPES:
+        nlist = index_config.get("nlist", 1024)
+        if n_train:
+            # FAISS wants at least 39 training points per centroid
+            nlist = max(1, min(nlist, n_train // 39))
+        factory = f"IVF{nlist},{codes if index_type == 'ivf_flat' else pq}"
+    elif index_type == "hnsw":
+        factory = f"HNSW{index_config.get('hnsw_m', 32)}"
+        if quantization == "sq8":
+            factory += "_SQ8"
+        elif quantization == "pq":
+            factory += f"_PQ{pq_m}"
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+    
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = index_config.get("ef_construction", 200)
+    if id_map and index_type not in IVF_INDEX_TYPES:
+        index = faiss.IndexIDMap2(index)
+    set_search_params(index, index_config)
+    return index
+
+def build_faiss_index(embeddings: np.ndarray, index_config: Optional[Dict] = None, id_map: bool = False) -> faiss.Index:
+    """
+    Build an index of the configured type over an in-memory embedding matrix.
+    
+    Index types that need training are trained on a random sample of at
+    most train_size embeddings before everything is added. With id_map the
+    vectors get ids 0..n-1, matching their document positions.
+    """
+    index_config = index_config or {}
+    if needs_training(index_config):
+        train_size = min(len(embeddings), index_config.get("train_size", 50000))
+        sample = np.random.default_rng(0).choice(len(embeddings), size=train_size, replace=False)
+        index = create_index(embeddings.shape[1], index_config, n_train=train_size, id_map=id_map)
+        index.train(embeddings[np.sort(sample)])
+    else:
+        index = create_index(embeddings.shape[1], index_config, id_map=id_map)
+    if id_map:
+        index.add_with_ids(embeddings, np.arange(len(embeddings), dtype='int64'))
+    else:
+        index.add(embeddings)
+    return index
+
+def set_search_params(index: faiss.Index, index_config: Optional[Dict] = None):
+    """Apply query-time parameters (nprobe, efSearch) from the index config."""
+    index_config = index_config or {}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = index_config.get("nprobe", 16)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = index_config.get("ef_search", 64)
+
+def rerank_exact(queries: np.ndarray, candidates: np.ndarray, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank approximate search results by exact L2 distance.
+    
+    Args:
+        queries: Query embeddings, one row per query
+        candidates: Candidate ids from an approximate search, -1 for none
+        vectors: Float32 vectors indexed by id, typically a memory map
+        k: Number of results to keep per query
+    
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Exact distances and ids, -1 padded like FAISS
+    """
+    distances = np.full((len(queries), k), np.inf, dtype='float32')
+    ids = np.full((len(queries), k), -1, dtype='int64')
+    for i, (query, row) in enumerate(zip(queries, candidates)):
+        row = row[row >= 0]
+        if not len(row):
+            continue
+        exact = ((np.asarray(vectors[row]) - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:k]
+        distances[i, :len(order)] = exact[order]
+        ids[i, :len(order)] = row[order]
+    return distances, ids
+
+def estimate_recall(trained_index: faiss.Index, sample: np.ndarray, k: int = 10, rerank_candidates: Optional[int] = None) -> Dict[str, float]:
+    """
+    Estimate recall@k of a compressed index against exact search on a sample.
+    
+    An empty copy of the trained index is filled with the sample minus a
+    held-out slice of queries, so no extra training is needed.
+    
+    Returns:
+        Dict[str, float]: "recall" and, with rerank_candidates, "recall_reranked"
+    """
+    n_queries = min(200, len(sample) // 10)
+    if n_queries == 0:
+        return {}
+    base, queries = sample[:-n_queries], sample[-n_queries:]
+    k = min(k, len(base))
+    
+    exact = faiss.IndexFlatL2(sample.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+    
+    trial = faiss.clone_index(trained_index)
+    trial.add_with_ids(base, np.arange(len(base), dtype='int64'))
+    _, ids = trial.search(queries, k)
+    report = {"recall": sum(len(np.intersect1d(r, t)) for r, t in zip(ids, truth)) / truth.size}
+    
+    if rerank_candidates:
+        _, candidates = trial.search(queries, max(k, rerank_candidates))
+        _, ids = rerank_exact(queries, candidates, base, k)
+        report["recall_reranked"] = sum(len(np.intersect1d(r, t)) for r, t in zip(ids, truth)) / truth.size
+    return report
+
+def content_hash(doc: Dict) -> str:
+    """Stable hash of a document's full content."""
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def document_id(doc: Dict, id_field: str = "id") -> str:
+    """Id of a document, falling back to its content hash when it has none."""
+    if doc.get(id_field) is not None:
+        return str(doc[id_field])
+    return content_hash(doc)
+
+def _replace_all(paths: List[str]):
+    """Move finished <path>.tmp files into place, in the given order."""
+    for path in paths:
+        os.replace(f"{path}.tmp", path)
 
 class TravelIndexBuilder:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 256, index_config: Optional[Dict] = None, id_field: str = "id", cache_dir: Optional[str] = None, store_config: Optional[Dict] = None, lexical_config: Optional[Dict] = None, encoding_config: Optional[Dict] = None, model=None):
+        self.model_name = model_name
+        # An already-loaded model (anything with encode and get_sentence_embedding_dimension) may be passed in
+        self.model = model if model is not None else SentenceTransformer(model_name)
+        self.batch_size = batch_size
+        # Encoding is spread over a process pool when more than one worker is configured
+        self.encoding_config = encoding_config or {}
+        self.parallel_encoder = None
+        workers = self.encoding_config.get("workers", 1)
+        if workers != 1:
+            self.parallel_encoder = ParallelEncoder(
+                model_name,
+                workers=workers or None,
+                batch_size=self.encoding_config.get("worker_batch_size", 64)
+            )
+        self._encoded = 0
+        self._encode_seconds = 0.0
+        # Float32 vectors kept on disk for exact re-ranking of compressed indexes
+        self._vectors_file = None
+        # Embeddings of previously seen texts are reused across builds
+        self.embedding_cache = None
+        if cache_dir:
+            self.embedding_cache = EmbeddingCache(cache_dir, model_name, self.model.get_sentence_embedding_dimension())
+        self.index_config = index_config or {}
+        self.id_field = id_field
+        # Fields stored as columns in the document store for filtering
+        self.store_config = store_config or {}
+        # BM25 index built in the same pass, disabled when not configured
+        self.lexical_config = lexical_config or {}
+        self.lexical = None
         self.index = None
         self.documents = []
+        # Document id -> [index id, content hash] for incremental updates
+        self.manifest = {}
+        # Embeddings held back until there are enough to train the index
+        self._pending = []
     
     def load_travel_data(self, data_path: str) -> List[Dict]:
         """Load travel data from JSON file."""
         with open(data_path, 'r') as f:
             return json.load(f)
     
+    def iter_travel_data(self, data_path: str) -> Iterator[Dict]:
+        """
+        Stream travel documents from a JSON array or JSONL file.
+        
+        Args:
+            data_path: Path to a JSON file holding an array of documents, or
+                a JSONL file with one document per line
+        
+        Yields:
+            Dict: One travel document at a time
+        """
+        with open(data_path, 'r') as f:
+            first_char = ''
+            while True:
+                first_char = f.read(1)
+                if not first_char or not first_char.isspace():
+                    break
+            f.seek(0)
+            
+            if first_char == '[':
+                yield from _iter_json_array(f)
+            else:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts as a float32 matrix, reusing cached embeddings."""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self._encode_texts)
+        return self._encode_texts(texts)
+    
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Run the embedding model over a list of texts, in parallel if configured."""
+        start = time.perf_counter()
+        if self.parallel_encoder is not None:
+            embeddings = self.parallel_encoder.encode(texts)
+        else:
+            embeddings = self.model.encode(texts, batch_size=self.batch_size)
+        self._encode_seconds += time.perf_counter() - start
+        self._encoded += len(texts)
+        return np.ascontiguousarray(embeddings, dtype='float32')
+    
+    def _read_batch_size(self, batch_size: Optional[int]) -> int:
+        """Documents to read per batch, enough to give every encoding worker a chunk."""
+        batch_size = batch_size or self.batch_size
+        if self.parallel_encoder is not None:
+            batch_size = max(batch_size, self.parallel_encoder.workers * self.parallel_encoder.batch_size)
+        return batch_size
+    
     def build_index(self, documents: List[Dict], output_path: str):
         """
         Build FAISS index from travel documents.
@@ -29,38 +333,379 @@ class TravelIndexBuilder:
         texts = [doc.get('description', '') for doc in documents]
         
         # Generate embeddings
-        embeddings = self.model.encode(texts)
-        
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype('float32'))
+        embeddings = self._encode(texts)
         
-        # Save index and documents
+        self.index_embeddings(embeddings)
+        self.save(documents, embeddings, output_path)
+    
+    def index_embeddings(self, embeddings: np.ndarray):
+        """Create a FAISS index holding embeddings, training it on a random sample if required."""
+        if needs_training(self.index_config):
+            train_size = min(len(embeddings), self.index_config.get("train_size", 50000))
+            sample = np.random.default_rng(0).choice(len(embeddings), size=train_size, replace=False)
+            self._train_index(embeddings[np.sort(sample)])
+        else:
+            self.index = create_index(embeddings.shape[1], self.index_config, id_map=True)
+        self._add_vectors(embeddings)
+    
+    def save(self, documents: List[Dict], embeddings: np.ndarray, output_path: str):
+        """Write the index built by index_embeddings along with its documents."""
         self.documents = documents
-        self._save_index(output_path)
+        self.manifest = {}
+        writer = self._open_store_writer(output_path)
+        self._write_vectors(embeddings)
+        for doc in documents:
+            position = writer.append(doc)
+            if self.lexical is not None:
+                self.lexical.add(doc)
+            self.manifest[document_id(doc, self.id_field)] = [position, content_hash(doc)]
+        self._save_index(output_path, writer)
+    
+    def build_index_streaming(self, data_path: str, output_path: str, batch_size: Optional[int] = None) -> int:
+        """
+        Build FAISS index by streaming documents from disk in fixed-size batches.
+        
+        Only one batch of documents and embeddings is held in memory at a time;
+        each batch is added to the index and appended to the document store
+        before the next one is read. Index types that need training are
+        trained on the first train_size embeddings, which are held back
+        until the sample is complete.
+        
+        Args:
+            data_path: Path to a JSON array or JSONL file of travel documents
+            output_path: Path to save the index
+            batch_size: Number of documents to encode per batch
+        
+        Returns:
+            int: Number of documents indexed
+        """
+        batch_size = self._read_batch_size(batch_size)
+        self.index = None
+        self.documents = []
+        self.manifest = {}
+        self._pending = []
+        total = 0
+        
+        writer = self._open_store_writer(output_path)
+        batch = []
+        for doc in self.iter_travel_data(data_path):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                total += self._add_batch(batch, writer)
+                batch = []
+        if batch:
+            total += self._add_batch(batch, writer)
+        
+        if self._pending:
+            # Fewer documents than train_size: train on everything seen
+            self._flush_pending()
+        
+        if self.index is None:
+            writer.close()
+            self._close_vectors()
+            raise ValueError(f"No documents found in {data_path}")
+        
+        self._save_index(output_path, writer)
+        print(f"✅ Indexed {total} documents in batches of {batch_size}")
+        self._report_encoding()
+        return total
+    
+    def _add_batch(self, batch: List[Dict], writer: DocumentStoreWriter) -> int:
+        """Encode one batch, add it to the index and append it to the document store."""
+        embeddings = self._encode([doc.get('description', '') for doc in batch])
+        
+        self._write_vectors(embeddings)
+        if self.index is None and not needs_training(self.index_config):
+            self.index = create_index(embeddings.shape[1], self.index_config, id_map=True)
+        
+        for doc in batch:
+            position = writer.append(doc)
+            if self.lexical is not None:
+                self.lexical.add(doc)
+            self.manifest[document_id(doc, self.id_field)] = [position, content_hash(doc)]
+        
+        if self.index is not None:
+            self._add_vectors(embeddings)
+        else:
+            self._pending.append(embeddings)
+            if sum(len(e) for e in self._pending) >= self.index_config.get("train_size", 50000):
+                self._flush_pending()
+        
+        return len(batch)
+    
+    def _flush_pending(self):
+        """Train the index on the held-back embeddings, then add them."""
+        embeddings = np.concatenate(self._pending)
+        self._pending = []
+        self._train_index(embeddings)
+        self._add_vectors(embeddings)
+    
+    def _add_vectors(self, embeddings: np.ndarray):
+        """Add vectors with ids continuing from the last document position."""
+        start = self.index.ntotal
+        self.index.add_with_ids(embeddings, np.arange(start, start + len(embeddings), dtype='int64'))
+    
+    def _train_index(self, embeddings: np.ndarray):
+        """Create the index and train it on a sample of embeddings."""
+        index_name = self.index_config.get('type', 'flat')
+        if self.index_config.get("quantization", "none") != "none":
+            index_name += f"/{self.index_config['quantization']}"
+        print(f"🏋️ Training {index_name} index on {len(embeddings)} vectors...")
+        self.index = create_index(embeddings.shape[1], self.index_config, n_train=len(embeddings), id_map=True)
+        self.index.train(embeddings)
+        
+        if is_compressed(self.index_config):
+            rerank_candidates = self.index_config.get("rerank_candidates", 100) if self.index_config.get("rerank") else None
+            report = estimate_recall(self.index, embeddings, rerank_candidates=rerank_candidates)
+            if report:
+                message = f"🎯 Estimated recall@10 against exact search: {report['recall']:.3f}"
+                if "recall_reranked" in report:
+                    message += f" ({report['recall_reranked']:.3f} with exact re-ranking)"
+                print(message)
     
-    def _save_index(self, output_path: str):
-        """Save the index and documents to disk."""
+    def update_index(self, data_path: str, output_path: str, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring an existing index up to date with the travel data.
+        
+        Documents are matched to the manifest by id and content hash: only
+        new or changed documents are re-embedded, and documents that are no
+        longer in the data are removed from the index. Index ids are document
+        positions, so a changed document keeps its id and a removed one
+        leaves an empty slot. Unchanged records are copied into the new
+        document store without being decoded, unless the lexical index
+        needs them to be re-tokenized. All files are written to
+        temporary paths and moved into place once complete.
+        
+        Falls back to a full build when there is no manifest, when the model,
+        index or document store settings changed, or when the index type
+        cannot remove vectors.
+        
+        Args:
+            data_path: Path to a JSON array or JSONL file of travel documents
+            output_path: Directory holding the existing index
+            batch_size: Number of documents to encode per batch
+        
+        Returns:
+            Dict[str, int]: Counts of added, changed, removed and unchanged documents
+        """
+        batch_size = self._read_batch_size(batch_size)
+        manifest_path = f"{output_path}/manifest.json"
+        
+        previous = None
+        if os.path.exists(manifest_path) and os.path.exists(f"{output_path}/index.faiss"):
+            with open(manifest_path, 'r') as f:
+                previous = json.load(f)
+        
+        if (previous is None
+                or previous.get("model") != self.model_name
+                or previous.get("index_config") != self.index_config
+                or previous.get("store_config") != self.store_config
+                or previous.get("lexical_config") != self.lexical_config
+                or self.index_config.get("type", "flat") not in REMOVABLE_INDEX_TYPES):
+            print("🔁 Existing index cannot be updated in place, running a full build")
+            total = self.build_index_streaming(data_path, output_path, batch_size)
+            return {"added": total, "changed": 0, "removed": 0, "unchanged": 0}
+        
+        self.index = faiss.read_index(f"{output_path}/index.faiss")
+        store = DocumentStore(output_path)
+        self.manifest = previous["documents"]
+        stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        # Position -> new document, for new and changed documents only
+        updates = {}
+        next_position = len(store)
+        batch = []
+        if self.index_config.get("rerank"):
+            # Patch a copy of the re-ranking vectors in place
+            shutil.copyfile(f"{output_path}/vectors.f32", f"{output_path}/vectors.f32.tmp")
+            self._vectors_file = open(f"{output_path}/vectors.f32.tmp", 'r+b')
+        
+        for doc in self.iter_travel_data(data_path):
+            doc_id = document_id(doc, self.id_field)
+            doc_hash = content_hash(doc)
+            seen.add(doc_id)
+            
+            entry = self.manifest.get(doc_id)
+            if entry and entry[1] == doc_hash:
+                stats["unchanged"] += 1
+                continue
+            
+            if entry:
+                position = entry[0]
+                stats["changed"] += 1
+            else:
+                position = next_position
+                next_position += 1
+                stats["added"] += 1
+            
+            self.manifest[doc_id] = [position, doc_hash]
+            updates[position] = doc
+            batch.append((position, doc))
+            if len(batch) >= batch_size:
+                self._upsert(batch)
+                batch = []
+        if batch:
+            self._upsert(batch)
+        
+        removed = {self.manifest.pop(doc_id)[0] for doc_id in list(self.manifest) if doc_id not in seen}
+        if removed:
+            self.index.remove_ids(np.array(sorted(removed), dtype='int64'))
+        stats["removed"] = len(removed)
+        
+        writer = self._open_store_writer(output_path)
+        for position in range(next_position):
+            if position in updates:
+                doc = updates[position]
+                writer.append(doc)
+            elif position in removed or position >= len(store):
+                doc = None
+                writer.append(None)
+            else:
+                record = store.record(position)
+                writer.append_record(record, store.values(position))
+                doc = json.loads(record) if record and self.lexical is not None else None
+            if self.lexical is not None:
+                self.lexical.add(doc)
+        self._save_index(output_path, writer)
+        print(f"✅ Index updated: {stats['added']} added, {stats['changed']} changed, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+        self._report_encoding()
+        return stats
+    
+    def _report_encoding(self):
+        """Print encoding throughput and embedding cache hits and misses."""
+        if self._encode_seconds:
+            print(f"🚀 Encoded {self._encoded} documents in {self._encode_seconds:.1f}s "
+                  f"({self._encoded / self._encode_seconds:.1f} docs/s)")
+        if self.embedding_cache is not None:
+            stats = self.embedding_cache.stats()
+            print(f"💾 Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    
+    def _upsert(self, batch: List[Tuple[int, Dict]]):
+        """Re-embed (position, document) pairs and replace their vectors."""
+        ids = np.array([position for position, _ in batch], dtype='int64')
+        embeddings = self._encode([doc.get('description', '') for _, doc in batch])
+        self.index.remove_ids(ids)
+        self.index.add_with_ids(embeddings, ids)
+        if self._vectors_file is not None:
+            for position, row in zip(ids, embeddings):
+                self._vectors_file.seek(int(position) * row.nbytes)
+                self._vectors_file.write(row.tobytes())
+    
+    def _write_manifest(self, manifest_path: str):
+        """Write the document manifest along with the settings it was built with."""
+        with open(manifest_path, 'w') as f:
+            json.dump({
+                "model": self.model_name,
+                "index_config": self.index_config,
+                "store_config": self.store_config,
+                "lexical_config": self.lexical_config,
+                "documents": self.manifest
+            }, f)
+    
+    def close(self):
+        """Release the encoding worker processes, if any."""
+        if self.parallel_encoder is not None:
+            self.parallel_encoder.close()
+            self.parallel_encoder = None
+    
+    def _write_vectors(self, embeddings: np.ndarray):
+        """Append embeddings to the re-ranking vector file, when one is being written."""
+        if self._vectors_file is not None:
+            self._vectors_file.write(embeddings.tobytes())
+    
+    def _close_vectors(self):
+        if self._vectors_file is not None:
+            self._vectors_file.close()
+            self._vectors_file = None
+    
+    def _open_store_writer(self, output_path: str) -> DocumentStoreWriter:
+        """
+        Start writing a new document store next to the index, along with the
+        lexical index and the float32 re-ranking vectors when enabled.
+        """
+        if self.index_config.get("rerank") and self._vectors_file is None:
+            self._vectors_file = open(f"{output_path}/vectors.f32.tmp", 'wb')
+        self.lexical = None
+        if self.lexical_config.get("enabled", False):
+            self.lexical = LexicalIndexBuilder(
+                text_fields=self.lexical_config.get("text_fields", ["name", "title", "description"]),
+                name_fields=self.lexical_config.get("name_fields", ["name", "title"]),
+                k1=self.lexical_config.get("k1", 1.2),
+                b=self.lexical_config.get("b", 0.75)
+            )
+        return DocumentStoreWriter(
+            output_path,
+            category_fields=self.store_config.get("category_fields", []),
+            numeric_fields=self.store_config.get("numeric_fields", [])
+        )
+    
+    def _save_index(self, output_path: str, writer: DocumentStoreWriter):
+        """Save the index, document store and manifest to disk atomically."""
+        # Finish the document store
+        writer.close()
+        paths = writer.paths
+        
+        # Save the lexical index and re-ranking vectors, or drop stale ones when disabled
+        stale = []
+        if self.lexical is not None:
+            paths += self.lexical.save(output_path)
+            self.lexical = None
+        else:
+            stale += LEXICAL_FILES
+        self._close_vectors()
+        if self.index_config.get("rerank"):
+            paths.append(f"{output_path}/vectors.f32")
+        else:
+            stale.append("vectors.f32")
+        for name in stale:
+            if os.path.exists(f"{output_path}/{name}"):
+                os.remove(f"{output_path}/{name}")
+        
         # Save FAISS index
-        faiss.write_index(self.index, f"{output_path}/index.faiss")
+        faiss.write_index(self.index, f"{output_path}/index.faiss.tmp")
+        if is_compressed(self.index_config):
+            raw_bytes = self.index.ntotal * self.index.d * 4
+            index_bytes = os.path.getsize(f"{output_path}/index.faiss.tmp")
+            print(f"📦 Index is {index_bytes / 2**20:.1f} MB against {raw_bytes / 2**20:.1f} MB of raw float32 vectors "
+                  f"({raw_bytes / index_bytes:.1f}x compression)")
         
-        # Save documents
-        with open(f"{output_path}/documents.pkl", 'wb') as f:
-            pickle.dump(self.documents, f)
+        # The manifest goes last so it never describes files that are not in place
+        self._write_manifest(f"{output_path}/manifest.json.tmp")
+        _replace_all(paths + [f"{output_path}/{name}" for name in ("index.faiss", "manifest.json")])
 
 def main():
-    # Initialize builder
-    builder = TravelIndexBuilder()
+    """Build or update the index from the repository root with: python -m rag.build_index [--incremental]"""
+    parser = argparse.ArgumentParser(description="Build the travel document index")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-embed new or changed documents and drop deleted ones")
+    args = parser.parse_args()
     
-    # Load travel data
-    data_path = "data/raw/travel_data.json"
-    documents = builder.load_travel_data(data_path)
+    config = load_config()
+    embedding_config = config['models']['embedding']
+    
+    # Initialize builder
+    builder = TravelIndexBuilder(
+        model_name=embedding_config['name'],
+        batch_size=embedding_config.get('batch_size', 256),
+        index_config=embedding_config.get('index'),
+        cache_dir=config['paths'].get('embedding_cache'),
+        store_config=config.get('document_store'),
+        lexical_config=config.get('retrieval', {}).get('lexical'),
+        encoding_config=embedding_config.get('encoding')
+    )
     
-    # Build and save index
-    output_path = "data/processed"
+    # Build and save index, streaming the travel data in batches
+    data_path = config['paths']['raw_data']
+    output_path = os.path.dirname(config['paths']['index_path'])
     os.makedirs(output_path, exist_ok=True)
-    builder.build_index(documents, output_path)
+    try:
+        if args.incremental:
+            builder.update_index(data_path, output_path)
+        else:
+            builder.build_index_streaming(data_path, output_path)
+    finally:
+        builder.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
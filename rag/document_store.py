@@ -0,0 +1,164 @@
+import os
+import json
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+
+RECORDS_FILE = "documents.bin"
+OFFSETS_FILE = "documents.idx"
+COLUMNS_FILE = "columns.json"
+
+def _column_file(field: str) -> str:
+    return f"column_{field}.bin"
+
+class DocumentStoreWriter:
+    """
+    Append-only writer for a DocumentStore.
+    
+    Each document is written as one UTF-8 JSON record, and its end offset is
+    appended to an int64 offsets file, so records can be located without
+    reading the ones before them. Category fields are dictionary-encoded
+    into int32 code columns (-1 when missing) and numeric fields into
+    float32 columns (NaN when missing). Appending None leaves an empty slot.
+    
+    Files are written with a suffix (".tmp" by default) so they can be moved
+    into place together with the index once everything is complete.
+    """
+    
+    def __init__(self, directory: str, category_fields: Sequence[str] = (), numeric_fields: Sequence[str] = (), suffix: str = ".tmp"):
+        self.directory = directory
+        self.category_fields = list(category_fields)
+        self.numeric_fields = list(numeric_fields)
+        self.suffix = suffix
+        self.count = 0
+        self._offset = 0
+        self._vocabularies = {field: {} for field in self.category_fields}
+        
+        self._records = open(self._path(RECORDS_FILE), 'wb')
+        self._offsets = open(self._path(OFFSETS_FILE), 'wb')
+        self._offsets.write(np.int64(0).tobytes())
+        self._columns = {
+            field: open(self._path(_column_file(field)), 'wb')
+            for field in self.category_fields + self.numeric_fields
+        }
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + self.suffix)
+    
+    @property
+    def paths(self) -> List[str]:
+        """Final paths of every file the writer produces."""
+        names = [RECORDS_FILE, OFFSETS_FILE, COLUMNS_FILE]
+        names += [_column_file(field) for field in self.category_fields + self.numeric_fields]
+        return [os.path.join(self.directory, name) for name in names]
+    
+    def append(self, doc: Optional[Dict]) -> int:
+        """
+        Append a document, or an empty slot for None.
+        
+        Returns:
+            int: Position of the document in the store
+        """
+        record = b'' if doc is None else json.dumps(doc, ensure_ascii=False).encode('utf-8')
+        return self.append_record(record, doc or {})
+    
+    def append_record(self, record: bytes, values: Dict) -> int:
+        """Append an already-encoded record along with its column values."""
+        self._records.write(record)
+        self._offset += len(record)
+        self._offsets.write(np.int64(self._offset).tobytes())
+        
+        for field in self.category_fields:
+            value = values.get(field)
+            if value is None:
+                code = -1
+            else:
+                code = self._vocabularies[field].setdefault(str(value), len(self._vocabularies[field]))
+            self._columns[field].write(np.int32(code).tobytes())
+        for field in self.numeric_fields:
+            try:
+                number = float(values.get(field))
+            except (TypeError, ValueError):
+                number = float('nan')
+            self._columns[field].write(np.float32(number).tobytes())
+        
+        self.count += 1
+        return self.count - 1
+    
+    def close(self):
+        """Flush all files and write the column metadata."""
+        self._records.close()
+        self._offsets.close()
+        for f in self._columns.values():
+            f.close()
+        with open(self._path(COLUMNS_FILE), 'w') as f:
+            json.dump({
+                "count": self.count,
+                "category_fields": {field: list(vocabulary) for field, vocabulary in self._vocabularies.items()},
+                "numeric_fields": self.numeric_fields
+            }, f, ensure_ascii=False)
+
+class DocumentStore:
+    """
+    Read-only, memory-mapped view of documents written by DocumentStoreWriter.
+    
+    Opening the store maps the files without reading them; only the records
+    for requested positions are decoded.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, COLUMNS_FILE), 'r') as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.category_vocabularies = meta["category_fields"]
+        self.numeric_fields = meta["numeric_fields"]
+        
+        self._offsets = np.memmap(os.path.join(directory, OFFSETS_FILE), dtype='int64', mode='r', shape=(self.count + 1,))
+        records_size = int(self._offsets[-1])
+        # np.memmap cannot map an empty file
+        self._records = np.memmap(os.path.join(directory, RECORDS_FILE), dtype='uint8', mode='r') if records_size else b''
+        
+        self.columns = {}
+        for field in self.category_vocabularies:
+            self.columns[field] = self._map_column(field, 'int32')
+        for field in self.numeric_fields:
+            self.columns[field] = self._map_column(field, 'float32')
+    
+    def _map_column(self, field: str, dtype: str) -> np.ndarray:
+        if self.count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, _column_file(field)), dtype=dtype, mode='r', shape=(self.count,))
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def record(self, position: int) -> bytes:
+        """Raw JSON bytes of the document at a position (empty for a removed slot)."""
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return bytes(self._records[start:end])
+    
+    def get(self, position: int) -> Optional[Dict]:
+        """Document at a position, or None for a removed slot or invalid position."""
+        if position < 0 or position >= self.count:
+            return None
+        record = self.record(position)
+        return json.loads(record) if record else None
+    
+    def get_many(self, positions: Sequence[int]) -> List[Optional[Dict]]:
+        """Documents at the given positions, such as the ids returned by FAISS."""
+        return [self.get(int(position)) for position in positions]
+    
+    def values(self, position: int) -> Dict:
+        """Column values of the document at a position, without decoding its record."""
+        values = {}
+        for field, vocabulary in self.category_vocabularies.items():
+            code = int(self.columns[field][position])
+            values[field] = vocabulary[code] if code >= 0 else None
+        for field in self.numeric_fields:
+            number = float(self.columns[field][position])
+            values[field] = None if np.isnan(number) else number
+        return values
+    
+    def __iter__(self) -> Iterator[Optional[Dict]]:
+        for position in range(self.count):
+            yield self.get(position)
@@ -0,0 +1,117 @@
+import os
+import re
+import hashlib
+from typing import Callable, Dict, List
+import numpy as np
+
+# Length of a SHA-1 digest, the size of one key record
+_KEY_SIZE = 20
+
+class EmbeddingCache:
+    """
+    Persistent cache of text embeddings for one embedding model.
+    
+    Vectors are appended to a raw float32 file that is read through a
+    memory map, and a parallel key file holds the SHA-1 of each row's text.
+    The key file is loaded into a dict of text hash -> row offset on open,
+    so a lookup never reads vectors that are not needed. Each model gets
+    its own directory under cache_dir, which makes the effective key
+    (model name, text hash).
+    
+    The cache assumes a single writing process at a time.
+    """
+    
+    def __init__(self, cache_dir: str, model_name: str, dimension: int):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.directory = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None
+        self._offsets = self._load_offsets()
+    
+    def _load_offsets(self) -> Dict[bytes, int]:
+        """Read the key file into a text hash -> row dict."""
+        if not os.path.exists(self.keys_path):
+            return {}
+        with open(self.keys_path, 'rb') as f:
+            data = f.read()
+        
+        # An interrupted append can leave a partial row in either file; keep
+        # only rows present in both so new rows stay aligned
+        row_size = self.dimension * 4
+        vector_rows = os.path.getsize(self.vectors_path) // row_size if os.path.exists(self.vectors_path) else 0
+        rows = min(len(data) // _KEY_SIZE, vector_rows)
+        if os.path.exists(self.vectors_path):
+            os.truncate(self.vectors_path, rows * row_size)
+        os.truncate(self.keys_path, rows * _KEY_SIZE)
+        return {data[i * _KEY_SIZE:(i + 1) * _KEY_SIZE]: i for i in range(rows)}
+    
+    def __len__(self) -> int:
+        return len(self._offsets)
+    
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha1(text.encode('utf-8')).digest()
+    
+    def _vector_map(self) -> np.ndarray:
+        """Memory map over every row currently in the cache."""
+        if self._vectors is None or len(self._vectors) < len(self._offsets):
+            self._vectors = np.memmap(self.vectors_path, dtype='float32', mode='r',
+                                      shape=(len(self._offsets), self.dimension))
+        return self._vectors
+    
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embed texts, calling encode_fn only for texts not already cached.
+        
+        Args:
+            texts: Texts to embed
+            encode_fn: Function returning a float32 embedding matrix for a list of texts
+        
+        Returns:
+            np.ndarray: Embeddings in the same order as texts
+        """
+        keys = [self._key(text) for text in texts]
+        rows = np.array([self._offsets.get(key, -1) for key in keys], dtype='int64')
+        embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+        
+        cached = np.flatnonzero(rows >= 0)
+        if len(cached):
+            embeddings[cached] = self._vector_map()[rows[cached]]
+        
+        missing = np.flatnonzero(rows < 0)
+        self.hits += len(cached)
+        self.misses += len(missing)
+        if len(missing):
+            # Encode each distinct missing text once
+            first_seen = {}
+            for i in missing:
+                first_seen.setdefault(keys[i], i)
+            unique = list(first_seen.values())
+            encoded = np.ascontiguousarray(encode_fn([texts[i] for i in unique]), dtype='float32')
+            self._append([keys[i] for i in unique], encoded)
+            
+            position = {key: j for j, key in enumerate(first_seen)}
+            for i in missing:
+                embeddings[i] = encoded[position[keys[i]]]
+        
+        return embeddings
+    
+    def _append(self, keys: List[bytes], vectors: np.ndarray):
+        """Append new rows to the vector and key files."""
+        with open(self.vectors_path, 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b''.join(keys))
+        
+        start = len(self._offsets)
+        for row, key in enumerate(keys, start):
+            self._offsets[key] = row
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts since the cache was opened."""
+        return {"entries": len(self._offsets), "hits": self.hits, "misses": self.misses}
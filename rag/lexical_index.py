@@ -0,0 +1,182 @@
+import os
+import re
+import json
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+LEXICAL_FILES = ("lexical.json", "lexical_offsets.npy", "lexical_doc_ids.npy", "lexical_tfs.npy", "lexical_doc_lengths.npy")
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of a text."""
+    return _TOKEN.findall(text.lower())
+
+def normalize_name(text: str) -> str:
+    """Canonical form of a name for exact-match lookups."""
+    return " ".join(tokenize(text))
+
+class LexicalIndexBuilder:
+    """
+    Accumulates an inverted index while documents are added in position order.
+    
+    Postings are kept in compact typed arrays per term and flattened on save
+    into one offsets array plus parallel doc id and term frequency arrays.
+    Names (e.g. landmark or station names) are also recorded verbatim so
+    exact-name queries can be answered without scoring or embedding.
+    """
+    
+    def __init__(self, text_fields: Sequence[str] = ("name", "title", "description"), name_fields: Sequence[str] = ("name", "title"), k1: float = 1.2, b: float = 0.75):
+        self.text_fields = list(text_fields)
+        self.name_fields = list(name_fields)
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_lengths = array('i')
+        self._names = {}
+    
+    def add(self, doc: Optional[Dict]) -> int:
+        """
+        Index the next document, or an empty slot for None.
+        
+        Returns:
+            int: Position of the document
+        """
+        position = len(self._doc_lengths)
+        if doc is None:
+            self._doc_lengths.append(0)
+            return position
+        
+        text = " ".join(str(doc[field]) for field in self.text_fields if doc.get(field))
+        tokens = tokenize(text)
+        self._doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('i'), array('H'))
+            postings[0].append(position)
+            postings[1].append(min(tf, 65535))
+        
+        for field in self.name_fields:
+            if doc.get(field):
+                self._names.setdefault(normalize_name(str(doc[field])), []).append(position)
+        return position
+    
+    def save(self, directory: str, suffix: str = ".tmp") -> List[str]:
+        """
+        Write the index files with a suffix.
+        
+        Returns:
+            List[str]: Final paths of the files written
+        """
+        terms = list(self._postings)
+        lengths = np.array([len(self._postings[term][0]) for term in terms], dtype='int64')
+        offsets = np.zeros(len(terms) + 1, dtype='int64')
+        np.cumsum(lengths, out=offsets[1:])
+        
+        doc_ids = np.empty(offsets[-1], dtype='int32')
+        tfs = np.empty(offsets[-1], dtype='uint16')
+        for i, term in enumerate(terms):
+            ids, counts = self._postings[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = np.frombuffer(ids, dtype='int32')
+            tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(counts, dtype='uint16')
+        
+        def path(name: str) -> str:
+            return os.path.join(directory, name + suffix)
+        
+        with open(path("lexical.json"), 'w') as f:
+            json.dump({"terms": terms, "names": self._names, "k1": self.k1, "b": self.b}, f, ensure_ascii=False)
+        # np.save adds .npy to names that lack it, so write through file objects
+        for name, data in (("lexical_offsets.npy", offsets), ("lexical_doc_ids.npy", doc_ids),
+                           ("lexical_tfs.npy", tfs), ("lexical_doc_lengths.npy", np.frombuffer(self._doc_lengths, dtype='int32'))):
+            with open(path(name), 'wb') as f:
+                np.save(f, data)
+        return [os.path.join(directory, name) for name in LEXICAL_FILES]
+
+class LexicalIndex:
+    """BM25 search over an index written by LexicalIndexBuilder."""
+    
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "lexical.json"), 'r') as f:
+            meta = json.load(f)
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self._term_ids = {term: i for i, term in enumerate(meta["terms"])}
+        self._names = {name: np.array(ids, dtype='int64') for name, ids in meta["names"].items()}
+        
+        self._offsets = np.load(os.path.join(directory, "lexical_offsets.npy"), mmap_mode='r')
+        self._doc_ids = np.load(os.path.join(directory, "lexical_doc_ids.npy"), mmap_mode='r')
+        self._tfs = np.load(os.path.join(directory, "lexical_tfs.npy"), mmap_mode='r')
+        self._doc_lengths = np.load(os.path.join(directory, "lexical_doc_lengths.npy"))
+        
+        indexed = self._doc_lengths[self._doc_lengths > 0]
+        self.n_docs = len(indexed)
+        self.avg_length = float(indexed.mean()) if len(indexed) else 0.0
+    
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return all(os.path.exists(os.path.join(directory, name)) for name in LEXICAL_FILES)
+    
+    def exact_match(self, query: str, allowed: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Ids of documents whose name is exactly the query, if any."""
+        ids = self._names.get(normalize_name(query))
+        if ids is not None and allowed is not None:
+            ids = np.intersect1d(ids, allowed, assume_unique=True)
+        return ids if ids is not None and len(ids) else None
+    
+    def search(self, query: str, k: int = 10, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank documents for a query with BM25.
+        
+        Args:
+            query: Free-text query
+            k: Number of results
+            allowed: Sorted ids to restrict the search to
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Document ids and scores, best first
+        """
+        ids, contributions = [], []
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            doc_ids = np.asarray(self._doc_ids[start:end], dtype='int64')
+            tfs = np.asarray(self._tfs[start:end], dtype='float32')
+            
+            idf = np.log1p((self.n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_ids] / self.avg_length)
+            ids.append(doc_ids)
+            contributions.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        
+        if not ids:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+        
+        # Sum per-term contributions for every document that matched any term
+        unique_ids, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions)).astype('float32')
+        if allowed is not None:
+            keep = np.isin(unique_ids, allowed, assume_unique=True)
+            unique_ids, scores = unique_ids[keep], scores[keep]
+        
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            unique_ids, scores = unique_ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return unique_ids[order], scores[order]
+
+def reciprocal_rank_fusion(rankings: List[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked id lists by summing 1 / (k + rank) for each list an id appears in.
+    
+    Returns:
+        List[Tuple[int, float]]: (id, fused score) pairs, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[int(doc_id)] = scores.get(int(doc_id), 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,66 @@
+import os
+import time
+import multiprocessing
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Model loaded once in each worker process by _init_worker
+_worker_model = None
+
+def _init_worker(model_name: str, threads: int):
+    """Load the model in a worker, limiting it to its share of the CPU threads."""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+def _encode_chunk(args: Tuple[List[str], int]) -> np.ndarray:
+    texts, batch_size = args
+    embeddings = _worker_model.encode(texts, batch_size=batch_size)
+    return np.ascontiguousarray(embeddings, dtype='float32')
+
+class ParallelEncoder:
+    """
+    Encodes texts with a pool of worker processes, each holding its own model.
+    
+    Texts are split into chunks of batch_size and handed to the pool with
+    imap, which returns results in submission order, so the output rows
+    always line up with the input texts regardless of which worker finished
+    first. Throughput is tracked across calls.
+    """
+    
+    def __init__(self, model_name: str, workers: Optional[int] = None, batch_size: int = 64):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.encoded = 0
+        self.seconds = 0.0
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # Spawn rather than fork: forked copies of an initialized torch runtime can deadlock
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(model_name, threads))
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts across all workers, returning rows in input order."""
+        start = time.perf_counter()
+        chunks = [(texts[i:i + self.batch_size], self.batch_size) for i in range(0, len(texts), self.batch_size)]
+        embeddings = np.concatenate(list(self._pool.imap(_encode_chunk, chunks)))
+        self.seconds += time.perf_counter() - start
+        self.encoded += len(texts)
+        return embeddings
+    
+    @property
+    def throughput(self) -> float:
+        """Documents encoded per second so far."""
+        return self.encoded / self.seconds if self.seconds else 0.0
+    
+    def close(self):
+        """Shut down the worker processes."""
+        self._pool.close()
+        self._pool.join()
+    
+    def __enter__(self) -> "ParallelEncoder":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,274 @@
+import os
+from typing import List, Dict, Optional, Tuple
+from sentence_transformers import SentenceTransformer
+import faiss
+import numpy as np
+from .build_index import load_config, rerank_exact, set_search_params
+from .document_store import DocumentStore
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+
+# Default price bands in dollars, as [min, max] with None for no bound
+DEFAULT_PRICE_BANDS = {
+    "free": [0, 0],
+    "budget": [0, 30],
+    "moderate": [30, 100],
+    "luxury": [100, None]
+}
+
+class TravelRetriever:
+    """
+    Query engine over an index written by TravelIndexBuilder.
+    
+    The FAISS index and document store are loaded once. Metadata filters
+    are resolved against id sets precomputed from the document store
+    columns, and the resulting ids restrict the vector search itself, so
+    filtered queries still return k results when enough documents match.
+    
+    When the build also wrote a lexical index, searches default to hybrid
+    mode: BM25 and vector rankings are fused with reciprocal rank fusion,
+    and queries that exactly name a document skip the embedding model.
+    
+    For quantized indexes built with rerank enabled, dense candidates are
+    re-ranked by exact distance against the memory-mapped float32 vectors.
+    """
+    
+    def __init__(self, index_dir: str, model_name: str = "all-MiniLM-L6-v2", index_config: Optional[Dict] = None, price_bands: Optional[Dict] = None, batch_size: int = 64, rrf_k: int = 60, candidates: int = 50, model=None):
+        self.model = model if model is not None else SentenceTransformer(model_name)
+        self.batch_size = batch_size
+        self.index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+        if index_config:
+            set_search_params(self.index, index_config)
+        self.store = DocumentStore(index_dir)
+        self.vectors = None
+        self.rerank_candidates = (index_config or {}).get("rerank_candidates", 100)
+        vectors_path = os.path.join(index_dir, "vectors.f32")
+        if (index_config or {}).get("rerank") and os.path.exists(vectors_path) and self.index.ntotal:
+            self.vectors = np.memmap(vectors_path, dtype='float32', mode='r').reshape(-1, self.index.d)
+        self.lexical = LexicalIndex(index_dir) if LexicalIndex.exists(index_dir) else None
+        self.price_bands = price_bands or DEFAULT_PRICE_BANDS
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        
+        # Category field -> lower-cased value -> sorted document ids
+        self._category_ids = {
+            field: self._build_category_ids(field, vocabulary)
+            for field, vocabulary in self.store.category_vocabularies.items()
+        }
+        # Numeric field -> (sorted values, document ids in that order)
+        self._numeric_order = {}
+        for field in self.store.numeric_fields:
+            values = np.asarray(self.store.columns[field])
+            order = np.argsort(values, kind='stable')
+            valid = order[~np.isnan(values[order])]
+            self._numeric_order[field] = (values[valid], valid.astype('int64'))
+    
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None) -> "TravelRetriever":
+        """Create a retriever for the index and model named in config.yaml."""
+        config = config or load_config()
+        embedding_config = config['models']['embedding']
+        retrieval_config = config.get('retrieval', {})
+        return cls(
+            os.path.dirname(config['paths']['index_path']),
+            model_name=embedding_config['name'],
+            index_config=embedding_config.get('index'),
+            price_bands=retrieval_config.get('price_bands'),
+            rrf_k=retrieval_config.get('rrf_k', 60),
+            candidates=retrieval_config.get('candidates', 50)
+        )
+    
+    def _build_category_ids(self, field: str, vocabulary: List[str]) -> Dict[str, np.ndarray]:
+        """Invert a dictionary-encoded column into value -> document ids."""
+        codes = np.asarray(self.store.columns[field])
+        # A stable sort keeps ids ascending within each code
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(vocabulary) + 1))
+        
+        ids = {}
+        for code, value in enumerate(vocabulary):
+            postings = order[bounds[code]:bounds[code + 1]].astype('int64')
+            key = value.strip().lower()
+            ids[key] = np.union1d(ids[key], postings) if key in ids else postings
+        return ids
+    
+    def _numeric_range(self, field: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        """Sorted ids of documents whose value lies in [low, high]."""
+        values, ids = self._numeric_order[field]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return np.sort(ids[start:end])
+    
+    def filter_ids(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Resolve metadata filters to the ids of matching documents.
+        
+        Args:
+            filters: Any of: a category field name mapped to a value or list
+                of values (e.g. {"destination": "Lisbon"}), min_<field> or
+                max_<field> for numeric fields (e.g. {"max_price": 30}), or
+                price_band with one of the configured band names
+        
+        Returns:
+            Optional[np.ndarray]: Sorted matching ids, or None when nothing is filtered
+        """
+        if not filters:
+            return None
+        
+        id_sets = []
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key in self._category_ids:
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                matches = [self._category_ids[key].get(str(v).strip().lower()) for v in values]
+                matches = [m for m in matches if m is not None]
+                id_sets.append(np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype='int64'))
+            elif key == "price_band":
+                if "price" not in self._numeric_order:
+                    raise ValueError("price_band needs 'price' in document_store.numeric_fields")
+                if value not in self.price_bands:
+                    raise ValueError(f"Unknown price band '{value}', expected one of {', '.join(self.price_bands)}")
+                low, high = self.price_bands[value]
+                id_sets.append(self._numeric_range("price", low, high))
+            elif key[:4] in ("min_", "max_") and key[4:] in self._numeric_order:
+                if key.startswith("min_"):
+                    id_sets.append(self._numeric_range(key[4:], value, None))
+                else:
+                    id_sets.append(self._numeric_range(key[4:], None, value))
+            else:
+                raise ValueError(f"Unsupported filter '{key}'")
+        
+        if not id_sets:
+            return None
+        
+        # Intersect starting from the most selective filter
+        id_sets.sort(key=len)
+        allowed = id_sets[0]
+        for ids in id_sets[1:]:
+            allowed = np.intersect1d(allowed, ids, assume_unique=True)
+        return allowed
+    
+    def _search_params(self, allowed: np.ndarray) -> Tuple[faiss.SearchParameters, faiss.IDSelector]:
+        """Search parameters restricting the search to allowed ids, keeping nprobe/efSearch."""
+        selector = faiss.IDSelectorBatch(allowed)
+        ivf = faiss.try_extract_index_ivf(self.index)
+        base = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap) else self.index
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        elif hasattr(base, "hnsw"):
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # The selector must outlive the search call
+        return params, selector
+    
+    def search(self, query: str, k: int = 10, filters: Optional[Dict] = None, mode: Optional[str] = None) -> List[Dict]:
+        """
+        Find the documents that best match a query.
+        
+        Args:
+            query: Free-text query
+            k: Number of results
+            filters: Metadata filters, see filter_ids
+            mode: "dense", "lexical" or "hybrid"; hybrid when a lexical index exists, dense otherwise
+        
+        Returns:
+            List[Dict]: Results with "id", "score", "match" and "document". The
+                score is the L2 distance (lower is closer) for dense matches,
+                BM25 for lexical matches and the fused RRF score for hybrid
+                matches (higher is better for both)
+        """
+        return self.search_batch([query], k, filters, mode)[0]
+    
+    def search_batch(self, queries: List[str], k: int = 10, filters: Optional[Dict] = None, mode: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Search several queries with one encode call and one index search.
+        
+        Args:
+            queries: Free-text queries
+            k: Number of results per query
+            filters: Metadata filters applied to every query, see filter_ids
+            mode: Search mode, see search
+        
+        Returns:
+            List[List[Dict]]: Results for each query, in query order
+        """
+        mode = mode or ("hybrid" if self.lexical is not None else "dense")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}")
+        if mode != "dense" and self.lexical is None:
+            raise ValueError(f"Search mode '{mode}' needs a lexical index; enable retrieval.lexical and rebuild")
+        
+        allowed = self.filter_ids(filters)
+        if allowed is not None and len(allowed) == 0:
+            return [[] for _ in queries]
+        
+        if mode == "dense":
+            distances, ids = self._dense_search(queries, k, allowed)
+            return [self._results(row_ids, row_distances, "dense") for row_distances, row_ids in zip(distances, ids)]
+        
+        if mode == "lexical":
+            return [self._results(*self.lexical.search(query, k, allowed), "lexical") for query in queries]
+        
+        # Hybrid: exact name matches are answered from the lexical index alone
+        results = [None] * len(queries)
+        remaining = []
+        for i, query in enumerate(queries):
+            exact = self.lexical.exact_match(query, allowed)
+            if exact is not None:
+                results[i] = self._results(exact[:k], np.ones(min(k, len(exact))), "exact")
+            else:
+                remaining.append(i)
+        
+        if remaining:
+            candidates = max(k, self.candidates)
+            _, dense_ids = self._dense_search([queries[i] for i in remaining], candidates, allowed)
+            for i, row_ids in zip(remaining, dense_ids):
+                lexical_ids, _ = self.lexical.search(queries[i], candidates, allowed)
+                fused = reciprocal_rank_fusion([row_ids[row_ids >= 0], lexical_ids], self.rrf_k)[:k]
+                results[i] = self._results([doc_id for doc_id, _ in fused], [score for _, score in fused], "hybrid")
+        return results
+    
+    def _dense_search(self, queries: List[str], k: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode queries in one call and search the FAISS index, restricted to allowed ids."""
+        embeddings = np.ascontiguousarray(self.model.encode(queries, batch_size=self.batch_size), dtype='float32')
+        fetch = max(k, self.rerank_candidates) if self.vectors is not None else k
+        base = faiss.downcast_index(self.index.index) if isinstance(self.index, faiss.IndexIDMap) else self.index
+        if allowed is None:
+            distances, ids = self.index.search(embeddings, fetch)
+        elif isinstance(base, faiss.IndexPQ):
+            # Flat PQ indexes reject search parameters, so filter an over-fetched result instead
+            over_fetch = min(self.index.ntotal, fetch * -(-self.index.ntotal // len(allowed)))
+            distances, ids = self.index.search(embeddings, over_fetch)
+            distances, ids = self._keep_allowed(distances, ids, allowed, fetch)
+        else:
+            params, selector = self._search_params(allowed)
+            distances, ids = self.index.search(embeddings, fetch, params=params)
+        if self.vectors is not None:
+            return rerank_exact(embeddings, ids, self.vectors, k)
+        return distances, ids
+    
+    @staticmethod
+    def _keep_allowed(distances: np.ndarray, ids: np.ndarray, allowed: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Drop results outside allowed ids, keeping the first k per row and padding with -1."""
+        kept_distances = np.full((len(ids), k), np.inf, dtype='float32')
+        kept_ids = np.full((len(ids), k), -1, dtype='int64')
+        for i, (row_distances, row_ids) in enumerate(zip(distances, ids)):
+            keep = np.isin(row_ids, allowed, assume_unique=True)
+            row_ids, row_distances = row_ids[keep][:k], row_distances[keep][:k]
+            kept_ids[i, :len(row_ids)] = row_ids
+            kept_distances[i, :len(row_ids)] = row_distances
+        return kept_distances, kept_ids
+    
+    def _results(self, ids, scores, match: str) -> List[Dict]:
+        """Attach stored documents to one ranked list of ids."""
+        results = []
+        for doc_id, score in zip(ids, scores):
+            if doc_id < 0:
+                continue
+            doc = self.store.get(int(doc_id))
+            if doc is not None:
+                results.append({"id": int(doc_id), "score": float(score), "match": match, "document": doc})
+        return results
@@ -0,0 +1,98 @@
+import threading
+from types import SimpleNamespace
+
+from agents.chat_agent import ChatAgent
+from agents.conversation_memory import ConversationMemory, message_tokens
+from agents.llm_scheduler import LLMScheduler
+from agents.local_answers import LocalAnswerEngine
+from agents.request_control import RequestController
+
+def fill(memory, turns):
+    for turn in range(turns):
+        memory.add("user", f"Question number {turn} about the itinerary and its activities " * 3)
+        memory.add("assistant", f"Answer number {turn} with some detail about the plan " * 3)
+
+def test_add_never_summarizes():
+    calls = []
+    memory = ConversationMemory(recent_tokens=100, summarizer=lambda *args: calls.append(args) or "summary")
+    fill(memory, 10)
+    assert calls == []
+    assert memory.needs_compaction
+
+def test_compact_folds_to_half_the_window():
+    memory = ConversationMemory(recent_tokens=200, summarizer=lambda summary, messages, budget: f"{len(messages)} folded")
+    fill(memory, 10)
+    newest = memory.messages[-1]
+    memory.compact()
+    assert memory.stats()["recent_tokens"] <= 100
+    assert memory.messages[-1] is newest
+    assert memory.summary.endswith("folded")
+
+def test_messages_added_during_a_fold_are_kept():
+    started, release = threading.Event(), threading.Event()
+    
+    def summarizer(summary, messages, budget):
+        started.set()
+        release.wait(5)
+        return "summary"
+    
+    memory = ConversationMemory(recent_tokens=100, summarizer=summarizer)
+    fill(memory, 5)
+    thread = memory.compact_in_background()
+    assert started.wait(5)
+    # Prompts still hold every message while the summary is being written
+    assert len(memory.pack("system", 10000)) == 11
+    memory.add("user", "latest")
+    release.set()
+    thread.join(5)
+    assert memory.messages[-1]["content"] == "latest"
+    assert memory.summary == "summary"
+
+def test_clear_discards_a_running_fold():
+    release = threading.Event()
+    memory = ConversationMemory(recent_tokens=100, summarizer=lambda *args: release.wait(5) and "stale")
+    fill(memory, 5)
+    thread = memory.compact_in_background()
+    memory.clear()
+    release.set()
+    thread.join(5)
+    assert memory.summary == "" and memory.messages == []
+
+def test_one_fold_sends_at_most_fold_tokens():
+    sent = []
+    memory = ConversationMemory(recent_tokens=100, fold_tokens=60,
+                                summarizer=lambda summary, messages, budget: sent.append((summary, messages)) or "summary")
+    fill(memory, 20)
+    memory.compact()
+    summary, messages = sent[0]
+    assert sum(message_tokens(message) for message in messages) <= 60
+    # The older overflow was folded without the model and handed over as the previous summary
+    assert "assistant: Answer number" in summary
+    assert memory.stats()["recent_tokens"] <= 50
+
+def test_local_answers_keep_the_memory_within_budget():
+    calls = []
+    
+    def create(**kwargs):
+        calls.append(kwargs["model"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="summary"))], usage=None)
+    
+    agent = ChatAgent(
+        "key",
+        memory={"recent_tokens": 50, "summary_model": "summary-model"},
+        scheduler=LLMScheduler(requests_per_minute=10000),
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))),
+        control=RequestController(timeout_s=5),
+        local_answers=LocalAnswerEngine()
+    )
+    itinerary = {"budget": 500, "days": [{"day_number": 1, "activities": [
+        {"id": "a1", "time": "09:00", "title": "Louvre Museum", "description": "", "duration": "3 hours",
+         "cost": 22, "location": "Rue de Rivoli", "transportation": "Metro"}
+    ]}]}
+    for _ in range(10):
+        agent.process_message("How much budget is left?", itinerary)
+        if agent.memory._folding is not None:
+            agent.memory._folding.join(5)
+    assert not agent.memory.needs_compaction
+    # Only the background summaries used the API, never the answers
+    assert calls and set(calls) == {"summary-model"}
@@ -0,0 +1,84 @@
+import math
+import os
+
+from rag.document_store import DocumentStore, DocumentStoreWriter
+
+DOCS = [
+    {"name": "Louvre", "destination": "Paris", "category": "museum", "price": 22},
+    {"name": "Café de Flore", "destination": "Paris", "category": "food", "price": "unknown"},
+    None,
+    {"name": "Senso-ji", "destination": "Tokyo", "description": "Oldest temple\nin Tokyo"},
+]
+
+def write_store(directory, docs, suffix=""):
+    writer = DocumentStoreWriter(str(directory), category_fields=["destination", "category"],
+                                 numeric_fields=["price"], suffix=suffix)
+    for doc in docs:
+        writer.append(doc)
+    writer.close()
+    return writer
+
+def move_into_place(writer):
+    for path in writer.paths:
+        os.replace(path + writer.suffix, path)
+
+def test_round_trip(tmp_path):
+    write_store(tmp_path, DOCS)
+    store = DocumentStore(str(tmp_path))
+    assert len(store) == 4
+    assert list(store) == DOCS
+    assert store.get_many([3, 0]) == [DOCS[3], DOCS[0]]
+    assert store.record(2) == b""
+    assert store.get(-1) is None and store.get(4) is None
+
+def test_columns_are_read_without_decoding_records(tmp_path):
+    write_store(tmp_path, DOCS)
+    store = DocumentStore(str(tmp_path))
+    assert store.category_vocabularies == {"destination": ["Paris", "Tokyo"], "category": ["museum", "food"]}
+    assert store.values(0) == {"destination": "Paris", "category": "museum", "price": 22.0}
+    # Missing and non-numeric values read back as None
+    assert store.values(1)["price"] is None
+    assert store.values(2) == {"destination": None, "category": None, "price": None}
+    assert math.isnan(float(store.columns["price"][3]))
+
+def test_empty_store(tmp_path):
+    write_store(tmp_path, [])
+    store = DocumentStore(str(tmp_path))
+    assert len(store) == 0
+    assert list(store) == []
+    assert len(store.columns["destination"]) == 0
+
+def test_writer_keeps_files_aside_until_moved(tmp_path):
+    writer = write_store(tmp_path, DOCS[:1], suffix=".tmp")
+    assert not any(os.path.exists(path) for path in writer.paths)
+    move_into_place(writer)
+    assert DocumentStore(str(tmp_path)).get(0) == DOCS[0]
+
+def test_incremental_append_copies_unchanged_records(tmp_path):
+    # The way TravelIndexBuilder.update_index rewrites the store: unchanged
+    # records are copied as raw bytes, changed and new ones appended, removed ones left empty
+    write_store(tmp_path, DOCS)
+    store = DocumentStore(str(tmp_path))
+    changed = {"name": "Louvre", "destination": "Paris", "category": "museum", "price": 25}
+    added = {"name": "Shibuya Sky", "destination": "Tokyo", "category": "view", "price": 18}
+    writer = DocumentStoreWriter(str(tmp_path), category_fields=["destination", "category"], numeric_fields=["price"])
+    writer.append(changed)
+    writer.append_record(store.record(1), store.values(1))
+    writer.append(None)
+    writer.append(None)
+    writer.append(added)
+    writer.close()
+    # The old store is still readable while the new files are written aside
+    assert store.get(3) == DOCS[3]
+    move_into_place(writer)
+    
+    updated = DocumentStore(str(tmp_path))
+    assert list(updated) == [changed, DOCS[1], None, None, added]
+    assert updated.values(1) == {"destination": "Paris", "category": "food", "price": None}
+    assert updated.values(4) == {"destination": "Tokyo", "category": "view", "price": 18.0}
+    assert updated.category_vocabularies["category"] == ["museum", "food", "view"]
+
+def test_unicode_and_nested_values_survive(tmp_path):
+    doc = {"name": "Zürich \"Altstadt\" 🏔️", "tags": ["a", "b"], "nested": {"x": 1}}
+    write_store(tmp_path, [doc])
+    assert DocumentStore(str(tmp_path)).get(0) == doc
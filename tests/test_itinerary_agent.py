@@ -0,0 +1,41 @@
+import groq
+import pytest
+
+from agents.itinerary_agent import ItineraryAgent
+from agents.llm_scheduler import LLMScheduler
+from agents.request_control import RequestController
+from benchmarks.mock_groq_server import MockGroqServer
+
+PREFERENCES = {"destination": "Lisbon", "start_date": "2025-06-01", "duration": 4, "budget": 1000,
+               "travel_style": "Comfort", "interests": ["Food", "History"]}
+
+@pytest.fixture
+def server():
+    server = MockGroqServer(latency="fixed:0", tokens_per_second=1e9).start()
+    yield server
+    server.stop()
+
+def agent_for(server) -> ItineraryAgent:
+    return ItineraryAgent(
+        api_key="mock",
+        fan_out={"enabled": True, "min_days": 3, "concurrency": 4},
+        scheduler=LLMScheduler(requests_per_minute=10000, tokens_per_minute=1e9),
+        client=groq.Groq(api_key="mock", base_url=server.base_url, max_retries=0),
+        async_client=groq.AsyncGroq(api_key="mock", base_url=server.base_url, max_retries=0),
+        control=RequestController(timeout_s=10)
+    )
+
+def test_fan_out_uses_the_injected_async_client(server):
+    agent = agent_for(server)
+    # Two generations reuse the client across calls on the shared event loop
+    for _ in range(2):
+        itinerary = agent.generate_itinerary(PREFERENCES)
+        assert [day["day_number"] for day in itinerary["days"]] == [1, 2, 3, 4]
+    # One planning call and one call per day each time, none of them sent elsewhere
+    assert server.stats()["requests"] == 10
+
+def test_streamed_fan_out_yields_every_day(server):
+    agent = agent_for(server)
+    days = list(agent.stream_itinerary(PREFERENCES))
+    assert sorted(day["day_number"] for day in days) == [1, 2, 3, 4]
+    assert agent.last_itinerary["days"] == sorted(days, key=lambda day: day["day_number"])
@@ -0,0 +1,65 @@
+import pytest
+
+from agents import itinerary_cache
+from agents.itinerary_cache import ItineraryCache, cache_key
+
+PREFERENCES = {"destination": "Lisbon", "start_date": "2025-06-01", "duration": 3, "budget": 600,
+               "travel_style": "Comfort", "interests": ["Food", "History"]}
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(itinerary_cache.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ItineraryCache(str(tmp_path / "cache.sqlite"), max_entries=2, ttl_seconds=100)
+    yield cache
+    cache.close()
+
+def trip(destination):
+    return {**PREFERENCES, "destination": destination}
+
+def test_key_ignores_formatting_and_start_date():
+    same = {**PREFERENCES, "destination": "  lisbon ", "start_date": "2026-01-01", "budget": 600.4,
+            "interests": ["history", "food ", "Food"]}
+    assert cache_key(same) == cache_key(PREFERENCES)
+    assert cache_key(PREFERENCES, namespace="other-model") != cache_key(PREFERENCES)
+    assert cache_key({**PREFERENCES, "duration": 4}) != cache_key(PREFERENCES)
+
+def test_hit_carries_the_requested_start_date(cache):
+    cache.put(PREFERENCES, {"days": [], "start_date": "2025-06-01"})
+    assert cache.get({**PREFERENCES, "start_date": "2025-09-10"})["start_date"] == "2025-09-10"
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put(PREFERENCES, {"days": []})
+    clock[0] += 100
+    assert cache.get(PREFERENCES) is not None
+    clock[0] += 1
+    assert cache.get(PREFERENCES) is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    cache.put(trip("Lisbon"), {"days": [1]})
+    clock[0] += 1
+    cache.put(trip("Porto"), {"days": [2]})
+    clock[0] += 1
+    # Reading Lisbon makes Porto the least recently used
+    assert cache.get(trip("Lisbon")) is not None
+    clock[0] += 1
+    cache.put(trip("Madrid"), {"days": [3]})
+    assert cache.get(trip("Porto")) is None
+    assert cache.get(trip("Lisbon"))["days"] == [1]
+    assert cache.get(trip("Madrid"))["days"] == [3]
+
+def test_counters_persist_across_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ItineraryCache(path)
+    cache.get(PREFERENCES)
+    cache.put(PREFERENCES, {"days": []})
+    cache.get(PREFERENCES)
+    cache.close()
+    stats = ItineraryCache(path).stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,93 @@
+import copy
+
+import pytest
+
+from agents.itinerary_model import Day, time_minutes
+from agents.itinerary_patch import apply_edits, extract_edits, validate_edits
+
+def activity(id, time, title, cost=10):
+    return {"id": id, "time": time, "title": title, "description": f"About {title}", "duration": "1 hour",
+            "cost": cost, "location": f"{title} Street", "transportation": "Walk"}
+
+def itinerary():
+    return {
+        "destination": "Rome",
+        "days": [
+            {"day_number": 1, "activities": [
+                activity("a1", "09:00", "Colosseum"), activity("a2", "11:00", "Forum"), activity("a3", "14:00", "Pantheon")
+            ]},
+            {"day_number": 2, "activities": [activity("a4", "10:00", "Vatican Museums")]},
+        ]
+    }
+
+def times(result, day_number):
+    return [a["time"] for a in result["days"][day_number - 1]["activities"]]
+
+def ids(result, day_number):
+    return [a["id"] for a in result["days"][day_number - 1]["activities"]]
+
+def test_update_changes_fields_without_touching_the_original():
+    original = itinerary()
+    before = copy.deepcopy(original)
+    result, described = apply_edits(original, [{"op": "update", "id": "a2", "fields": {"cost": 25, "description": "New"}}])
+    assert result["days"][0]["activities"][1]["cost"] == 25
+    assert described == {"a2"}
+    assert original == before
+
+def test_add_gets_a_new_id_and_is_placed_by_time():
+    new = {key: value for key, value in activity(None, "12:30", "Gelato").items() if key != "id"}
+    result, described = apply_edits(itinerary(), [{"op": "add", "day": 1, "activity": new}])
+    assert times(result, 1) == ["09:00", "11:00", "12:30", "14:00"]
+    assert described == {"a5"}
+
+def test_add_after_an_activity():
+    new = {key: value for key, value in activity(None, "18:00", "Dinner").items() if key != "id"}
+    result, _ = apply_edits(itinerary(), [{"op": "add", "day": 1, "after": "a1", "activity": new}])
+    assert ids(result, 1) == ["a1", "a5", "a2", "a3"]
+
+def test_remove():
+    result, _ = apply_edits(itinerary(), [{"op": "remove", "id": "a2"}])
+    assert ids(result, 1) == ["a1", "a3"]
+
+def test_move_to_another_day_and_retime():
+    result, _ = apply_edits(itinerary(), [{"op": "move", "id": "a3", "day": 2, "fields": {"time": "09:00"}}])
+    assert ids(result, 1) == ["a1", "a2"]
+    assert ids(result, 2) == ["a3", "a4"]
+
+@pytest.mark.parametrize("new_time, order", [
+    ("9:30", ["a1", "a2", "a3"]),
+    ("2:30 PM", ["a1", "a3", "a2"]),
+    ("8 am", ["a2", "a1", "a3"]),
+])
+def test_retimed_activity_is_ordered_by_time_of_day(new_time, order):
+    result, _ = apply_edits(itinerary(), [{"op": "update", "id": "a2", "fields": {"time": new_time}}])
+    assert ids(result, 1) == order
+
+def test_unreadable_times_go_last_in_their_order():
+    day = Day.from_dict({"day_number": 1, "activities": [
+        activity("a1", "evening", "Show"), activity("a2", "14:00", "Lunch"), activity("a3", "TBD", "Bar"), activity("a4", "9:00", "Cafe")
+    ]})
+    day.sort_by_time()
+    assert [a.id for a in day] == ["a4", "a2", "a1", "a3"]
+
+@pytest.mark.parametrize("value, minutes", [
+    ("9:30", 570), ("09:30", 570), ("2:00 PM", 840), ("2 pm", 840), ("12 AM", 0), ("12:15 pm", 735),
+    ("morning", None), ("25:00", None), ("", None)
+])
+def test_time_minutes(value, minutes):
+    assert time_minutes(value) == minutes
+
+def test_unknown_ids_are_rejected():
+    errors = validate_edits([
+        {"op": "update", "id": "a99", "fields": {"cost": 1}},
+        {"op": "move", "id": "a1", "day": 7},
+        {"op": "remove", "id": "a2"},
+        {"op": "update", "id": "a2", "fields": {"cost": 1}},
+    ], itinerary())
+    assert len(errors) == 3
+    assert "a99" in errors[0] and "day 7" in errors[1] and "'a2'" in errors[2]
+
+def test_extract_edits_takes_the_last_object():
+    text = 'Done.\n{"edits": [{"op": "remove", "id": "a1"}]}\nAnything else?'
+    assert extract_edits(text) == [{"op": "remove", "id": "a1"}]
+    assert extract_edits("No changes needed.") is None
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+
+from rag.lexical_index import LexicalIndex, LexicalIndexBuilder, normalize_name, reciprocal_rank_fusion
+
+def build(tmp_path, docs):
+    builder = LexicalIndexBuilder()
+    for doc in docs:
+        builder.add(doc)
+    for path in builder.save(str(tmp_path)):
+        os.replace(path + ".tmp", path)
+    return LexicalIndex(str(tmp_path))
+
+def test_bm25_prefers_rare_terms_and_short_documents(tmp_path):
+    index = build(tmp_path, [
+        {"name": "Belem Tower", "description": "tower by the river"},
+        {"name": "Clock Tower", "description": "tower tower in a long description of the old town square and its shops"},
+        {"name": "Fado House", "description": "music in the old town"},
+        None,
+    ])
+    ids, scores = index.search("tower river", k=10)
+    assert ids.tolist() == [0, 1]
+    assert scores[0] > scores[1] > 0
+    # The empty slot is not counted as a document
+    assert index.n_docs == 3
+
+def test_search_respects_k_and_allowed_ids(tmp_path):
+    index = build(tmp_path, [{"name": f"Museum {i}", "description": "museum " * (i + 1)} for i in range(5)])
+    assert len(index.search("museum", k=2)[0]) == 2
+    assert sorted(index.search("museum", k=10, allowed=np.array([1, 3]))[0].tolist()) == [1, 3]
+    ids, scores = index.search("unknown words", k=5)
+    assert len(ids) == 0 and len(scores) == 0
+
+def test_exact_name_match(tmp_path):
+    index = build(tmp_path, [{"name": "Time Out Market"}, {"title": "Time-Out market"}, {"name": "Market"}])
+    assert normalize_name("  Time-Out MARKET!") == "time out market"
+    assert index.exact_match("time out market").tolist() == [0, 1]
+    assert index.exact_match("Time Out Market", allowed=np.array([1, 2])).tolist() == [1]
+    assert index.exact_match("Time Out") is None
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == 1 / 61 + 1 / 62
@@ -0,0 +1,106 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import groq
+import pytest
+
+from agents.llm_scheduler import PRIORITY_CHAT, PRIORITY_GENERATION, LLMScheduler, TokenBucket
+from agents.request_control import CancellationToken, RequestCancelled
+from benchmarks.mock_groq_server import MockGroqServer
+
+MESSAGES = [{"role": "user", "content": "What time is the museum visit?"}]
+
+@pytest.fixture
+def mock_server():
+    servers = []
+    
+    def start(**kwargs):
+        server = MockGroqServer(latency="fixed:0", tokens_per_second=1e9, **kwargs).start()
+        servers.append(server)
+        return server
+    
+    yield start
+    for server in servers:
+        server.stop()
+
+def client_for(server) -> groq.Groq:
+    return groq.Groq(api_key="mock", base_url=server.base_url, max_retries=0)
+
+def recording_client(calls):
+    def create(**kwargs):
+        calls.append(kwargs["model"])
+        return SimpleNamespace(usage=None)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def test_token_bucket_waits_for_the_missing_amount():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_for(1) == pytest.approx(1.0)
+    bucket.refund(30)
+    assert bucket.wait_for(30) == 0.0
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_for(1000) == pytest.approx(30.0)
+    bucket.refill(bucket.updated + 10)
+    assert bucket.level == pytest.approx(40)
+
+def test_chat_is_admitted_before_queued_generation():
+    scheduler = LLMScheduler(requests_per_minute=600)
+    # Empty the request bucket so both calls queue (the first admission is 0.3s away)
+    scheduler._requests.level = -2
+    calls = []
+    client = recording_client(calls)
+    generation = threading.Thread(target=scheduler.create, args=(client, PRIORITY_GENERATION), kwargs={"model": "generation", "messages": MESSAGES})
+    chat = threading.Thread(target=scheduler.create, args=(client, PRIORITY_CHAT), kwargs={"model": "chat", "messages": MESSAGES})
+    generation.start()
+    while scheduler.stats()["queue_depth"] < 1:
+        time.sleep(0.01)
+    chat.start()
+    generation.join(5)
+    chat.join(5)
+    assert calls == ["chat", "generation"]
+    assert scheduler.stats()["admitted"] == 2
+
+def test_token_limit_delays_calls_and_usage_is_refunded(mock_server):
+    server = mock_server()
+    scheduler = LLMScheduler(requests_per_minute=10000, tokens_per_minute=6000)
+    client = client_for(server)
+    scheduler.create(client, model="mock", messages=MESSAGES, max_tokens=2000)
+    # The reply used far fewer tokens than max_tokens, so most of the reservation came back
+    assert scheduler._tokens.level > 5000
+    
+    scheduler._tokens.level = 0
+    start = time.monotonic()
+    scheduler.create(client, model="mock", messages=MESSAGES, max_tokens=20)
+    # About 30 tokens at 100 tokens per second
+    assert 0.2 < time.monotonic() - start < 2.0
+
+def test_rate_limited_calls_are_retried_after_retry_after(mock_server):
+    server = mock_server(rate_limit_rate=0.6, retry_after=0.05, seed=3)
+    scheduler = LLMScheduler(requests_per_minute=10000, max_retries=10, base_delay=0.01, max_delay=0.01)
+    start = time.monotonic()
+    result = scheduler.create(client_for(server), model="mock", messages=MESSAGES)
+    assert result.choices[0].message.content
+    stats = scheduler.stats()
+    assert stats["rate_limited"] == server.stats()["rate_limited"] > 0
+    # Each retry waited at least the Retry-After the server sent, not the shorter backoff
+    assert time.monotonic() - start >= 0.05 * stats["rate_limited"]
+    assert stats["retries"] == stats["rate_limited"]
+    assert stats["completed"] == 1
+
+def test_gives_up_after_max_retries(mock_server):
+    server = mock_server(rate_limit_rate=1.0, retry_after=0.01)
+    scheduler = LLMScheduler(requests_per_minute=10000, max_retries=2, base_delay=0.01, max_delay=0.01)
+    with pytest.raises(groq.RateLimitError):
+        scheduler.create(client_for(server), model="mock", messages=MESSAGES)
+    assert server.stats()["requests"] == 3
+    assert scheduler.stats()["failed"] == 1
+
+def test_cancelled_call_leaves_the_queue():
+    scheduler = LLMScheduler(requests_per_minute=60)
+    scheduler._requests.level = -60
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+    with pytest.raises(RequestCancelled):
+        scheduler.create(recording_client([]), token=token, model="chat", messages=MESSAGES)
+    assert scheduler.stats()["queue_depth"] == 0
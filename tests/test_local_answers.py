@@ -0,0 +1,75 @@
+import pytest
+
+from agents.local_answers import LocalAnswerEngine
+
+def itinerary():
+    return {
+        "destination": "Paris",
+        "budget": 500,
+        "days": [
+            {"day_number": 1, "activities": [
+                {"id": "a1", "time": "09:00", "title": "Louvre Museum", "description": "", "duration": "3 hours",
+                 "cost": 22, "location": "Rue de Rivoli", "transportation": "Metro"},
+                {"id": "a2", "time": "13:00", "title": "Lunch at Cafe de Flore", "description": "", "duration": "1 hour",
+                 "cost": 40, "location": "Boulevard Saint-Germain", "transportation": "Walk"},
+            ]},
+            {"day_number": 2, "activities": [
+                {"id": "a3", "time": "10:00", "title": "Eiffel Tower", "description": "", "duration": "2 hours",
+                 "cost": 30, "location": "Champ de Mars", "transportation": "Metro"},
+            ]},
+        ]
+    }
+
+@pytest.mark.parametrize("question", [
+    "How much does the whole trip cost?",
+    "What's the total cost of the entire trip?",
+])
+def test_trip_total_is_answered_locally(question):
+    answer = LocalAnswerEngine().answer(question, itinerary())
+    assert answer is not None
+    assert answer["intent"] == "trip_cost"
+    assert "$92" in answer["message"]
+
+def test_budget_left():
+    answer = LocalAnswerEngine().answer("How much budget is left?", itinerary())
+    assert answer["intent"] == "budget_left"
+    assert "$408" in answer["message"]
+
+def test_activity_lookup():
+    answer = LocalAnswerEngine().answer("Where is the Eiffel Tower?", itinerary())
+    assert answer["intent"] == "activity_where"
+    assert "Champ de Mars" in answer["message"]
+
+@pytest.mark.parametrize("message", [
+    "Change the whole trip to cheaper activities",
+    "Move the Louvre Museum to 10:00",
+    "Redo day 2",
+])
+def test_changes_go_to_the_model(message):
+    engine = LocalAnswerEngine()
+    assert engine.answer(message, itinerary()) is None
+    assert engine.stats()["passed_to_model"] == 1
+
+@pytest.mark.parametrize("question, intent", [
+    ("Where is the Eiffel Tower?", "activity_where"),
+    ("How much is the Louvre?", "activity_cost"),
+    ("When is lunch on day 1?", "activity_when"),
+])
+def test_question_about_a_title_is_answered_locally(question, intent):
+    assert LocalAnswerEngine().answer(question, itinerary())["intent"] == intent
+
+@pytest.mark.parametrize("question", [
+    "Where should I eat near the Eiffel Tower?",
+    "How much does a taxi to the Eiffel Tower cost?",
+    "What time does the Louvre open?",
+    "Is the Louvre Museum expensive compared to the Orsay?",
+    "How much is a coffee at Cafe de Flore?",
+])
+def test_question_only_mentioning_a_title_goes_to_the_model(question):
+    # Each names an activity but asks something the itinerary does not answer
+    assert LocalAnswerEngine().answer(question, itinerary()) is None
+
+def test_day_cost_counts_activities():
+    engine = LocalAnswerEngine()
+    assert "(2 activities)" in engine.answer("What does day 1 cost?", itinerary())["message"]
+    assert "(1 activity)" in engine.answer("What does day 2 cost?", itinerary())["message"]
@@ -0,0 +1,24 @@
+import pytest
+
+from agents.model_router import ModelRouter, classify_request
+
+@pytest.mark.parametrize("message, route", [
+    ("How much does the whole trip cost?", "qa"),
+    ("What's the total cost of the entire trip?", "qa"),
+    ("Can you show me the full itinerary?", "qa"),
+    ("What time does the museum open on day 2?", "qa"),
+    ("Move the museum visit to 14:00", "edit"),
+    ("Remove lunch on day 3", "edit"),
+    ("Regenerate the itinerary with more food", "regenerate"),
+    ("Please redo the whole trip, it's too expensive", "regenerate"),
+    ("Change the entire itinerary to budget options", "regenerate"),
+    ("Let's start over", "regenerate"),
+])
+def test_classify_request(message, route):
+    assert classify_request(message) == route
+
+def test_edit_without_itinerary_is_a_question():
+    assert classify_request("Add a museum on day 2", has_itinerary=False) == "qa"
+
+def test_disabled_router_uses_regenerate_route():
+    assert ModelRouter(enabled=False).route("How much does the whole trip cost?") == "regenerate"
@@ -0,0 +1,26 @@
+from agents import registry
+from agents.chat_agent import ChatAgent
+
+def test_scheduler_is_shared_until_its_settings_change():
+    scheduler = registry.get_scheduler({"requests_per_minute": 30})
+    assert registry.get_scheduler({"requests_per_minute": 30}) is scheduler
+    changed = registry.get_scheduler({"requests_per_minute": 60})
+    assert changed is not scheduler
+    assert changed._requests.capacity == 60
+
+def test_request_controller_follows_its_settings():
+    controller = registry.get_request_controller({"timeout_s": 30})
+    assert registry.get_request_controller({"timeout_s": 30}) is controller
+    assert registry.get_request_controller({"timeout_s": 10}).timeout_s == 10
+
+def test_client_is_rebuilt_for_a_new_pool():
+    client = registry.get_client("key", {"max_connections": 10})
+    assert registry.get_client("key", {"max_connections": 10}) is client
+    assert registry.get_client("key", {"max_connections": 20}) is not client
+
+def test_agents_built_directly_share_the_configured_scheduler_and_controller():
+    scheduler = registry.get_scheduler({"requests_per_minute": 45})
+    controller = registry.get_request_controller({"timeout_s": 20})
+    agent = ChatAgent(api_key="key")
+    assert agent.scheduler is scheduler
+    assert agent.control is controller
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.request_control import CancellationToken, DeadlineExceeded, RequestCancelled, RequestController
+
+def test_child_token_follows_its_parent():
+    parent = CancellationToken()
+    child = parent.child()
+    child.cancel()
+    assert child.cancelled and not parent.cancelled
+    other = parent.child()
+    parent.cancel()
+    assert other.cancelled
+    with pytest.raises(RequestCancelled):
+        other.sleep(5)
+
+def test_call_returns_the_result_and_passes_the_time_left():
+    controller = RequestController(timeout_s=5)
+    assert controller.call(lambda timeout, token: timeout) == pytest.approx(5, abs=0.1)
+    assert controller.stats()["completed"] == 1
+
+def test_deadline_abandons_a_stuck_call():
+    controller = RequestController(timeout_s=0.2)
+    abandoned = threading.Event()
+    
+    def stuck(timeout, token):
+        while not token.cancelled:
+            time.sleep(0.01)
+        abandoned.set()
+    
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        controller.call(stuck)
+    assert time.monotonic() - start < 1
+    # The attempt's token is cancelled so the worker can stop
+    assert abandoned.wait(1)
+    assert controller.stats()["timeouts"] == 1
+
+def test_cancelling_the_token_stops_waiting():
+    controller = RequestController(timeout_s=10)
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    with pytest.raises(RequestCancelled):
+        controller.call(lambda timeout, attempt: time.sleep(2), token=token)
+    assert controller.stats()["cancelled"] == 1
+
+def test_errors_are_raised_once_every_attempt_failed():
+    controller = RequestController(timeout_s=5)
+    
+    def fail(timeout, token):
+        raise ValueError("bad request")
+    
+    with pytest.raises(ValueError):
+        controller.call(fail)
+    assert controller.stats()["failed"] == 1
+
+def hedged_controller():
+    controller = RequestController(timeout_s=5, hedge={"enabled": True, "percentile": 50, "min_samples": 5, "min_delay_s": 0.05})
+    for _ in range(5):
+        controller.call(lambda timeout, token: None, key="model")
+    return controller
+
+def test_slow_call_is_hedged_and_the_loser_discarded():
+    controller = hedged_controller()
+    attempts = []
+    discarded = []
+    
+    def call(timeout, token):
+        attempts.append(token)
+        if len(attempts) == 1:
+            # The first attempt is slow; it still finishes after losing
+            time.sleep(0.3)
+            return "slow"
+        return "fast"
+    
+    assert controller.call(call, key="model", discard=discarded.append) == "fast"
+    assert attempts[0].cancelled
+    time.sleep(0.4)
+    assert discarded == ["slow"]
+    stats = controller.stats()
+    assert (stats["hedges_sent"], stats["hedges_won"]) == (1, 1)
+
+def test_no_hedging_without_enough_samples():
+    controller = RequestController(timeout_s=5, hedge={"enabled": True, "min_samples": 5, "min_delay_s": 0.01})
+    assert controller.call(lambda timeout, token: time.sleep(0.1) or "done", key="model") == "done"
+    assert controller.stats()["hedges_sent"] == 0
+
+def test_async_call_hedges_and_cancels_the_loser():
+    controller = hedged_controller()
+    cancelled = []
+    
+    async def call(delay):
+        try:
+            await asyncio.sleep(delay)
+            return delay
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+    
+    delays = iter([1.0, 0.0])
+    
+    async def run():
+        result = await controller.call_async(lambda timeout, token: call(next(delays)), key="model")
+        await asyncio.sleep(0)
+        return result
+    
+    assert asyncio.run(run()) == 0.0
+    assert cancelled == [1.0]
+    assert controller.stats()["hedges_won"] == 1
+
+def test_async_deadline():
+    controller = RequestController(timeout_s=0.1)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(controller.call_async(lambda timeout, token: asyncio.sleep(5)))
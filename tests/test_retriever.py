@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.rag_suite import HashingEncoder
+from rag.build_index import TravelIndexBuilder
+from rag.retriever import TravelRetriever
+
+DOCS = [
+    {"id": "1", "name": "Belem Tower", "destination": "Lisbon", "category": "landmark", "price": 10,
+     "description": "Fortified tower on the river with views of the estuary"},
+    {"id": "2", "name": "Time Out Market", "destination": "Lisbon", "category": "food", "price": 25,
+     "description": "Food hall with stalls from local chefs and seafood"},
+    {"id": "3", "name": "Alfama Walk", "destination": "Lisbon", "category": "tour", "price": 0,
+     "description": "Free walking tour through the old quarter and its viewpoints"},
+    {"id": "4", "name": "Sagrada Familia", "destination": "Barcelona", "category": "landmark", "price": 33,
+     "description": "Basilica by Gaudi with towers and stained glass"},
+    {"id": "5", "name": "La Boqueria", "destination": "Barcelona", "category": "food", "price": 15,
+     "description": "Market with seafood, fruit and tapas bars"},
+    {"id": "6", "name": "Tickets Bar", "destination": "Barcelona", "category": "food", "price": 120,
+     "description": "Tasting menu of creative tapas"},
+]
+
+@pytest.fixture(scope="module")
+def index_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("index")
+    corpus = directory / "corpus.jsonl"
+    corpus.write_text("\n".join(json.dumps(doc) for doc in DOCS))
+    builder = TravelIndexBuilder(
+        model_name="hashing",
+        store_config={"category_fields": ["destination", "category"], "numeric_fields": ["price"]},
+        lexical_config={"enabled": True},
+        model=HashingEncoder(64)
+    )
+    builder.build_index_streaming(str(corpus), str(directory))
+    return str(directory)
+
+@pytest.fixture(scope="module")
+def retriever(index_dir):
+    return TravelRetriever(index_dir, model=HashingEncoder(64))
+
+def names(results):
+    return [result["document"]["name"] for result in results]
+
+def test_filters_resolve_to_sorted_ids(retriever):
+    assert retriever.filter_ids(None) is None
+    assert retriever.filter_ids({"destination": "lisbon "}).tolist() == [0, 1, 2]
+    assert retriever.filter_ids({"destination": ["Lisbon", "Barcelona"], "category": "food"}).tolist() == [1, 4, 5]
+    assert retriever.filter_ids({"min_price": 10, "max_price": 25}).tolist() == [0, 1, 4]
+    assert retriever.filter_ids({"price_band": "free"}).tolist() == [2]
+    assert retriever.filter_ids({"price_band": "luxury", "destination": "Lisbon"}).tolist() == []
+
+def test_unknown_filters_are_rejected(retriever):
+    with pytest.raises(ValueError):
+        retriever.filter_ids({"colour": "red"})
+    with pytest.raises(ValueError):
+        retriever.filter_ids({"price_band": "cheap"})
+
+def test_filtered_search_returns_k_matching_results(retriever):
+    results = retriever.search("seafood market", k=2, filters={"destination": "Barcelona"}, mode="dense")
+    assert len(results) == 2
+    assert all(result["document"]["destination"] == "Barcelona" for result in results)
+    # Only one document passes both filters, however large k is
+    assert names(retriever.search("tower", k=5, filters={"destination": "Lisbon", "category": "landmark"}, mode="dense")) == ["Belem Tower"]
+    assert retriever.search("tower", filters={"destination": "Porto"}) == []
+
+def test_batched_search_matches_single_queries(retriever):
+    queries = ["seafood market", "tower with views", "tapas"]
+    batched = retriever.search_batch(queries, k=3, mode="dense")
+    assert len(batched) == 3
+    for query, results in zip(queries, batched):
+        single = retriever.search(query, k=3, mode="dense")
+        assert [r["id"] for r in results] == [r["id"] for r in single]
+        assert np.allclose([r["score"] for r in results], [r["score"] for r in single])
+
+def test_hybrid_is_the_default_with_a_lexical_index(retriever):
+    results = retriever.search("seafood tapas market", k=3)
+    assert results and all(result["match"] == "hybrid" for result in results)
+    assert "La Boqueria" in names(results)
+
+def test_exact_name_skips_the_embedding_model(index_dir):
+    class NoEncoder(HashingEncoder):
+        def encode(self, texts, **kwargs):
+            raise AssertionError("exact matches must not be embedded")
+    
+    retriever = TravelRetriever(index_dir, model=NoEncoder(64))
+    results = retriever.search("sagrada familia")
+    assert [(result["match"], result["document"]["name"]) for result in results] == [("exact", "Sagrada Familia")]
+    # A filter excluding the named document falls back to fused ranking, which does embed
+    with pytest.raises(AssertionError):
+        retriever.search("sagrada familia", filters={"destination": "Lisbon"})
+
+def test_lexical_mode_honours_filters(retriever):
+    results = retriever.search("tapas", k=5, filters={"max_price": 50}, mode="lexical")
+    assert names(results) == ["La Boqueria"]
+    assert results[0]["match"] == "lexical"
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from agents.semantic_cache import SemanticCache, question_numbers
+
+ITINERARY = {"destination": "Rome", "days": [{"day_number": 1, "activities": []}]}
+
+class FixedModel:
+    """Embeds each question as the vector it is given, counting encode calls."""
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+    
+    def encode(self, texts):
+        self.calls += 1
+        return np.array([self.vectors[text] for text in texts], dtype='float32')
+
+def cache_with(vectors, **kwargs):
+    return SemanticCache(model=FixedModel(vectors), **kwargs)
+
+@pytest.mark.parametrize("question, numbers", [
+    ("What is on day 2?", {2}),
+    ("What is on day two?", {2}),
+    ("What do we do on the second day?", {2}),
+    ("Compare day 1 and day 3", {1, 3}),
+    ("Where is lunch?", set()),
+])
+def test_question_numbers(question, numbers):
+    assert question_numbers(question) == frozenset(numbers)
+
+def test_similar_question_reaches_the_threshold():
+    cache = cache_with({
+        "What does lunch cost?": [1, 0],
+        "How much is lunch?": [0.95, 0.31],
+        "Where is the hotel?": [0.5, 0.87],
+    }, threshold=0.9)
+    cache.store("What does lunch cost?", ITINERARY, {"message": "$40"})
+    hit = cache.lookup("How much is lunch?", ITINERARY)
+    assert hit["message"] == "$40"
+    assert hit["cache_similarity"] == pytest.approx(0.95, abs=0.01)
+    assert cache.lookup("Where is the hotel?", ITINERARY) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_other_numbers_or_itinerary_never_match():
+    vectors = {"What is on day 2?": [1, 0], "What is on day 3?": [1, 0]}
+    cache = cache_with(vectors)
+    cache.store("What is on day 2?", ITINERARY, {"message": "Day 2 plan"})
+    # Identical embeddings, but a different day
+    assert cache.lookup("What is on day 3?", ITINERARY) is None
+    assert cache.lookup("What is on day 2?", {**ITINERARY, "destination": "Milan"}) is None
+    assert cache.lookup("What is on day 2?", ITINERARY)["message"] == "Day 2 plan"
+
+def test_miss_then_store_embeds_the_question_once():
+    cache = cache_with({"Where is lunch?": [1, 0], "Where is dinner?": [0, 1]})
+    cache.store("Where is dinner?", ITINERARY, {"message": "Trastevere"})
+    calls = cache.model.calls
+    assert cache.lookup("Where is lunch?", ITINERARY) is None
+    cache.store("Where is lunch?", ITINERARY, {"message": "Campo de' Fiori"})
+    assert cache.model.calls == calls + 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = cache_with({"a": [1, 0, 0], "b": [0, 1, 0], "c": [0, 0, 1]}, max_entries=2)
+    cache.store("a", ITINERARY, {"message": "A"})
+    cache.store("b", ITINERARY, {"message": "B"})
+    assert cache.lookup("a", ITINERARY) is not None
+    cache.store("c", ITINERARY, {"message": "C"})
+    assert cache.lookup("b", ITINERARY) is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from agents.stream_parser import IncrementalItineraryParser, REQUIRED_ACTIVITY_FIELDS
+
+def make_day(number, title="Museum"):
+    activity = {field: f"{field} {number}" for field in REQUIRED_ACTIVITY_FIELDS}
+    activity["title"] = title
+    activity["cost"] = 10
+    return {"day_number": number, "activities": [activity]}
+
+def feed_in_chunks(parser, text, size):
+    days = []
+    for i in range(0, len(text), size):
+        days.extend(parser.feed(text[i:i + size]))
+    return days
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_days_are_returned_whatever_the_chunk_size(size):
+    itinerary = {"days": [make_day(1), make_day(2), make_day(3)]}
+    text = "Here is your itinerary:\n" + json.dumps(itinerary, indent=2)
+    parser = IncrementalItineraryParser()
+    assert feed_in_chunks(parser, text, size) == itinerary["days"]
+    assert parser.errors == []
+    assert parser.text == text
+
+def test_day_is_returned_as_soon_as_it_closes():
+    text = json.dumps({"days": [make_day(1), make_day(2)]})
+    end_of_first_day = text.index("}]}") + 3
+    parser = IncrementalItineraryParser()
+    assert parser.feed(text[:end_of_first_day]) == [make_day(1)]
+    assert parser.feed(text[end_of_first_day:]) == [make_day(2)]
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_escaped_quotes_and_braces_inside_strings(size):
+    day = make_day(1, title='The "Old" Town \\ {walk} [map]')
+    text = json.dumps({"days": [day]})
+    parser = IncrementalItineraryParser()
+    assert feed_in_chunks(parser, text, size) == [day]
+
+def test_chunk_split_between_backslash_and_escaped_quote():
+    day = make_day(1, title='Say "hi"')
+    text = json.dumps({"days": [day]})
+    split = text.index('\\"') + 1
+    parser = IncrementalItineraryParser()
+    assert parser.feed(text[:split]) == []
+    assert parser.feed(text[split:]) == [day]
+
+def test_raw_newline_inside_string_is_accepted():
+    text = '{"days": [' + json.dumps(make_day(1)).replace("description 1", "line one\nline two") + ']}'
+    parser = IncrementalItineraryParser()
+    days = parser.feed(text)
+    assert days[0]["activities"][0]["description"] == "line one\nline two"
+
+def test_invalid_day_is_recorded_and_skipped():
+    broken = make_day(1)
+    del broken["activities"][0]["cost"]
+    text = json.dumps({"days": [broken, make_day(2)]})
+    parser = IncrementalItineraryParser()
+    assert parser.feed(text) == [make_day(2)]
+    assert parser.errors == ["Activity missing 'cost'"]
+
+def test_nested_days_key_and_trailing_text_are_ignored():
+    text = json.dumps({"meta": {"days": [make_day(9)]}, "days": [make_day(1)]}) + ' {"days": [' + json.dumps(make_day(5)) + "]}"
+    parser = IncrementalItineraryParser()
+    assert parser.feed(text) == [make_day(1)]